@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class CupboardAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cupboard_app'
+
+    def ready(self):
+        from django.conf import settings
+
+        from cupboard_app.db_stats import register_mongo_listener
+        from cupboard_app.metrics import instrument_jwks_client
+        from cupboard_app.request_timing import instrument_request_phases
+
+        # The listener must be registered before djongo creates the MongoClient
+        register_mongo_listener()
+        instrument_jwks_client()
+        if settings.SERVER_TIMING:
+            instrument_request_phases()
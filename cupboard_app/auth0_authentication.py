@@ -19,6 +19,7 @@ from cupboard_app.exceptions import (
     FailedOperation,
     MissingInformation
 )
+from cupboard_app.metrics import time_auth0
 from cupboard_app.models import Message
 from cupboard_app.serializers import (
     MessageSerializer,
@@ -184,17 +185,18 @@ class RefreshTokenAPIView(APIView):
                 client_secret = AUTH0_BACKEND_CLIENT_SECRET
 
             try:
-                response = requests.post(
-                    f'https://{AUTH0_DOMAIN}/oauth/token',
-                    headers={'content-type': 'application/x-www-form-urlencoded'},
-                    data={
-                        'grant_type': 'refresh_token',
-                        'client_id': client_id,
-                        'client_secret': client_secret,
-                        'audience': AUTH0_API_IDENTIFIER,
-                        'refresh_token': refresh_token
-                    }
-                )
+                with time_auth0('token'):
+                    response = requests.post(
+                        f'https://{AUTH0_DOMAIN}/oauth/token',
+                        headers={'content-type': 'application/x-www-form-urlencoded'},
+                        data={
+                            'grant_type': 'refresh_token',
+                            'client_id': client_id,
+                            'client_secret': client_secret,
+                            'audience': AUTH0_API_IDENTIFIER,
+                            'refresh_token': refresh_token
+                        }
+                    )
 
                 if response.status_code == 200:
                     session = set_session(request=request, token_info=response.json())
@@ -259,19 +261,20 @@ class CLILoginAPIView(APIView):
             and body.get('password', None)
         ):
             try:
-                response = requests.post(
-                    f'https://{AUTH0_DOMAIN}/oauth/token',
-                    headers={'content-type': 'application/x-www-form-urlencoded'},
-                    data={
-                        'grant_type': 'password',
-                        'client_id': AUTH0_BACKEND_CLIENT_ID,
-                        'client_secret': AUTH0_BACKEND_CLIENT_SECRET,
-                        'audience': AUTH0_API_IDENTIFIER,
-                        'scope': 'openid profile email offline_access',
-                        'username': body['username'],
-                        'password': body['password']
-                    }
-                )
+                with time_auth0('token'):
+                    response = requests.post(
+                        f'https://{AUTH0_DOMAIN}/oauth/token',
+                        headers={'content-type': 'application/x-www-form-urlencoded'},
+                        data={
+                            'grant_type': 'password',
+                            'client_id': AUTH0_BACKEND_CLIENT_ID,
+                            'client_secret': AUTH0_BACKEND_CLIENT_SECRET,
+                            'audience': AUTH0_API_IDENTIFIER,
+                            'scope': 'openid profile email offline_access',
+                            'username': body['username'],
+                            'password': body['password']
+                        }
+                    )
 
                 if response.status_code == 200:
                     session = set_session(request=request, token_info=response.json())
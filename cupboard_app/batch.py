@@ -0,0 +1,184 @@
+import io
+import json
+from urllib.parse import urlsplit
+
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+MAX_BATCH_OPERATIONS = 50
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+API_NAMESPACE = 'v3'
+BATCH_URL_NAME = 'batch'
+# Status of the operations after a failed operation when the batch stops on errors
+SKIPPED_STATUS = 424
+
+TOO_MANY_OPERATIONS = f'A batch can have at most {MAX_BATCH_OPERATIONS} operations.'
+INVALID_BATCH_OPERATION = (
+    'Operation {index} is invalid. Operations are in the format of '
+    '{{method: [{methods}], path: [/api/{namespace}/...], body: [JSON], headers: [HEADERS]}}'
+)
+OPERATION_SKIPPED = 'Skipped because an earlier operation failed.'
+
+
+def _invalid_operation(index: int) -> ValueError:
+    return ValueError(INVALID_BATCH_OPERATION.format(
+        index=index,
+        methods=', '.join(BATCH_METHODS),
+        namespace=API_NAMESPACE
+    ))
+
+
+def validate_operations(operations: list) -> list[tuple]:
+    """
+    Checks every operation of the batch before any of them are run.
+
+    Args:
+        operations: List of the operation dictionaries from the request
+
+    Returns:
+        List of (method, path, query string, body, headers, view) tuples
+        or exception if any operation is invalid.
+    """
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise ValueError(TOO_MANY_OPERATIONS)
+
+    validated = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise _invalid_operation(index)
+
+        method = str(operation.get('method', '')).upper()
+        url = urlsplit(str(operation.get('path', '')))
+        headers = operation.get('headers', {})
+        if method not in BATCH_METHODS or not isinstance(headers, dict):
+            raise _invalid_operation(index)
+
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            raise _invalid_operation(index)
+
+        # Only the API endpoints can be batched, and batches cannot be nested
+        if match.namespace != API_NAMESPACE or match.url_name == BATCH_URL_NAME:
+            raise _invalid_operation(index)
+
+        validated.append((
+            method,
+            url.path,
+            url.query,
+            operation.get('body', None),
+            headers,
+            (match.func, match.args, match.kwargs)
+        ))
+
+    return validated
+
+
+def build_sub_request(
+    request: Request,
+    username: str,
+    method: str,
+    path: str,
+    query: str,
+    body,
+    headers: dict
+) -> HttpRequest:
+    """
+    Builds the request of an operation that reuses the batch request's
+    authentication so the access token and user are only resolved once.
+
+    Args:
+        request: The batch's rest framework Request object
+        username: The batch's authenticated username
+        method: HTTP method of the operation
+        path: Path of the operation
+        query: Query string of the operation
+        body: JSON body of the operation
+        headers: Extra headers of the operation, i.e. If-Match
+
+    Returns:
+        The operation's HttpRequest object.
+    """
+    content = json.dumps(body).encode('utf8') if body is not None else b''
+
+    sub_request = HttpRequest()
+    sub_request.method = method
+    sub_request.path = sub_request.path_info = path
+    sub_request.META = {
+        # The batch's conditional headers are for the batch, each operation sends its own
+        **{key: value for key, value in request.META.items() if not key.startswith('HTTP_IF_')},
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(content))
+    }
+    for name, value in headers.items():
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        if key != 'HTTP_AUTHORIZATION':
+            sub_request.META[key] = str(value)
+    sub_request.GET = QueryDict(query)
+    sub_request._stream = io.BytesIO(content)
+    sub_request._read_started = False
+
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+    sub_request.auth_username = username
+
+    return sub_request
+
+
+def run_batch(
+    request: Request,
+    username: str,
+    operations: list,
+    stop_on_error: bool = False
+) -> list[dict]:
+    """
+    Runs the operations of a batch in order.
+
+    A batch is not atomic. The operations write through djongo's ORM, which cannot
+    join a MongoDB transaction, so only the writes of a single operation are applied
+    together, i.e. by queries.save_if_unchanged. Operations that already ran stay
+    applied when a later one fails, so clients send If-Match with each operation to
+    run a batch again safely.
+
+    Args:
+        request: The batch's rest framework Request object
+        username: The batch's authenticated username
+        operations: List of the operation dictionaries from the request
+        stop_on_error: Skips the operations after the first failed operation
+
+    Returns:
+        List of the result dictionaries of each operation in the form of:
+        {
+            'status': HTTP status code,
+            'headers': {'ETag': etag} if the operation returned an ETag,
+            'body': response body
+        }
+    """
+    results = []
+    failed = False
+    for method, path, query, body, headers, view in validate_operations(operations):
+        if failed:
+            results.append({
+                'status': SKIPPED_STATUS,
+                'headers': {},
+                'body': {'message': OPERATION_SKIPPED}
+            })
+            continue
+
+        func, args, kwargs = view
+        sub_request = build_sub_request(request, username, method, path, query, body, headers)
+        response = func(sub_request, *args, **kwargs)
+
+        results.append({
+            'status': response.status_code,
+            'headers': {'ETag': response['ETag']} if response.has_header('ETag') else {},
+            'body': response.data if isinstance(response, Response) else None
+        })
+        failed = stop_on_error and response.status_code >= 400
+
+    return results
@@ -0,0 +1,191 @@
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+
+from cupboard_app.metrics import record_cache_lookup
+from cupboard_app.models import CustomIngredient, User
+
+# Most custom ingredients kept in each process across all of the cached users
+MAX_CACHED_CUSTOM_INGREDIENTS = 100000
+# Seconds the custom ingredients are kept in the shared cache
+SHARED_TIMEOUT = 24 * 60 * 60
+
+_cache = None
+
+
+def get_user_revision(user_id: int) -> int:
+    """
+    Reads the user's revision, which every save or delete of the user's
+    custom ingredients increments.
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        The user's revision, or 0 if the user does not exist.
+    """
+    return User.objects.filter(id=user_id).values_list('revision', flat=True).first() or 0
+
+
+def load_custom_ingredients(user_id: int) -> dict[str, tuple[str, str]]:
+    """
+    Reads the user's custom ingredients from the database.
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        Dictionary of the custom ingredient name to its (name, type) tuple.
+    """
+    return {
+        name: (name, type)
+        for name, type in CustomIngredient.objects.filter(
+            user_id=user_id
+        ).values_list('name', 'type')
+    }
+
+
+class CustomIngredientCache:
+    """
+    Per-user cache of custom ingredients in front of the database.
+
+    Each process keeps the most recently used users up to a budget of custom ingredients.
+    The version of a user's custom ingredients is the user's revision in the database,
+    which every write increments atomically, so a process only uses its own copy while
+    the revision matches and other processes' writes are seen on the next lookup at the
+    cost of reading it. With a shared cache, the data is kept there tagged with the
+    revision too, so a process missing a user reads it from there before the database.
+    """
+    def __init__(self, shared: BaseCache = None, budget: int = MAX_CACHED_CUSTOM_INGREDIENTS):
+        self.shared = shared
+        self.budget = budget
+        self.size = 0
+        # User ID to the (version, ingredients) tuple
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def _data_key(self, user_id: int) -> str:
+        return f'custom_ingredients:{user_id}'
+
+    def _store(self, user_id: int, version: int, ingredients: dict):
+        with self.lock:
+            self._drop(user_id)
+            self.entries[user_id] = (version, ingredients)
+            self.size += len(ingredients)
+            while self.size > self.budget and len(self.entries) > 1:
+                self._drop(next(iter(self.entries)))
+
+    def _drop(self, user_id: int):
+        entry = self.entries.pop(user_id, None)
+        if entry:
+            self.size -= len(entry[1])
+
+    def get(self, user_id: int) -> dict[str, tuple[str, str]]:
+        """
+        Gets the user's custom ingredients, reading them from the shared cache
+        or the database if this process does not have the current version.
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            Dictionary of the custom ingredient name to its (name, type) tuple.
+        """
+        version = get_user_revision(user_id)
+
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry and entry[0] == version:
+                self.entries.move_to_end(user_id)
+                record_cache_lookup('custom_ingredients', 'local')
+                return entry[1]
+
+        if self.shared:
+            data = self.shared.get(self._data_key(user_id))
+            if data and data[0] == version:
+                self._store(user_id, version, data[1])
+                record_cache_lookup('custom_ingredients', 'shared')
+                return data[1]
+
+        record_cache_lookup('custom_ingredients', 'miss')
+        ingredients = load_custom_ingredients(user_id)
+        if self.shared:
+            # Tagged with the version read before the database, so data read before
+            # another process' write is never used after that write
+            self.shared.set(self._data_key(user_id), (version, ingredients), SHARED_TIMEOUT)
+        self._store(user_id, version, ingredients)
+
+        return ingredients
+
+    def changed(self, user_id: int) -> dict[str, tuple[str, str]]:
+        """
+        Writes the user's custom ingredients through to the caches after they were changed
+        in the database, tagged with the user's revision after the change.
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            Dictionary of the custom ingredient name to its (name, type) tuple.
+        """
+        version = get_user_revision(user_id)
+        ingredients = load_custom_ingredients(user_id)
+        if self.shared:
+            self.shared.set(self._data_key(user_id), (version, ingredients), SHARED_TIMEOUT)
+        self._store(user_id, version, ingredients)
+
+        return ingredients
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+def get_custom_ingredient_cache() -> CustomIngredientCache:
+    """
+    Gets the process' custom ingredient cache, using the SHARED_CACHE
+    cache alias as the shared cache if it is set.
+
+    Returns:
+        The CustomIngredientCache object.
+    """
+    global _cache
+    if _cache is None:
+        alias = settings.SHARED_CACHE
+        _cache = CustomIngredientCache(caches[alias] if alias else None)
+
+    return _cache
+
+
+def get_cached_custom_ingredients(user_id: int) -> dict[str, tuple[str, str]]:
+    """
+    Gets the user's custom ingredients from the cache.
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        Dictionary of the custom ingredient name to its (name, type) tuple.
+    """
+    return get_custom_ingredient_cache().get(user_id)
+
+
+def custom_ingredients_changed(user_id: int):
+    """
+    Updates the cache after the user's custom ingredients were created or deleted.
+
+    Args:
+        user_id: User ID
+    """
+    get_custom_ingredient_cache().changed(user_id)
+
+
+def reset_custom_ingredient_cache():
+    """
+    Drops the process' custom ingredient cache so it is created again from the settings.
+    """
+    global _cache
+    _cache = None
@@ -0,0 +1,123 @@
+import re
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Iterator
+
+from django.db import connections
+from pymongo import monitoring
+
+# String and number literals and parameters, replaced to group the queries that only differ by value
+QUERY_VALUE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s")
+# IN lists of any length after their values were replaced
+QUERY_VALUE_LIST = re.compile(r'\(\?(?:, \?)*\)')
+
+_current_stats = ContextVar('query_stats', default=None)
+
+
+def get_query_shape(sql: str) -> str:
+    """
+    Gets the shape of a query, which is the same for the queries that only differ by their values.
+
+    Args:
+        sql: The SQL of the query
+
+    Returns:
+        The SQL with every value replaced by ?.
+    """
+    return QUERY_VALUE_LIST.sub('(?)', QUERY_VALUE.sub('?', sql))
+
+
+class QueryStats:
+    """
+    Database calls made while collecting, i.e. during a request. Queries are the
+    statements run through the Django ORM, and Mongo commands are every command
+    sent to MongoDB, including the ones djongo runs for each query.
+    """
+    def __init__(self):
+        self.queries = 0
+        self.query_duration = 0.0
+        self.mongo_commands = 0
+        self.mongo_duration = 0.0
+        self.shapes = Counter()
+
+    def execute(self, execute, sql, params, many, context):
+        """
+        Times a query, as a Django execute wrapper.
+        """
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_duration += perf_counter() - start
+            self.shapes[get_query_shape(sql)] += 1
+
+    def add_mongo_command(self, duration: float):
+        self.mongo_commands += 1
+        self.mongo_duration += duration
+
+    def get_repeated_queries(self, limit: int) -> list[tuple[str, int]]:
+        """
+        Gets the queries run more times than the limit, usually one query per
+        object of a list (N+1 queries) that could have been a single query.
+
+        Args:
+            limit: Times a query shape may run
+
+        Returns:
+            List of the (query shape, count) tuples, most repeated first.
+        """
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > limit]
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    Adds every Mongo command to the stats being collected on the thread that sent it.
+    """
+    def started(self, event: monitoring.CommandStartedEvent):
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.add_mongo_command(event.duration_micros / 1000000)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.add_mongo_command(event.duration_micros / 1000000)
+
+
+def register_mongo_listener():
+    """
+    Registers the Mongo command listener. Only clients created after
+    this call report their commands, so it is called when the app is ready.
+    """
+    monitoring.register(MongoCommandListener())
+
+
+@contextmanager
+def collect_query_stats() -> Iterator[QueryStats]:
+    """
+    Collects the database calls made by this thread inside the block. Nested blocks
+    share the stats of the outermost block.
+
+    Returns:
+        The QueryStats updated with every call until the block exits.
+    """
+    stats = _current_stats.get()
+    if stats is not None:
+        yield stats
+        return
+
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats.execute))
+            yield stats
+    finally:
+        _current_stats.reset(token)
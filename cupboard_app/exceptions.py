@@ -11,3 +11,15 @@ class FailedOperation(APIException):
     status_code = 400
     default_detail = 'Bad request, operation failed.'
     default_code = 'bad_request'
+
+
+class PreconditionFailed(APIException):
+    status_code = 412
+    default_detail = 'Precondition failed, the resource was changed by another request.'
+    default_code = 'precondition_failed'
+
+
+class WriteConflict(APIException):
+    status_code = 409
+    default_detail = 'Conflict, the resource is being changed by other requests. Please try again.'
+    default_code = 'conflict'
@@ -0,0 +1,314 @@
+from bisect import bisect_left
+from collections import Counter
+
+from cupboard_app.reference_data import get_reference_data
+
+DEFAULT_SEARCH_RESULTS = 10
+MAX_SEARCH_RESULTS = 50
+# Queries shorter than this are only matched by prefix
+MIN_FUZZY_QUERY_LENGTH = 3
+
+EXACT_MATCH = 0
+PREFIX_MATCH = 1
+WORD_PREFIX_MATCH = 2
+FUZZY_MATCH = 3
+
+_index = None
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Calculates the Levenshtein distance between two strings, stopping
+    early once the distance is larger than max_distance.
+
+    Args:
+        a: First string
+        b: Second string
+        max_distance: The largest distance of interest
+
+    Returns:
+        The edit distance or max_distance + 1 if the strings are further apart.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous = list(range(len(b) + 1))
+    for i, a_char in enumerate(a, start=1):
+        current = [i]
+        for j, b_char in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (a_char != b_char)
+            ))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+
+    return previous[-1]
+
+
+def max_typos(word: str) -> int:
+    """
+    Gets the number of typos tolerated for a word of the given length.
+    """
+    return 1 if len(word) <= 5 else 2
+
+
+def trigrams(word: str) -> set[str]:
+    """
+    Gets the trigrams of a word padded with its boundaries.
+    """
+    padded = f'${word}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def word_distance(query_word: str, word: str) -> int:
+    """
+    Gets the edit distance between a query word and either the whole word or
+    the start of the word, so partially typed words still match.
+    """
+    allowed = max_typos(query_word)
+    return min(
+        edit_distance(query_word, word, allowed),
+        edit_distance(query_word, word[:len(query_word)], allowed)
+    )
+
+
+def fuzzy_distance(query_words: list[str], words: list[str]) -> int | None:
+    """
+    Matches every query word against the closest word of an ingredient name.
+
+    Args:
+        query_words: Words of the case folded search query
+        words: Words of the case folded ingredient name
+
+    Returns:
+        The total edit distance or None if a query word has too many typos.
+    """
+    total = 0
+    for query_word in query_words:
+        distance = min(word_distance(query_word, word) for word in words)
+        if distance > max_typos(query_word):
+            return None
+        total += distance
+
+    return total
+
+
+def match_rank(query: str, key: str) -> int | None:
+    """
+    Ranks how well an ingredient name matches the search query.
+
+    Args:
+        query: Case folded search query
+        key: Case folded ingredient name
+
+    Returns:
+        The match rank where lower is better, or None if the name does not match.
+    """
+    if key == query:
+        return EXACT_MATCH
+    if key.startswith(query):
+        return PREFIX_MATCH
+    if any(word.startswith(query) for word in key.split()[1:]):
+        return WORD_PREFIX_MATCH
+    if len(query) >= MIN_FUZZY_QUERY_LENGTH:
+        distance = fuzzy_distance(query.split(), key.split())
+        if distance is not None:
+            return FUZZY_MATCH + distance
+
+    return None
+
+
+class IngredientIndex:
+    """
+    In-memory index of the common ingredients kept by each worker.
+    Names and words are kept in sorted arrays so prefix lookups are a bisect,
+    and words are indexed by trigram so typo tolerant lookups only check similar words.
+    """
+    def __init__(self, ingredients: list[tuple[str, str]], version: int = None):
+        # Version of the reference data the index was built from
+        self.version = version
+        self.entries = sorted((name.casefold(), name, type) for name, type in ingredients)
+        self.keys = [key for key, name, type in self.entries]
+
+        # Entries containing each word
+        self.word_entries = {}
+        for i, key in enumerate(self.keys):
+            for word in set(key.split()):
+                self.word_entries.setdefault(word, []).append(i)
+        self.words = sorted(self.word_entries)
+
+        # Words containing each trigram
+        self.trigram_words = {}
+        for word in self.words:
+            for trigram in trigrams(word):
+                self.trigram_words.setdefault(trigram, []).append(word)
+
+    def _prefix_range(self, keys: list[str], query: str) -> range:
+        """
+        Gets the range of indexes in the sorted keys that start with the query.
+        """
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + '\uffff', lo=start)
+        return range(start, end)
+
+    def _similar_words(self, query_word: str) -> dict[str, int]:
+        """
+        Finds the words within the tolerated number of typos of a query word.
+        Each typo changes at most three trigrams, so only words sharing enough
+        trigrams with the query word are checked.
+
+        Returns:
+            Dictionary of similar word to its edit distance.
+        """
+        allowed = max_typos(query_word)
+        query_trigrams = trigrams(query_word)
+        required = max(1, len(query_trigrams) - 3 * allowed)
+
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self.trigram_words.get(trigram, ()))
+
+        similar = {}
+        for word, count in shared.items():
+            if count >= required:
+                distance = word_distance(query_word, word)
+                if distance <= allowed:
+                    similar[word] = distance
+
+        return similar
+
+    def _fuzzy_search(self, query: str) -> dict[int, int]:
+        """
+        Finds the entries where every query word is within the tolerated number
+        of typos of one of the entry's words.
+
+        Returns:
+            Dictionary of entry index to the total edit distance.
+        """
+        distances = None
+        for query_word in query.split():
+            # Best distance of each entry for this query word
+            word_distances = {}
+            for word, distance in self._similar_words(query_word).items():
+                for i in self.word_entries[word]:
+                    word_distances[i] = min(distance, word_distances.get(i, distance))
+
+            if distances is None:
+                distances = word_distances
+            else:
+                distances = {
+                    i: distance + word_distances[i]
+                    for i, distance in distances.items()
+                    if i in word_distances
+                }
+
+        return distances
+
+    def search(self, query: str, limit: int) -> list[tuple]:
+        """
+        Searches the common ingredients by prefix, then by the prefix of any word in the name
+        and finally by a typo tolerant match when there are not enough results.
+
+        Args:
+            query: Case folded search query
+            limit: Maximum number of results
+
+        Returns:
+            List of (rank, key, name, type) tuples sorted from best to worst match.
+        """
+        results = []
+        found = set()
+
+        for i in self._prefix_range(self.keys, query):
+            if len(results) == limit:
+                return results
+            key, name, type = self.entries[i]
+            results.append((EXACT_MATCH if key == query else PREFIX_MATCH, key, name, type))
+            found.add(i)
+
+        word_matches = set()
+        for j in self._prefix_range(self.words, query):
+            word_matches.update(self.word_entries[self.words[j]])
+        for i in sorted(word_matches - found)[:limit - len(results)]:
+            results.append((WORD_PREFIX_MATCH, *self.entries[i]))
+            found.add(i)
+
+        if len(results) < limit and len(query) >= MIN_FUZZY_QUERY_LENGTH:
+            fuzzy = sorted(
+                (FUZZY_MATCH + distance, *self.entries[i])
+                for i, distance in self._fuzzy_search(query).items()
+                if i not in found
+            )
+            results.extend(fuzzy[:limit - len(results)])
+
+        return results
+
+
+def get_ingredient_index() -> IngredientIndex:
+    """
+    Gets the worker's ingredient index, building it from the reference data if it
+    does not exist or the reference data changed since it was built. An index built
+    before the workers were forked is kept, and shared, until the catalogue changes.
+
+    Returns:
+        The IngredientIndex of the common ingredients.
+    """
+    global _index
+    reference_data = get_reference_data()
+    if _index is None or _index.version != reference_data.version:
+        _index = IngredientIndex(reference_data.ingredients.values(), reference_data.version)
+
+    return _index
+
+
+def invalidate_ingredient_index():
+    """
+    Drops the worker's ingredient index so it is rebuilt on the next search.
+    """
+    global _index
+    _index = None
+
+
+def search_ingredients(
+    query: str,
+    custom_ingredients: list[tuple[str, str]] = [],
+    limit: int = DEFAULT_SEARCH_RESULTS
+) -> list[dict]:
+    """
+    Searches the common ingredients and the given custom ingredients.
+
+    Args:
+        query: Search query
+        custom_ingredients: List of (name, type) tuples of the user's custom ingredients
+        limit: Maximum number of results
+
+    Returns:
+        List of the top matching ingredient dictionaries in the form of:
+        {
+            'name': name,
+            'type': type,
+            'is_custom_ingredient': bool if custom ingredient or not
+        }
+    """
+    query = query.strip().casefold()
+    if not query:
+        return []
+
+    results = [
+        (rank, key, name, type, False)
+        for rank, key, name, type in get_ingredient_index().search(query, limit)
+    ]
+    for name, type in custom_ingredients:
+        key = name.casefold()
+        rank = match_rank(query, key)
+        if rank is not None:
+            results.append((rank, key, name, type, True))
+    results.sort()
+
+    return [
+        {'name': name, 'type': type, 'is_custom_ingredient': is_custom}
+        for rank, key, name, type, is_custom in results[:limit]
+    ]
@@ -0,0 +1,75 @@
+import json
+import os
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from cupboard_app.sampling_profiler import COLLAPSED_EXTENSION, read_collapsed, to_speedscope
+
+# Files written next to the view directories with the profiles of each view added up
+AGGREGATE_COLLAPSED = '{view}.all.collapsed'
+AGGREGATE_SPEEDSCOPE = '{view}.speedscope.json'
+
+
+def aggregate_profiles(directory: str) -> dict[str, tuple[int, Counter]]:
+    """
+    Adds up the sampled profiles of each view.
+
+    Args:
+        directory: Directory of the sampled profiles with a subdirectory for each view
+
+    Returns:
+        Dictionary of each view's directory name to its number of profiles and its samples.
+    """
+    views = {}
+    for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+        if not entry.is_dir():
+            continue
+
+        profiles = 0
+        stacks = Counter()
+        for profile in os.scandir(entry.path):
+            if profile.name.endswith(COLLAPSED_EXTENSION):
+                try:
+                    stacks.update(read_collapsed(profile.path))
+                except FileNotFoundError:
+                    # Removed by a worker past the retention limits
+                    continue
+                profiles += 1
+
+        if profiles:
+            views[entry.name] = (profiles, stacks)
+
+    return views
+
+
+class Command(BaseCommand):
+    help = (
+        'Adds up the sampled profiles of each view into a flame graph in the collapsed '
+        'stack format, for flamegraph.pl, and in the speedscope format.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir',
+            default=settings.PROFILER_DIR,
+            help='Directory of the sampled profiles.'
+        )
+
+    def handle(self, *args, **options):
+        directory = options['dir']
+        if not os.path.isdir(directory):
+            self.stdout.write(f'No sampled profiles in {directory}')
+            return
+
+        for view, (profiles, stacks) in aggregate_profiles(directory).items():
+            with open(os.path.join(directory, AGGREGATE_COLLAPSED.format(view=view)), 'w') as file:
+                for stack, count in stacks.most_common():
+                    file.write(f'{stack} {count}\n')
+
+            speedscope = to_speedscope(view, stacks)
+            with open(os.path.join(directory, AGGREGATE_SPEEDSCOPE.format(view=view)), 'w') as file:
+                json.dump(speedscope, file)
+
+            self.stdout.write(f'{view}: {profiles} profiles, {sum(stacks.values())} samples')
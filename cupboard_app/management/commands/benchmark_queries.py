@@ -0,0 +1,243 @@
+import json
+import os
+import platform
+from datetime import datetime, timezone
+from itertools import count
+from statistics import mean, median
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from cupboard_app.query_benchmarks import (
+    QUERY_BENCHMARKS,
+    BenchmarkData,
+    QueryBenchmark,
+    evaluate,
+    seed_benchmark_data
+)
+
+BENCHMARK_DIR = settings.BASE_DIR / 'benchmarks'
+DEFAULT_LIST_SIZES = '10,100,1000,5000'
+# Median slowdowns smaller than this many milliseconds are noise, not regressions
+MIN_REGRESSION_MS = 0.5
+
+
+def summarize(times: list[float]) -> dict:
+    """
+    Summarizes the durations of a benchmark's runs.
+
+    Args:
+        times: Seconds taken by each run
+
+    Returns:
+        Dictionary of the min, median, mean and 95th percentile in milliseconds and the runs.
+    """
+    ordered = sorted(times)
+    return {
+        'min': round(ordered[0] * 1000, 3),
+        'median': round(median(ordered) * 1000, 3),
+        'mean': round(mean(ordered) * 1000, 3),
+        'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        'runs': len(ordered)
+    }
+
+
+def run_benchmark(
+    benchmark: QueryBenchmark,
+    data: BenchmarkData,
+    username: str,
+    repeat: int,
+    counter: count
+) -> list[float]:
+    """
+    Times the runs of a benchmark after an untimed warm up run.
+
+    Args:
+        benchmark: The benchmark
+        data: The seeded data
+        username: User the benchmark runs as
+        repeat: Number of timed runs
+        counter: Numbers of the runs, unique across the benchmarks so the names they create are
+
+    Returns:
+        List of the seconds taken by each timed run.
+    """
+    times = []
+    for run in range(repeat + 1):
+        i = next(counter)
+        if benchmark.setup:
+            benchmark.setup(data, username, i)
+
+        start = perf_counter()
+        evaluate(benchmark.run(data, username, i))
+        duration = perf_counter() - start
+
+        if benchmark.teardown:
+            benchmark.teardown(data, username, i)
+        if run:
+            times.append(duration)
+
+    return times
+
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float) -> list[tuple]:
+    """
+    Finds the benchmarks whose median is slower than the baseline's by more than the tolerance.
+
+    Args:
+        results: Summaries of the benchmarks by name
+        baseline: Summaries of the baseline's benchmarks by name
+        tolerance: Fraction the median may be slower, i.e. 0.25 for 25%
+
+    Returns:
+        List of the (benchmark name, baseline median, median) tuples of the regressions.
+    """
+    regressions = []
+    for name, summary in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]['median']
+        after = summary['median']
+        if after > before * (1 + tolerance) and after - before > MIN_REGRESSION_MS:
+            regressions.append((name, before, after))
+
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a new test database with synthetic users, lists and recipes, times every '
+        'function in cupboard_app/queries.py, and compares the medians against a baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Number of background users.')
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=2000,
+            help='Number of ingredients in the catalogue.'
+        )
+        parser.add_argument(
+            '--list-sizes',
+            default=DEFAULT_LIST_SIZES,
+            help='Comma separated numbers of items in the benchmarked lists.'
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=20,
+            help='Number of recipes of each benchmarked user.'
+        )
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs of each benchmark.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic data.')
+        parser.add_argument(
+            '--filter',
+            default='',
+            help='Only run the benchmarks whose name contains this text.'
+        )
+        parser.add_argument(
+            '--output',
+            default=BENCHMARK_DIR / 'results.json',
+            help='File the results are written to.'
+        )
+        parser.add_argument(
+            '--baseline',
+            default=BENCHMARK_DIR / 'baseline.json',
+            help='Results of a previous run to compare against.'
+        )
+        parser.add_argument(
+            '--save-baseline',
+            action='store_true',
+            help='Write the results to the baseline file instead of comparing against it.'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help='Fraction a median may be slower than the baseline before it is a regression.'
+        )
+
+    def handle(self, *args, **options):
+        list_sizes = [int(size) for size in options['list_sizes'].split(',') if size]
+        if not list_sizes or options['recipes'] < 1 or options['repeat'] < 1:
+            raise CommandError('At least one list size, recipe and run is required.')
+
+        # Never touch the real data: seed a new test database and drop it afterwards
+        database_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write('Seeding the benchmark data...')
+            start = perf_counter()
+            data = seed_benchmark_data(
+                users=options['users'],
+                ingredients=options['ingredients'],
+                list_sizes=list_sizes,
+                recipes=options['recipes'],
+                seed=options['seed']
+            )
+            self.stdout.write(f'Seeded in {perf_counter() - start:.1f}s')
+
+            results = self.run_benchmarks(data, options['repeat'], options['filter'])
+        finally:
+            connection.creation.destroy_test_db(database_name, verbosity=0)
+
+        report = {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'storage': settings.LIST_INGREDIENTS_STORAGE,
+            'users': options['users'],
+            'ingredients': options['ingredients'],
+            'list_sizes': list_sizes,
+            'recipes': options['recipes'],
+            'repeat': options['repeat'],
+            'seed': options['seed'],
+            'results': results
+        }
+        output = options['baseline'] if options['save_baseline'] else options['output']
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, 'w') as file:
+            json.dump(report, file, indent=2)
+        self.stdout.write(f'Results written to {output}')
+
+        if options['save_baseline'] or not os.path.exists(options['baseline']):
+            return
+
+        with open(options['baseline']) as file:
+            baseline = json.load(file)['results']
+        regressions = compare_to_baseline(results, baseline, options['tolerance'])
+        for name, before, after in regressions:
+            self.stderr.write(self.style.ERROR(
+                f'{name}: median {after:.3f}ms, was {before:.3f}ms'
+            ))
+        if regressions:
+            raise CommandError(f'{len(regressions)} benchmarks are slower than the baseline.')
+
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+
+    def run_benchmarks(self, data: BenchmarkData, repeat: int, name_filter: str) -> dict:
+        """
+        Runs the benchmarks, once for each list size for the ones that depend on it.
+
+        Returns:
+            Dictionary of the summaries of the benchmarks by name.
+        """
+        counter = count()
+        results = {}
+        for benchmark in QUERY_BENCHMARKS:
+            sizes = data.list_sizes if benchmark.by_list_size else data.list_sizes[:1]
+            for size in sizes:
+                name = f'{benchmark.name}[{size}]' if benchmark.by_list_size else benchmark.name
+                if name_filter not in name:
+                    continue
+
+                times = run_benchmark(benchmark, data, data.get_username(size), repeat, counter)
+                results[name] = summarize(times)
+                self.stdout.write(
+                    f'  {results[name]["median"]:10.3f}ms  {name} '
+                    f'(p95 {results[name]["p95"]:.3f}ms)'
+                )
+
+        return results
@@ -0,0 +1,77 @@
+from hashlib import sha256
+from typing import Iterable
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+
+def get_migration_fingerprint(migrations: Iterable[tuple[str, str]]) -> str:
+    """
+    Hashes a set of migrations so the migrations on disk and the
+    applied migrations are compared without walking the plan.
+
+    Args:
+        migrations: The (app label, migration name) tuples
+
+    Returns:
+        The hex digest of the sorted migrations.
+    """
+    names = '\n'.join(f'{app_label}.{name}' for app_label, name in sorted(migrations))
+    return sha256(names.encode('utf8')).hexdigest()
+
+
+def get_pending_migrations(executor: MigrationExecutor) -> list[tuple[str, str]]:
+    """
+    Gets the migrations on disk that have not been applied to the database.
+
+    Args:
+        executor: The MigrationExecutor of the database connection
+
+    Returns:
+        List of the (app label, migration name) tuples in the order they would be applied.
+    """
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    return [(migration.app_label, migration.name) for migration, backwards in plan]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the fingerprint of the migrations on disk against the applied '
+        'migrations. Run as a one-off job before starting new replicas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--apply',
+            action='store_true',
+            help='Run the pending migrations instead of exiting with an error.'
+        )
+
+    def handle(self, *args, **options):
+        # Loading the executor reads the applied migrations in a single query
+        executor = MigrationExecutor(connection)
+        loader = executor.loader
+
+        disk = get_migration_fingerprint(loader.graph.nodes)
+        applied = get_migration_fingerprint(
+            key for key in loader.applied_migrations if key in loader.graph.nodes
+        )
+        if disk == applied:
+            self.stdout.write(self.style.SUCCESS(f'Migrations are up to date ({disk[:12]}).'))
+            return
+
+        pending = get_pending_migrations(executor)
+        if not pending:
+            # i.e. squashed migrations recorded under their replaced names
+            self.stdout.write(self.style.SUCCESS(f'Migrations are up to date ({disk[:12]}).'))
+            return
+
+        for app_label, name in pending:
+            self.stderr.write(f'Pending migration {app_label}.{name}')
+
+        if not options['apply']:
+            raise CommandError(f'{len(pending)} migrations have not been applied.')
+
+        call_command('migrate', interactive=False, stdout=self.stdout, stderr=self.stderr)
@@ -0,0 +1,34 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cupboard_app.synthetic_data import BATCH_SIZE, DEFAULT_TAG, delete_synthetic_data
+
+
+class Command(BaseCommand):
+    help = 'Deletes in bulk every document generated by generate_synthetic_data with a tag.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tag', default=DEFAULT_TAG, help='Tag of the dataset.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Users deleted in each batch.'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('The batch size must be positive.')
+
+        start = perf_counter()
+        try:
+            deleted = delete_synthetic_data(options['tag'], options['batch_size'])
+        except ValueError as error:
+            raise CommandError(error)
+
+        for model, count in deleted.items():
+            self.stdout.write(f'  {count:10d}  {model}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted the {options["tag"]} dataset in {perf_counter() - start:.1f}s'
+        ))
@@ -0,0 +1,200 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from pymongo.errors import OperationFailure
+
+from cupboard_app.models import (
+    Counter,
+    Ingredient,
+    ListName,
+    ListIngredient,
+    Measurement,
+    Tombstone,
+    User,
+    UserListIngredients,
+    Recipe,
+    CustomIngredient
+)
+
+# Indexes required by the lookups in cupboard_app/queries.py.
+# Djongo does not create the indexes for the constraints declared inside the CREATE TABLE
+# statements, so they are declared here and created with pymongo.
+# Each index is a tuple of (name, [(field, direction)], unique).
+REQUIRED_INDEXES = {
+    Ingredient: [
+        ('ingredient_name_unique', [('name', 1)], True),
+        ('ingredient_type_name', [('type', 1), ('name', 1)], False),
+    ],
+    ListName: [
+        ('list_name_unique', [('list_name', 1)], True),
+    ],
+    Measurement: [
+        ('measurement_unit_unique', [('unit', 1)], True),
+    ],
+    User: [
+        ('user_username_unique', [('username', 1)], True),
+        ('user_email_unique', [('email', 1)], True),
+    ],
+    UserListIngredients: [
+        ('user_list_unique', [('user_id', 1), ('list_name_id', 1)], True),
+        ('user_list_revision', [('user_id', 1), ('revision', 1)], False),
+    ],
+    Recipe: [
+        ('recipe_unique', [('user_id', 1), ('recipe_name', 1)], True),
+        ('recipe_revision', [('user_id', 1), ('revision', 1)], False),
+    ],
+    CustomIngredient: [
+        ('custom_ingredient_unique', [('user_id', 1), ('name', 1)], True),
+        ('custom_ingredient_revision', [('user_id', 1), ('revision', 1)], False),
+    ],
+    Tombstone: [
+        ('tombstone_revision', [('user_id', 1), ('revision', 1)], False),
+    ],
+    Counter: [
+        ('counter_name_unique', [('name', 1)], True),
+    ],
+    ListIngredient: [
+        (
+            'unique_list_ingredient',
+            [
+                ('user_id', 1),
+                ('user_list_id', 1),
+                ('ingredient_name', 1),
+                ('unit', 1),
+                ('is_custom_ingredient', 1)
+            ],
+            True
+        ),
+        ('list_ingredient_user_list', [('user_list_id', 1), ('id', 1)], False),
+    ],
+}
+
+# The MongoDB filters of the hot lookups in cupboard_app/queries.py.
+# Each probe is a tuple of (query function, model, filter) used to explain the query plan.
+QUERY_PROBES = [
+    ('get_ingredient', Ingredient, {'name': ''}),
+    ('get_list_name', ListName, {'list_name': ''}),
+    ('get_measurement', Measurement, {'unit': ''}),
+    ('get_user', User, {'username': ''}),
+    ('get_user_lists_ingredients', UserListIngredients, {'user_id': 0}),
+    ('get_specific_user_lists_ingredients', UserListIngredients, {
+        'user_id': 0,
+        'list_name_id': 0
+    }),
+    ('get_all_recipes', Recipe, {'user_id': 0}),
+    ('get_recipe', Recipe, {'user_id': 0, 'recipe_name': ''}),
+    ('get_all_custom_ingredients', CustomIngredient, {'user_id': 0}),
+    ('get_custom_ingredient', CustomIngredient, {'user_id': 0, 'name': ''}),
+    ('get_list_items', ListIngredient, {'user_list_id': {'$in': [0]}}),
+    ('get_user_changes', Tombstone, {'user_id': 0, 'revision': {'$gt': 0}}),
+]
+
+
+def get_database():
+    """
+    Gets the pymongo database behind the default djongo connection.
+
+    Returns:
+        The pymongo Database object.
+    """
+    connection.ensure_connection()
+    return connection.connection
+
+
+def find_missing_indexes(db) -> list[tuple]:
+    """
+    Compares the declared indexes against the indexes in the database.
+    Indexes are matched by their keys and uniqueness so indexes created
+    under another name still count.
+
+    Args:
+        db: The pymongo database
+
+    Returns:
+        List of (model, index) tuples for each declared index that is missing.
+    """
+    missing = []
+    for model, indexes in REQUIRED_INDEXES.items():
+        existing = [
+            (info['key'], info.get('unique', False))
+            for info in db[model._meta.db_table].index_information().values()
+        ]
+        for index in indexes:
+            name, keys, unique = index
+            if (keys, unique) not in existing:
+                missing.append((model, index))
+
+    return missing
+
+
+def find_collection_scans(db) -> list[str]:
+    """
+    Explains each query probe and finds the ones that scan the whole collection.
+
+    Args:
+        db: The pymongo database
+
+    Returns:
+        List of the query function names with a collection scan in the winning plan.
+    """
+    scans = []
+    for name, model, query in QUERY_PROBES:
+        plan = db[model._meta.db_table].find(query).explain()
+        if _has_stage(plan['queryPlanner']['winningPlan'], 'COLLSCAN'):
+            scans.append(name)
+
+    return scans
+
+
+def _has_stage(plan: dict, stage: str) -> bool:
+    """
+    Checks if a query plan or any of its input stages is the given stage.
+    """
+    if plan.get('stage') == stage:
+        return True
+
+    inputs = plan.get('inputStages', [])
+    if 'inputStage' in plan:
+        inputs = inputs + [plan['inputStage']]
+
+    return any(_has_stage(child, stage) for child in inputs)
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates and verifies the MongoDB indexes required by the queries '
+        'and reports any query that scans a whole collection.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only verify the indexes. Exits with an error if any index is missing.'
+        )
+
+    def handle(self, *args, **options):
+        db = get_database()
+
+        missing = find_missing_indexes(db)
+        if not options['check']:
+            for model, (name, keys, unique) in missing:
+                try:
+                    db[model._meta.db_table].create_index(keys, name=name, unique=unique)
+                    self.stdout.write(f'Created index {name} on {model._meta.db_table}')
+                except OperationFailure as e:
+                    # i.e. duplicate documents prevent building a unique index
+                    self.stderr.write(
+                        f'Failed to create index {name} on {model._meta.db_table}: {e}'
+                    )
+            missing = find_missing_indexes(db)
+
+        for model, (name, keys, unique) in missing:
+            self.stderr.write(f'Missing index {name} on {model._meta.db_table}: {keys}')
+
+        for name in find_collection_scans(db):
+            self.stderr.write(self.style.WARNING(f'Collection scan in {name}'))
+
+        if missing:
+            raise CommandError(f'{len(missing)} required indexes are missing.')
+
+        self.stdout.write(self.style.SUCCESS('All required indexes exist.'))
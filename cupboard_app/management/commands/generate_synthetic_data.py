@@ -0,0 +1,112 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cupboard_app.synthetic_data import (
+    BATCH_SIZE,
+    DEFAULT_TAG,
+    generate_synthetic_data,
+    get_synthetic_users
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates a deterministic dataset of users with lists, recipes and custom ingredients '
+        'and a common catalogue for scale testing. Every name starts with the tag so '
+        'delete_synthetic_data can remove the dataset.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tag', default=DEFAULT_TAG, help='Tag of the dataset.')
+        parser.add_argument('--users', type=int, default=1000, help='Number of users.')
+        parser.add_argument(
+            '--catalogue',
+            type=int,
+            default=10000,
+            help='Number of ingredients in the common catalogue.'
+        )
+        parser.add_argument(
+            '--lists-per-user',
+            type=int,
+            default=2,
+            help='Number of lists of each user, the Grocery and Pantry lists first.'
+        )
+        parser.add_argument(
+            '--list-items',
+            type=float,
+            default=20,
+            help='Mean number of items in a list. Sizes are log-normally distributed.'
+        )
+        parser.add_argument(
+            '--max-items',
+            type=int,
+            default=1000,
+            help='Largest number of items in a list or recipe.'
+        )
+        parser.add_argument(
+            '--recipes',
+            type=float,
+            default=3,
+            help='Mean number of recipes of a user.'
+        )
+        parser.add_argument(
+            '--recipe-items',
+            type=float,
+            default=8,
+            help='Mean number of ingredients in a recipe.'
+        )
+        parser.add_argument(
+            '--custom-ingredients',
+            type=float,
+            default=5,
+            help='Mean number of custom ingredients of a user.'
+        )
+        parser.add_argument(
+            '--custom-ratio',
+            type=float,
+            default=0.1,
+            help='Fraction of the list and recipe items that are custom ingredients.'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Documents sent in each bulk insert.'
+        )
+
+    def handle(self, *args, **options):
+        if not 0 <= options['custom_ratio'] <= 1 or options['batch_size'] < 1:
+            raise CommandError('The custom ratio must be from 0 to 1 and the batch size positive.')
+        try:
+            exists = get_synthetic_users(options['tag']).exists()
+        except ValueError as error:
+            raise CommandError(error)
+        if exists:
+            raise CommandError(
+                f'Data tagged {options["tag"]} already exists. '
+                f'Run delete_synthetic_data --tag {options["tag"]} first.'
+            )
+
+        start = perf_counter()
+        created = generate_synthetic_data(
+            tag=options['tag'],
+            users=options['users'],
+            catalogue=options['catalogue'],
+            lists_per_user=options['lists_per_user'],
+            list_items=options['list_items'],
+            max_items=options['max_items'],
+            recipes=options['recipes'],
+            recipe_items=options['recipe_items'],
+            custom_ingredients=options['custom_ingredients'],
+            custom_ratio=options['custom_ratio'],
+            seed=options['seed'],
+            batch_size=options['batch_size']
+        )
+
+        for model, count in created.items():
+            self.stdout.write(f'  {count:10d}  {model}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated the {options["tag"]} dataset in {perf_counter() - start:.1f}s'
+        ))
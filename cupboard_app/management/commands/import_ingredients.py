@@ -0,0 +1,230 @@
+import json
+import os
+import re
+from collections import Counter, defaultdict
+from time import perf_counter
+from typing import IO, Iterator
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cupboard_app.models import Ingredient
+from cupboard_app.synthetic_data import invalidate_caches
+
+DEFAULT_TYPE = 'Miscellaneous'
+BATCH_SIZE = 1000
+# Characters read from the file at a time
+CHUNK_SIZE = 64 * 1024
+NAME_LENGTH = Ingredient._meta.get_field('name').max_length
+TYPE_LENGTH = Ingredient._meta.get_field('type').max_length
+SEPARATOR = re.compile(r'\s*,?\s*')
+WHITESPACE = re.compile(r'\s*')
+# Rest of a number cut off by the end of a chunk, i.e. the '.5e3' of 45 in '45.5e3'
+NUMBER_TAIL = re.compile(r'[0-9.eE+-]+')
+
+
+def iter_json_array(file: IO[str], chunk_size: int = CHUNK_SIZE) -> Iterator:
+    """
+    Parses the values of a JSON array one at a time, so only a chunk of
+    the file and the value being parsed are in memory.
+
+    Args:
+        file: File of the JSON array opened as text
+        chunk_size: Characters read at a time
+
+    Returns:
+        Iterator of the values of the array.
+
+    Raises:
+        ValueError: If the file is not a JSON array.
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('The file is not a JSON array.')
+
+    position = 1
+    end_of_file = False
+    while True:
+        position = SEPARATOR.match(buffer, position).end()
+        if position < len(buffer):
+            if buffer[position] == ']':
+                return
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The value continues in the next chunk
+                if end_of_file:
+                    raise
+            else:
+                # A value is only complete once a delimiter follows it, since the decoder
+                # stops a number cut off by the end of the buffer at its last valid digit
+                delimiter = WHITESPACE.match(buffer, end).end()
+                if delimiter < len(buffer) and buffer[delimiter] in ',]':
+                    yield value
+                    position = delimiter
+                    continue
+                if delimiter < len(buffer) and not NUMBER_TAIL.fullmatch(buffer, end):
+                    raise ValueError(f'Expected , or ] after {buffer[position:end]}.')
+
+        if end_of_file:
+            raise ValueError('The JSON array is not closed.')
+
+        chunk = file.read(chunk_size)
+        end_of_file = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def import_batch(batch: dict[str, str], dry_run: bool = False) -> tuple[list, dict, dict]:
+    """
+    Inserts the new ingredients of a batch with one bulk insert and changes the type of the
+    existing ones whose type is different. Existing names are found with one query.
+
+    Args:
+        batch: Types of the ingredients by name
+        dry_run: Only find the changes without making them
+
+    Returns:
+        Tuple of the added ingredients, the changed types by name as (old, new),
+        and the existing types by name of the unchanged ingredients.
+    """
+    existing = dict(Ingredient.objects.filter(name__in=list(batch)).values_list('name', 'type'))
+    added = [(name, type) for name, type in batch.items() if name not in existing]
+    changed = {
+        name: (existing[name], type) for name, type in batch.items()
+        if name in existing and existing[name] != type
+    }
+    unchanged = {name: type for name, type in existing.items() if name not in changed}
+
+    if not dry_run:
+        # Djongo sends bulk inserts as one unordered insert_many
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name, type=type) for name, type in added],
+            batch_size=len(batch)
+        )
+        names_by_type = defaultdict(list)
+        for name, (old_type, new_type) in changed.items():
+            names_by_type[new_type].append(name)
+        for type, names in names_by_type.items():
+            Ingredient.objects.filter(name__in=names).update(type=type)
+
+    return added, changed, unchanged
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports the ingredients of a JSON array of {"name", "food_group"} objects into the '
+        'catalogue, reading the file as a stream and inserting the new ingredients in bulk.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=os.getenv('ADD_INGREDIENTS_JSON_PATH'),
+            help='JSON file of the ingredients. Defaults to ADD_INGREDIENTS_JSON_PATH.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Ingredients looked up and inserted at a time.'
+        )
+        parser.add_argument(
+            '--default-type',
+            default=DEFAULT_TYPE,
+            help='Type of the ingredients without a food group.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print the ingredients that would be added or changed without changing them.'
+        )
+
+    def handle(self, *args, **options):
+        if not options['path']:
+            raise CommandError('Pass the JSON file or set ADD_INGREDIENTS_JSON_PATH.')
+        if options['batch_size'] < 1:
+            raise CommandError('The batch size must be positive.')
+
+        self.dry_run = options['dry_run']
+        self.counts = Counter()
+        self.start = perf_counter()
+        self.size = os.path.getsize(options['path'])
+        seen = set()
+        batch = {}
+        try:
+            with open(options['path'], 'r', encoding='utf-8-sig') as file:
+                for record in iter_json_array(file):
+                    ingredient = self.read_record(record, options['default_type'])
+                    if ingredient is None:
+                        self.counts['invalid'] += 1
+                        continue
+                    if ingredient[0] in seen:
+                        self.counts['duplicate'] += 1
+                        continue
+
+                    seen.add(ingredient[0])
+                    batch[ingredient[0]] = ingredient[1]
+                    if len(batch) == options['batch_size']:
+                        self.import_batch(batch, file)
+                        batch = {}
+
+                if batch:
+                    self.import_batch(batch, file)
+        except ValueError as error:
+            raise CommandError(f'Invalid JSON file: {error}')
+        finally:
+            # Bulk inserts and updates do not send the signals that invalidate the catalogue
+            if not self.dry_run and (self.counts['added'] or self.counts['changed']):
+                invalidate_caches()
+
+        summary = ', '.join(
+            f'{self.counts[count]} {count}'
+            for count in ('added', 'changed', 'unchanged', 'duplicate', 'invalid')
+        )
+        prefix = 'Dry run: ' if self.dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}{summary} in {perf_counter() - self.start:.1f}s'
+        ))
+
+    def read_record(self, record: object, default_type: str) -> tuple[str, str]:
+        """
+        Reads the name and type of an ingredient of the file.
+
+        Returns:
+            Tuple of the name and type, or None if the record is not a valid ingredient.
+        """
+        if not isinstance(record, dict) or not isinstance(record.get('name'), str):
+            return None
+
+        name = record['name'].strip()
+        type = record.get('food_group') or default_type
+        if not name or len(name) > NAME_LENGTH:
+            return None
+        if not isinstance(type, str) or len(type) > TYPE_LENGTH:
+            return None
+
+        return name, type
+
+    def import_batch(self, batch: dict[str, str], file: IO[str]):
+        """
+        Imports a batch, prints the differences in a dry run, and reports the progress.
+        """
+        added, changed, unchanged = import_batch(batch, self.dry_run)
+        self.counts['added'] += len(added)
+        self.counts['changed'] += len(changed)
+        self.counts['unchanged'] += len(unchanged)
+
+        if self.dry_run:
+            for name, type in added:
+                self.stdout.write(f'+ {name} ({type})')
+            for name, (old_type, new_type) in changed.items():
+                self.stdout.write(f'~ {name} ({old_type} -> {new_type})')
+
+        imported = sum(self.counts.values())
+        seconds = perf_counter() - self.start
+        self.stderr.write(
+            f'{file.buffer.tell() / max(self.size, 1):6.1%}  {imported} ingredients '
+            f'({imported / max(seconds, 1e-9):.0f}/s)'
+        )
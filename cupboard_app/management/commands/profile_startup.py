@@ -0,0 +1,199 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Seconds from importing wsgi.py to the end of the first request
+STARTUP_BUDGET = 3.0
+# Modules that must not be imported until a request needs them
+LAZY_MODULES = [
+    'cupboard_app.auth0_authentication',
+    'drf_spectacular.views',
+]
+FIRST_REQUEST_PATH = '/api/v3/measurements'
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+# Script run in a new interpreter with -X importtime so nothing is imported beforehand.
+# Prints the wall-clock time of each startup phase and the imported modules as JSON.
+BOOT_SCRIPT = '''
+import io
+import json
+import sys
+from time import perf_counter
+
+phases = []
+start = perf_counter()
+
+def phase(name):
+    global start
+    now = perf_counter()
+    phases.append((name, now - start))
+    start = now
+
+import django
+from django.conf import settings
+settings.INSTALLED_APPS
+phase('settings')
+
+django.setup(set_prefix=False)
+phase('apps')
+
+from cupboard_backend.wsgi import application
+phase('wsgi')
+
+def request(path):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': settings.ALLOWED_HOSTS[0],
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+    }
+    return b''.join(application(environ, lambda status, headers: None))
+
+request(sys.argv[1])
+phase('first request')
+
+request(sys.argv[1])
+phase('second request')
+
+print(json.dumps({'phases': phases, 'modules': sorted(sys.modules)}))
+'''
+
+
+def parse_import_times(output: str) -> list[tuple[str, int, int]]:
+    """
+    Parses the output of python -X importtime.
+
+    Args:
+        output: The standard error of the interpreter
+
+    Returns:
+        List of the (module, self time, cumulative time) tuples in microseconds.
+    """
+    imports = []
+    for line in output.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            imports.append((match[4], int(match[1]), int(match[2])))
+
+    return imports
+
+
+def profile_startup(path: str = FIRST_REQUEST_PATH) -> dict:
+    """
+    Starts the app in a new interpreter and times its startup up to the first request.
+
+    Args:
+        path: Path of the first request
+
+    Returns:
+        Dictionary of the startup profile in the form of:
+        {
+            'phases': [(phase name, seconds)],
+            'imports': [(module, self time, cumulative time)],
+            'modules': [names of the modules imported by the end of the first request]
+        }
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT, path],
+        cwd=settings.BASE_DIR,
+        env={**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)},
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise CommandError(f'The app failed to start:\n{result.stderr[-2000:]}')
+
+    profile = json.loads(result.stdout.strip().splitlines()[-1])
+    profile['imports'] = parse_import_times(result.stderr)
+
+    return profile
+
+
+def get_startup_time(profile: dict) -> float:
+    """
+    Gets the seconds from importing wsgi.py to the end of the first request.
+
+    Args:
+        profile: The startup profile from profile_startup
+
+    Returns:
+        The startup time in seconds.
+    """
+    return sum(seconds for name, seconds in profile['phases'] if name != 'second request')
+
+
+class Command(BaseCommand):
+    help = (
+        'Reports the import time of each package and the wall-clock time '
+        'of each startup phase from wsgi.py to the first request.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help='Number of packages and modules to report.'
+        )
+        parser.add_argument(
+            '--path',
+            default=FIRST_REQUEST_PATH,
+            help='Path of the first request.'
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help=(
+                'Exit with an error if startup takes longer than the budget '
+                'or a lazily loaded module is imported.'
+            )
+        )
+
+    def handle(self, *args, **options):
+        profile = profile_startup(options['path'])
+        top = options['top']
+
+        # Self times summed per top level package
+        packages = Counter()
+        for module, self_time, cumulative in profile['imports']:
+            packages[module.split('.')[0]] += self_time
+
+        self.stdout.write(f'Import time by package (top {top}):')
+        for package, self_time in packages.most_common(top):
+            self.stdout.write(f'  {self_time / 1000:9.1f}ms  {package}')
+
+        self.stdout.write(f'Slowest imports including their dependencies (top {top}):')
+        slowest = sorted(profile['imports'], key=lambda item: item[2], reverse=True)
+        for module, self_time, cumulative in slowest[:top]:
+            self.stdout.write(f'  {cumulative / 1000:9.1f}ms  {module}')
+
+        self.stdout.write('Startup phases:')
+        for name, seconds in profile['phases']:
+            self.stdout.write(f'  {seconds * 1000:9.1f}ms  {name}')
+
+        total = get_startup_time(profile)
+        self.stdout.write(f'Total to the first request: {total * 1000:.1f}ms')
+
+        problems = [
+            f'{module} was imported before it was needed'
+            for module in LAZY_MODULES if module in profile['modules']
+        ]
+        if total > STARTUP_BUDGET:
+            problems.append(f'Startup took longer than the budget of {STARTUP_BUDGET * 1000:.0f}ms')
+
+        for problem in problems:
+            self.stderr.write(self.style.WARNING(problem))
+        if problems and options['check']:
+            raise CommandError(f'{len(problems)} startup checks failed.')
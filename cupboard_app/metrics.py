@@ -0,0 +1,169 @@
+import hmac
+import os
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess
+)
+
+# Number of database calls in a request
+CALL_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+# View label of the requests that did not match any URL, so unknown paths do not add labels
+UNMATCHED_VIEW = 'unmatched'
+
+REQUESTS = Counter(
+    'cupboard_http_requests_total',
+    'Requests by view, method and status code.',
+    ['view', 'method', 'status']
+)
+REQUEST_DURATION = Histogram(
+    'cupboard_http_request_duration_seconds',
+    'Request latency by view and method.',
+    ['view', 'method']
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'cupboard_http_requests_in_flight',
+    'Requests being handled by the workers.',
+    multiprocess_mode='livesum'
+)
+DB_QUERIES = Histogram(
+    'cupboard_db_queries_per_request',
+    'Django ORM queries per request by view.',
+    ['view'],
+    buckets=CALL_BUCKETS
+)
+MONGO_COMMANDS = Histogram(
+    'cupboard_mongo_commands_per_request',
+    'MongoDB commands per request by view.',
+    ['view'],
+    buckets=CALL_BUCKETS
+)
+MONGO_DURATION = Histogram(
+    'cupboard_mongo_duration_seconds_per_request',
+    'Time spent in MongoDB commands per request by view.',
+    ['view']
+)
+CACHE_LOOKUPS = Counter(
+    'cupboard_cache_lookups_total',
+    'Cache lookups by cache, namespace and result (local, shared or miss).',
+    ['cache', 'namespace', 'result']
+)
+AUTH0_DURATION = Histogram(
+    'cupboard_auth0_request_duration_seconds',
+    'Latency of the calls to Auth0 by endpoint.',
+    ['endpoint']
+)
+
+
+def record_cache_lookup(cache: str, result: str, namespace: str = ''):
+    """
+    Counts a cache lookup for the hit ratio of the cache.
+
+    Args:
+        cache: Name of the cache
+        result: 'local' or 'shared' for a hit in that level, or 'miss'
+        namespace: Namespace of the key in the cache
+    """
+    CACHE_LOOKUPS.labels(cache=cache, namespace=namespace, result=result).inc()
+
+
+def time_auth0(endpoint: str):
+    """
+    Times a call to Auth0.
+
+    Args:
+        endpoint: Name of the Auth0 endpoint, i.e. 'token'
+
+    Returns:
+        Context manager timing the block.
+    """
+    return AUTH0_DURATION.labels(endpoint=endpoint).time()
+
+
+def instrument_jwks_client():
+    """
+    Times the JSON Web Key Set downloads of the token backend, which happen
+    on a worker's first request and whenever the cached keys expire.
+    """
+    from rest_framework_simplejwt.state import token_backend
+
+    client = getattr(token_backend, 'jwks_client', None)
+    if client is None:
+        return
+
+    fetch_data = client.fetch_data
+
+    def timed_fetch_data(*args, **kwargs):
+        with time_auth0('jwks'):
+            return fetch_data(*args, **kwargs)
+
+    client.fetch_data = timed_fetch_data
+
+
+def observe_request(
+    view: str,
+    method: str,
+    status: int,
+    duration: float,
+    queries: int,
+    mongo_commands: int,
+    mongo_duration: float
+):
+    """
+    Records a handled request.
+
+    Args:
+        view: URL name of the view
+        method: HTTP method
+        status: Response status code
+        duration: Seconds taken to handle the request
+        queries: Django ORM queries made by the request
+        mongo_commands: MongoDB commands sent by the request
+        mongo_duration: Seconds spent in the MongoDB commands
+    """
+    REQUESTS.labels(view=view, method=method, status=str(status)).inc()
+    REQUEST_DURATION.labels(view=view, method=method).observe(duration)
+    DB_QUERIES.labels(view=view).observe(queries)
+    MONGO_COMMANDS.labels(view=view).observe(mongo_commands)
+    MONGO_DURATION.labels(view=view).observe(mongo_duration)
+
+
+def get_registry() -> CollectorRegistry:
+    """
+    Gets the registry to export. When running several gunicorn workers, each worker
+    writes its metrics to PROMETHEUS_MULTIPROC_DIR and they are summed on export.
+
+    Returns:
+        The CollectorRegistry of the metrics.
+    """
+    if not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+
+    return registry
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """
+    Exports the metrics of every worker in the Prometheus text format.
+    Requires the METRICS_TOKEN bearer token, and is disabled if it is not set.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        return HttpResponse(status=403)
+
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode()):
+        return HttpResponse(status=401)
+
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
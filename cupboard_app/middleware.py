@@ -0,0 +1,425 @@
+import gzip
+import json
+import logging
+import random
+import re
+import sys
+from collections import OrderedDict
+from hashlib import blake2b
+from threading import Lock
+from time import perf_counter
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from cupboard_app.db_stats import collect_query_stats
+from cupboard_app.metrics import (
+    REQUESTS_IN_FLIGHT,
+    UNMATCHED_VIEW,
+    observe_request,
+    record_cache_lookup
+)
+from cupboard_app.request_timing import (
+    AUTH_PHASE,
+    QUERIES_PHASE,
+    RENDER_PHASE,
+    SERIALIZE_PHASE,
+    collect_request_timings
+)
+from cupboard_app.sampling_profiler import ProfileRateLimiter, ProfileStore, get_stack_sampler
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+timing_logger = logging.getLogger('cupboard_app.timing')
+
+COMPRESSIBLE_CONTENT_TYPE = re.compile(r'^(text/|application/([\w.+-]*\+)?(json|yaml|xml))')
+
+# Encoders of each supported content coding in order of preference.
+# Each encoder is a tuple of (compress function, level for each response,
+# level for cached payloads). Cached payloads are compressed only once
+# so they use a slower level with a better ratio.
+ENCODERS = OrderedDict()
+if zstandard:
+    ENCODERS['zstd'] = (
+        lambda content, level: zstandard.ZstdCompressor(level=level).compress(content),
+        3,
+        19
+    )
+if brotli:
+    ENCODERS['br'] = (
+        lambda content, level: brotli.compress(content, quality=level),
+        4,
+        11
+    )
+ENCODERS['gzip'] = (
+    lambda content, level: gzip.compress(content, compresslevel=level, mtime=0),
+    6,
+    9
+)
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    """
+    Parses the Accept-Encoding header into the quality value of each content coding.
+
+    Args:
+        header: The Accept-Encoding header value
+
+    Returns:
+        Dictionary of content coding to its quality value.
+    """
+    accepted = {}
+    for part in header.split(','):
+        coding, *params = [value.strip() for value in part.split(';')]
+        if not coding:
+            continue
+
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.lower()] = quality
+
+    return accepted
+
+
+def choose_encoding(header: str) -> str | None:
+    """
+    Chooses the supported content coding the client prefers, breaking ties
+    with the server's order of preference.
+
+    Args:
+        header: The Accept-Encoding header value
+
+    Returns:
+        The content coding or None if the client accepts none of them.
+    """
+    accepted = parse_accept_encoding(header)
+    best = None
+    best_quality = 0.0
+    for coding in ENCODERS:
+        quality = accepted.get(coding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best = coding
+            best_quality = quality
+
+    return best
+
+
+class CompressedPayloadCache:
+    """
+    Least recently used cache of compressed payloads keyed by the content coding
+    and the hash of the uncompressed bytes, bounded by the total compressed size.
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get_or_compress(self, coding: str, content: bytes) -> bytes:
+        """
+        Gets the compressed payload, compressing and storing it if it is not cached.
+
+        Args:
+            coding: The content coding
+            content: The uncompressed bytes
+
+        Returns:
+            The compressed bytes.
+        """
+        key = (coding, blake2b(content, digest_size=16).digest())
+        with self.lock:
+            compressed = self.entries.get(key)
+            if compressed is not None:
+                self.entries.move_to_end(key)
+        if compressed is not None:
+            record_cache_lookup('compressed_payloads', 'local')
+            return compressed
+
+        record_cache_lookup('compressed_payloads', 'miss')
+
+        compress, level, cached_level = ENCODERS[coding]
+        compressed = compress(content, cached_level)
+        if len(compressed) > self.max_size:
+            return compressed
+
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = compressed
+                self.size += len(compressed)
+            while self.size > self.max_size:
+                oldest, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+        return compressed
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+class CompressionMiddleware:
+    """
+    Compresses API responses larger than COMPRESSION_MIN_SIZE with the best
+    content coding the client accepts. Responses marked with cache_compressed
+    reuse the compressed payload of identical responses.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cache = CompressedPayloadCache(settings.COMPRESSION_CACHE_MAX_SIZE)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        response = self.get_response(request)
+
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or not COMPRESSIBLE_CONTENT_TYPE.match(response.get('Content-Type', ''))
+            or len(response.content) < settings.COMPRESSION_MIN_SIZE
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if not coding:
+            return response
+
+        if getattr(response, 'cache_compressed', False):
+            compressed = self.cache.get_or_compress(coding, response.content)
+        else:
+            compress, level, cached_level = ENCODERS[coding]
+            compressed = compress(response.content, level)
+
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = coding
+
+        # The compressed bytes differ from the original so a strong ETag becomes weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = f'W/{etag}'
+
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, status and database calls of every request
+    by the URL name of its view for the /metrics endpoint.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        REQUESTS_IN_FLIGHT.inc()
+        start = perf_counter()
+        status = 500
+        try:
+            with collect_query_stats() as stats:
+                response = self.get_response(request)
+            status = response.status_code
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            match = request.resolver_match
+            observe_request(
+                view=match.view_name if match else UNMATCHED_VIEW,
+                method=request.method,
+                status=status,
+                duration=perf_counter() - start,
+                queries=stats.queries,
+                mongo_commands=stats.mongo_commands,
+                mongo_duration=stats.mongo_duration
+            )
+
+        return response
+
+
+def add_server_timing(
+    response: HttpResponse,
+    name: str,
+    seconds: float,
+    description: str = None
+):
+    """
+    Adds a metric to the Server-Timing header of a response unless the header already has it.
+
+    Args:
+        response: The response
+        name: Name of the metric
+        seconds: Duration of the metric
+        description: Description of the metric shown by the browser
+    """
+    header = response.get('Server-Timing')
+    if header and name in (entry.split(';')[0].strip() for entry in header.split(',')):
+        return
+
+    entry = f'{name};dur={seconds * 1000:.1f}'
+    if description:
+        entry += f';desc="{description}"'
+    response['Server-Timing'] = f'{header}, {entry}' if header else entry
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised when a request goes over its query budget while QUERY_BUDGET_ENFORCED is set.
+    """
+
+
+def get_query_budget(view: str) -> int:
+    """
+    Gets the number of database queries a view may make in a request.
+
+    Args:
+        view: URL name of the view
+
+    Returns:
+        The budget of the view in QUERY_BUDGETS, or QUERY_BUDGET if it has none.
+    """
+    return settings.QUERY_BUDGETS.get(view, settings.QUERY_BUDGET)
+
+
+class QueryBudgetMiddleware:
+    """
+    Reports the requests that make more database queries than the budget of their view
+    or run the same query more than REPEATED_QUERY_LIMIT times, usually once per object
+    of a list (N+1 queries). They are logged as warnings with a Server-Timing header of
+    their database time, or raise QueryBudgetExceeded when QUERY_BUDGET_ENFORCED is set
+    so the API tests fail.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        with collect_query_stats() as stats:
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        view = match.view_name if match else UNMATCHED_VIEW
+        budget = get_query_budget(view)
+
+        problems = []
+        if stats.queries > budget:
+            problems.append(f'{stats.queries} queries over the budget of {budget}')
+        for shape, count in stats.get_repeated_queries(settings.REPEATED_QUERY_LIMIT):
+            problems.append(f'{count} times the query {shape}')
+
+        if problems:
+            message = f'{request.method} {request.path} ({view}): ' + '; '.join(problems)
+            if settings.QUERY_BUDGET_ENFORCED:
+                raise QueryBudgetExceeded(message)
+
+            logger.warning(message)
+            add_server_timing(response, 'db', stats.query_duration, f'{stats.queries} queries')
+
+        return response
+
+
+class SamplingProfilerMiddleware:
+    """
+    Samples the stacks of 1 in PROFILER_SAMPLE_RATE requests and of every request slower
+    than PROFILER_SLOW_THRESHOLD seconds (unless it is 0), and writes them as collapsed
+    stacks in a directory for each view under PROFILER_DIR. The other requests are only
+    sampled once they run past the threshold, so fast requests are never sampled. Each
+    view keeps at most PROFILER_MAX_PER_MINUTE profiles a minute, PROFILER_MAX_FILES
+    profiles and none older than PROFILER_RETENTION.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limiter = ProfileRateLimiter(settings.PROFILER_MAX_PER_MINUTE)
+        self.store = ProfileStore(
+            settings.PROFILER_DIR,
+            settings.PROFILER_MAX_FILES,
+            settings.PROFILER_RETENTION
+        )
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        sampled = random.randrange(settings.PROFILER_SAMPLE_RATE) == 0
+        slow_threshold = settings.PROFILER_SLOW_THRESHOLD
+        if not sampled and not slow_threshold:
+            return self.get_response(request)
+
+        sampler = get_stack_sampler()
+        sampler.start(sys._getframe(), 0 if sampled else slow_threshold)
+        start = perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            duration = perf_counter() - start
+            stacks = sampler.stop()
+
+            match = request.resolver_match
+            view = match.view_name if match else UNMATCHED_VIEW
+            slow = bool(slow_threshold) and duration >= slow_threshold
+            if stacks and (sampled or slow) and self.limiter.allow(view):
+                self.store.save(view, request.method, duration, stacks)
+
+
+class ServerTimingMiddleware:
+    """
+    Adds the time spent authenticating, in queries.py, in the database, serializing and
+    rendering to the Server-Timing header of each response, and logs them as JSON.
+    Installed when SERVER_TIMING is set.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        start = perf_counter()
+        with collect_query_stats() as stats, collect_request_timings() as timings:
+            response = self.get_response(request)
+        total = perf_counter() - start
+
+        metrics = []
+        for phase in (AUTH_PHASE, QUERIES_PHASE, SERIALIZE_PHASE, RENDER_PHASE):
+            if phase in timings.phases:
+                seconds, calls = timings.phases[phase]
+                metrics.append((phase, seconds, calls, f'{calls} calls'))
+        metrics.append(('db', stats.query_duration, stats.queries, f'{stats.queries} queries'))
+        metrics.append((
+            'mongo',
+            stats.mongo_duration,
+            stats.mongo_commands,
+            f'{stats.mongo_commands} commands'
+        ))
+        metrics.append(('total', total, 1, None))
+
+        for name, seconds, calls, description in metrics:
+            add_server_timing(response, name, seconds, description)
+
+        match = request.resolver_match
+        timing_logger.info(json.dumps({
+            'event': 'request_timing',
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else UNMATCHED_VIEW,
+            'status': response.status_code,
+            'phases': {
+                name: {'ms': round(seconds * 1000, 2), 'calls': calls}
+                for name, seconds, calls, description in metrics
+            },
+            'queries': {
+                function: {'ms': round(seconds * 1000, 2), 'calls': calls}
+                for function, (seconds, calls) in timings.functions.items()
+            }
+        }))
+
+        return response
@@ -0,0 +1,56 @@
+# Generated by Django 3.2.14 on 2026-10-19 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cupboard_app', '0003_change_list_ingredients'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListIngredient',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID'
+                    )
+                ),
+                ('ingredient_name', models.CharField(max_length=30)),
+                ('ingredient_type', models.CharField(max_length=30)),
+                ('amount', models.FloatField()),
+                ('unit', models.CharField(max_length=30)),
+                ('is_custom_ingredient', models.BooleanField(default=False)),
+                (
+                    'user',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to='cupboard_app.user'
+                    )
+                ),
+                (
+                    'user_list',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to='cupboard_app.userlistingredients'
+                    )
+                ),
+            ],
+        ),
+        # Added as a separate operation so djongo issues an ALTER TABLE and
+        # MongoDB builds the compound unique index
+        migrations.AddConstraint(
+            model_name='listingredient',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'user_list', 'ingredient_name', 'unit', 'is_custom_ingredient'),
+                name='unique_list_ingredient'
+            ),
+        ),
+    ]
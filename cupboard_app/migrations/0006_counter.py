@@ -0,0 +1,29 @@
+# Generated by Django 3.2.14 on 2026-10-19 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cupboard_app', '0005_sync_revisions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID'
+                    )
+                ),
+                ('name', models.CharField(max_length=30, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
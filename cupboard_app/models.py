@@ -2,6 +2,8 @@ import json
 
 from django.db import models
 from django.core.exceptions import ValidationError
+from djongo.models import DjongoManager
+from pymongo import ReturnDocument
 
 
 class Message():
@@ -34,9 +36,33 @@ class Measurement(models.Model):
         return f'{self.unit}'
 
 
+class UserManager(DjongoManager):
+    def next_revision(self, user_id: int) -> int:
+        """
+        Atomically increments the user's revision counter.
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            The new revision number for the user.
+        """
+        result = self.mongo_find_one_and_update(
+            {'id': user_id},
+            {'$inc': {'revision': 1}},
+            projection={'revision': True},
+            return_document=ReturnDocument.AFTER
+        )
+        return result['revision']
+
+
 class User(models.Model):
     username = models.CharField(max_length=30, unique=True)
     email = models.CharField(max_length=100, unique=True)
+    # Last revision given to any of the user's lists, recipes or custom ingredients
+    revision = models.BigIntegerField(default=0)
+
+    objects = UserManager()
 
     def __str__(self):
         my_dictionary = {'username': self.username, 'email': self.email}
@@ -44,7 +70,131 @@ class User(models.Model):
         return result
 
 
-class UserListIngredients(models.Model):
+class CounterManager(DjongoManager):
+    def increment(self, name: str) -> int:
+        """
+        Atomically increments a counter, creating it the first time.
+
+        Args:
+            name: Name of the counter
+
+        Returns:
+            The new value of the counter.
+        """
+        result = self.mongo_find_one_and_update(
+            {'name': name},
+            {'$inc': {'value': 1}},
+            projection={'value': True},
+            return_document=ReturnDocument.AFTER
+        )
+        if result is None:
+            # Created with the ORM so the document gets an id like the others
+            self.get_or_create(name=name)
+            return self.increment(name)
+
+        return result['value']
+
+    def get_value(self, name: str) -> int:
+        """
+        Gets the value of a counter, which is 0 until it is first incremented.
+
+        Args:
+            name: Name of the counter
+
+        Returns:
+            The counter's value.
+        """
+        return self.filter(name=name).values_list('value', flat=True).first() or 0
+
+
+class Counter(models.Model):
+    # Counts the changes of data that every process keeps a copy of, i.e. the reference data
+    name = models.CharField(max_length=30, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    objects = CounterManager()
+
+    def __str__(self):
+        return f'{self.name}: {self.value}'
+
+
+class Tombstone(models.Model):
+    # Records a deleted list, recipe or custom ingredient for syncing clients
+    LIST = 'list'
+    RECIPE = 'recipe'
+    CUSTOM_INGREDIENT = 'custom_ingredient'
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=30)
+    name = models.CharField(max_length=50)
+    revision = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.kind} {self.name} deleted at revision {self.revision}'
+
+
+class RevisionedModel(models.Model):
+    """
+    Stamps the document with the user's next revision on every save
+    and leaves a tombstone when it is deleted.
+
+    Concrete models set TOMBSTONE_KIND to the kind of their tombstones and SYNC_NAME
+    to the path of the attribute that names the document for syncing clients,
+    e.g. 'list_name.list_name'.
+    """
+    TOMBSTONE_KIND = None
+    SYNC_NAME = None
+
+    revision = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Compares revisions in the update filter with pymongo, see queries.save_if_unchanged
+    objects = DjongoManager()
+
+    class Meta:
+        abstract = True
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.TOMBSTONE_KIND is None or cls.SYNC_NAME is None:
+            raise TypeError(f'{cls.__name__} must set TOMBSTONE_KIND and SYNC_NAME.')
+
+    def save(self, *args, **kwargs):
+        self.revision = User.objects.next_revision(self.user_id)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'revision', 'updated_at'}
+        super().save(*args, **kwargs)
+
+    def touch(self):
+        """
+        Gives the document a new revision without changing anything else.
+        """
+        self.save(update_fields=[])
+
+    def delete(self, *args, **kwargs):
+        Tombstone.objects.create(
+            user_id=self.user_id,
+            kind=self.TOMBSTONE_KIND,
+            name=self.get_sync_name(),
+            revision=User.objects.next_revision(self.user_id)
+        )
+        return super().delete(*args, **kwargs)
+
+    def get_sync_name(self) -> str:
+        """
+        Gets the name of the document that syncing clients know it by.
+        """
+        value = self
+        for name in self.SYNC_NAME.split('.'):
+            value = getattr(value, name)
+        return value
+
+
+class UserListIngredients(RevisionedModel):
+    TOMBSTONE_KIND = Tombstone.LIST
+    SYNC_NAME = 'list_name.list_name'
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     list_name = models.ForeignKey(ListName, on_delete=models.CASCADE)
     ingredients = models.JSONField()
@@ -53,7 +203,10 @@ class UserListIngredients(models.Model):
         return f'{self.user.username} - {self.list_name.list_name}'
 
 
-class Recipe(models.Model):
+class Recipe(RevisionedModel):
+    TOMBSTONE_KIND = Tombstone.RECIPE
+    SYNC_NAME = 'recipe_name'
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     recipe_name = models.CharField(max_length=50)
     steps = models.JSONField()
@@ -63,7 +216,10 @@ class Recipe(models.Model):
         return f'{self.recipe_name} by {self.user.username}'
 
 
-class CustomIngredient(models.Model):
+class CustomIngredient(RevisionedModel):
+    TOMBSTONE_KIND = Tombstone.CUSTOM_INGREDIENT
+    SYNC_NAME = 'name'
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=30)
     type = models.CharField(max_length=30)
@@ -81,3 +237,27 @@ class CustomIngredient(models.Model):
         my_dictionary = {'name': self.name, 'type': self.type}
         result = json.dumps(my_dictionary)
         return result
+
+
+class ListIngredient(models.Model):
+    # A single ingredient in a user's list when lists use the normalized storage mode
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    user_list = models.ForeignKey(UserListIngredients, on_delete=models.CASCADE)
+    ingredient_name = models.CharField(max_length=30)
+    ingredient_type = models.CharField(max_length=30)
+    amount = models.FloatField()
+    unit = models.CharField(max_length=30)
+    is_custom_ingredient = models.BooleanField(default=False)
+
+    objects = DjongoManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'user_list', 'ingredient_name', 'unit', 'is_custom_ingredient'],
+                name='unique_list_ingredient'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user_list} - {self.ingredient_name} ({self.unit})'
@@ -0,0 +1,154 @@
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as DecodeError
+
+from django.db.models import Q
+from django.db.models.query import QuerySet
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Forward only cursor pagination over a unique ordering of fields.
+
+    The cursor holds the ordering values of the last item on the page, so each page
+    is a range query on the ordering index no matter how deep the client pages,
+    and items added or removed between requests do not shift the pages.
+    """
+    ordering = None
+    # Types of the ordering values, so a cursor that was not made by the paginator is refused
+    ordering_types = None
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view=None) -> list:
+        """
+        Gets the page of the queryset after the request's cursor.
+
+        Args:
+            queryset: The queryset to paginate
+            request: The rest framework Request object
+            view: The view paginating the queryset
+
+        Returns:
+            List of the objects in the page.
+        """
+        self.request = request
+        self.limit = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self.after(cursor))
+
+        # Fetch one more than the page size to know if there is a next page
+        page = list(queryset[:self.limit + 1])
+        self.has_next = len(page) > self.limit
+        page = page[:self.limit]
+        self.last_position = (
+            [getattr(page[-1], field) for field in self.ordering] if page else None
+        )
+
+        return page
+
+    def after(self, cursor: list) -> Q:
+        """
+        Builds the filter for the objects after the cursor position, i.e. for
+        ordering (type, name): type > t OR (type = t AND name > n)
+        """
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            equal = {self.ordering[j]: cursor[j] for j in range(i)}
+            condition |= Q(**equal, **{f'{field}__gt': cursor[i]})
+
+        return condition
+
+    def get_page_size(self, request: Request) -> int:
+        """
+        Gets the page size from the request, bounded by the max page size.
+        """
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        return max(1, min(page_size, self.max_page_size))
+
+    def decode_cursor(self, request: Request) -> list | None:
+        """
+        Decodes the cursor query parameter into the ordering values.
+
+        Raises:
+            ValidationError: If the cursor is not a list of the ordering values.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            cursor = json.loads(b64decode(encoded.encode('ascii')).decode('utf8'))
+        except (DecodeError, UnicodeError, ValueError):
+            raise ValidationError({'detail': self.invalid_cursor_message})
+
+        if (
+            not isinstance(cursor, list)
+            or len(cursor) != len(self.ordering)
+            or not all(
+                isinstance(value, value_type)
+                for value, value_type in zip(cursor, self.ordering_types)
+            )
+        ):
+            raise ValidationError({'detail': self.invalid_cursor_message})
+
+        return cursor
+
+    def encode_cursor(self, position: list) -> str:
+        """
+        Encodes the ordering values into the cursor query parameter.
+        """
+        return b64encode(json.dumps(position).encode('utf8')).decode('ascii')
+
+    def get_next_cursor(self) -> str | None:
+        """
+        Gets the cursor of the next page or None if this is the last page.
+        """
+        if not self.has_next:
+            return None
+
+        return self.encode_cursor(self.last_position)
+
+    def get_link(self, request: Request, cursor: str | None) -> str | None:
+        """
+        Gets the url of the request with the given cursor, so a cached page's cursor
+        is turned into a link for the host and query of the request being answered.
+
+        Args:
+            request: The rest framework Request object
+            cursor: The encoded cursor, or None if there is no page
+
+        Returns:
+            The url of the page or None if there is no cursor.
+        """
+        if cursor is None:
+            return None
+
+        return replace_query_param(request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_next_link(self) -> str | None:
+        """
+        Gets the url for the next page or None if this is the last page.
+        """
+        return self.get_link(self.request, self.get_next_cursor())
+
+
+class IngredientCursorPagination(KeysetCursorPagination):
+    # Ingredient names are unique so (type, name) is a stable total ordering
+    ordering = ('type', 'name')
+    ordering_types = (str, str)
@@ -1,14 +1,35 @@
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Model, Q
 from django.db.models.query import QuerySet
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.client_session import ClientSession
+from pymongo.errors import PyMongoError
 
+from cupboard_app.exceptions import PreconditionFailed, WriteConflict
+from cupboard_app.ingredient_search import invalidate_ingredient_index
 from cupboard_app.models import (
     Ingredient,
     ListName,
+    ListIngredient,
     Measurement,
+    RevisionedModel,
+    Tombstone,
     User,
     UserListIngredients,
     Recipe,
     CustomIngredient
 )
+from cupboard_app.custom_ingredient_cache import (
+    custom_ingredients_changed,
+    get_cached_custom_ingredients
+)
+from cupboard_app.reference_data import get_reference_data
+from cupboard_app.request_timing import timed_query
+from cupboard_app.tiered_cache import USERS_NAMESPACE, cached
 
 MAX_LISTS = 10
 GROCERY_LIST_NAME = 'Grocery'
@@ -23,8 +44,426 @@ CANNOT_CREATE_INGREDIENT = (
     'already exists in the common ingredients. '
     'Please use the common ingredient instead.'
 )
+INVALID_SYNC_TOKEN = 'Invalid sync token.'
+PARTLY_APPLIED = (
+    'Conflict, the change was partly applied because another request changed '
+    'the resource at the same time. Please reload it before trying again.'
+)
+# Writes get their revision just before they are saved, so documents saved within
+# this window before a sync token was issued are sent again on the next sync
+SYNC_GRACE_PERIOD = timedelta(seconds=10)
+EMBEDDED_STORAGE = 'embedded'
+NORMALIZED_STORAGE = 'normalized'
+LIST_INGREDIENT_FIELDS = [
+    'ingredient_name',
+    'ingredient_type',
+    'amount',
+    'unit',
+    'is_custom_ingredient'
+]
+MAX_TRANSACTION_ATTEMPTS = 3
+# Times a read, change and save is run again when another request changed the document
+MAX_WRITE_ATTEMPTS = 5
+# Labels MongoDB gives errors of transactions that are safe to run again
+TRANSIENT_ERROR_LABELS = ('TransientTransactionError', 'UnknownTransactionCommitResult')
+# MongoDB error code for transactions on a standalone server, i.e. a local database
+TRANSACTIONS_NOT_SUPPORTED = 20
+
+
+@timed_query
+def run_in_transaction(
+    write: Callable[[ClientSession], None],
+    write_without_transaction: Callable[[], None]
+):
+    """
+    Runs the MongoDB writes in a transaction so they are all applied or none are.
+    Retries the transaction on transient errors. Servers that do not support
+    transactions run write_without_transaction instead, which must undo its own
+    writes when it fails part way.
+
+    Args:
+        write: Function that does the writes with the given session
+        write_without_transaction: Function that does the writes without a session
+    """
+    connection.ensure_connection()
+    for attempt in range(1, MAX_TRANSACTION_ATTEMPTS + 1):
+        try:
+            with connection.client_connection.start_session() as session:
+                with session.start_transaction():
+                    write(session)
+            return
+        except PyMongoError as e:
+            if getattr(e, 'code', None) == TRANSACTIONS_NOT_SUPPORTED:
+                write_without_transaction()
+                return
+            if (
+                attempt == MAX_TRANSACTION_ATTEMPTS
+                or not any(e.has_error_label(label) for label in TRANSIENT_ERROR_LABELS)
+            ):
+                raise
+
+
+def _mongo_values(instance: Model, field_names: list[str]) -> dict:
+    """
+    Converts the model fields to the values djongo stores in MongoDB.
+
+    Args:
+        instance: The model object
+        field_names: Names of the fields to convert
+
+    Returns:
+        Dictionary of the document field to its stored value.
+    """
+    values = {}
+    for name in field_names:
+        field = instance._meta.get_field(name)
+        values[field.column] = field.get_db_prep_save(getattr(instance, field.attname), connection)
+
+    return values
+
+
+class StaleDocument(Exception):
+    """
+    A document was changed by another request after it was read.
+    """
+
+
+@timed_query
+def save_if_unchanged(documents: list[RevisionedModel], field_names: list[str]) -> bool:
+    """
+    Saves the fields of the documents only if none of them were changed since they
+    were read, by comparing their revisions in the update filter. Several documents
+    are saved with a single bulk write in a transaction, so a change across
+    documents is never half applied.
+
+    On servers without transactions the documents are saved one at a time, and the
+    ones already saved are put back if a later one was changed, so nothing is applied
+    when False is returned.
+
+    Args:
+        documents: The documents to save, all of the same model
+        field_names: Names of the fields to save
+
+    Returns:
+        True if the documents were saved, False if another request changed any of them.
+
+    Raises:
+        WriteConflict: If a saved document could not be put back because another
+            request changed it in between. The change is then partly applied and
+            must not be run again.
+    """
+    model = type(documents[0])
+    updates = []
+    for document in documents:
+        read_revision = document.revision
+        document.revision = User.objects.next_revision(document.user_id)
+        document.updated_at = datetime.now(timezone.utc)
+        updates.append((
+            {'id': document.id, 'revision': read_revision},
+            _mongo_values(document, [*field_names, 'revision', 'updated_at'])
+        ))
+
+    def write(session: ClientSession | None):
+        result = model.objects.mongo_bulk_write(
+            [UpdateOne(filter, {'$set': values}) for filter, values in updates],
+            ordered=True,
+            session=session
+        )
+        if result.matched_count != len(updates):
+            # Aborts the transaction
+            raise StaleDocument()
+
+    def write_in_order():
+        saved = []
+        for filter, values in updates:
+            previous = model.objects.mongo_find_one_and_update(
+                filter,
+                {'$set': values},
+                projection=list(values),
+                return_document=ReturnDocument.BEFORE
+            )
+            if previous is None:
+                _put_back(model, saved)
+                raise StaleDocument()
+            saved.append((filter['id'], values, previous))
+
+    try:
+        if len(updates) == 1:
+            # Updates of a single document are already atomic
+            write(None)
+        else:
+            run_in_transaction(write, write_in_order)
+    except StaleDocument:
+        return False
 
+    return True
+
+
+def _put_back(model: type[RevisionedModel], saved: list[tuple[int, dict, dict]]):
+    """
+    Puts back the fields of documents saved without a transaction, newest first,
+    as long as no other request changed them since.
+
+    Args:
+        model: Model of the documents
+        saved: List of (ID, saved values, previous document) of each saved document
+
+    Raises:
+        WriteConflict: If another request changed a saved document before it was put back.
+    """
+    for id, values, previous in reversed(saved):
+        update = {'$set': {name: previous[name] for name in values if name in previous}}
+        missing = {name: '' for name in values if name not in previous}
+        if missing:
+            update['$unset'] = missing
+
+        result = model.objects.mongo_update_one({'id': id, 'revision': values['revision']}, update)
+        if not result.matched_count:
+            raise WriteConflict(PARTLY_APPLIED)
+
+
+def _check_if_match(document: RevisionedModel, if_match: list[int] | None):
+    """
+    Checks the document read for a change still has a revision of the client's
+    If-Match header. Saving it with save_if_unchanged then fails if it was changed
+    after this check, and the next attempt fails this check.
+
+    Args:
+        document: The document that was read
+        if_match: Revisions of the If-Match header, or None to skip the check
+
+    Raises:
+        PreconditionFailed: If the document's revision is not in the header.
+    """
+    if if_match is not None and document.revision not in if_match:
+        raise PreconditionFailed()
+
+
+def _claim_if_match(document: RevisionedModel, if_match: list[int] | None):
+    """
+    Checks the client's If-Match header and gives the document a new revision only if
+    it was not changed since, for changes that are not saved with save_if_unchanged.
+    Requests with the same If-Match header fail once the document is claimed.
+
+    Args:
+        document: The document that was read
+        if_match: Revisions of the If-Match header, or None to skip the check
+
+    Raises:
+        PreconditionFailed: If the document's revision is not in the header
+            or the document was changed since it was read.
+    """
+    if if_match is None:
+        return
+
+    _check_if_match(document, if_match)
+    if not save_if_unchanged([document], []):
+        raise PreconditionFailed()
+
+
+def is_normalized_storage() -> bool:
+    """
+    Checks if the user lists store each ingredient as its own document.
+
+    Returns:
+        True if LIST_INGREDIENTS_STORAGE is set to normalized, False otherwise.
+    """
+    return settings.LIST_INGREDIENTS_STORAGE == NORMALIZED_STORAGE
+
+
+@timed_query
+def get_list_items(user_list_ids: list[int]) -> dict[int, list[dict]]:
+    """
+    Reassembles the ingredient arrays of the given lists from the normalized
+    ListIngredient documents with a single aggregation.
+
+    Args:
+        user_list_ids: IDs of the UserListIngredients to reassemble
+
+    Returns:
+        Dictionary of list ID to the array of ingredient dictionaries in insertion order.
+    """
+    if not user_list_ids:
+        return {}
+
+    pipeline = [
+        {'$match': {'user_list_id': {'$in': list(user_list_ids)}}},
+        {'$sort': {'id': 1}},
+        {
+            '$group': {
+                '_id': '$user_list_id',
+                'ingredients': {
+                    '$push': {field: f'${field}' for field in LIST_INGREDIENT_FIELDS}
+                }
+            }
+        }
+    ]
+    result = ListIngredient.objects.mongo_aggregate(pipeline)
+
+    return {group['_id']: group['ingredients'] for group in result}
+
+
+@timed_query
+def attach_list_items(
+    user_lists: QuerySet | list[UserListIngredients]
+) -> list[UserListIngredients]:
+    """
+    Sets the ingredients of the given lists from the normalized ListIngredient
+    documents so the lists serialize the same as in the embedded storage mode.
+
+    Args:
+        user_lists: The user lists to set the ingredients for
+
+    Returns:
+        The user lists with their ingredient arrays set.
+    """
+    user_lists = [split_embedded_list_items(user_list) for user_list in user_lists]
+    items = get_list_items([user_list.id for user_list in user_lists])
+    for user_list in user_lists:
+        user_list.ingredients = items.get(user_list.id, [])
+
+    return user_lists
+
+
+@timed_query
+def split_embedded_list_items(user_list: UserListIngredients) -> UserListIngredients:
+    """
+    Moves any ingredients still embedded in the list document into their own
+    ListIngredient documents. Lets lists created in the embedded storage mode
+    be used after switching to the normalized storage mode.
 
+    Args:
+        user_list: The user list to split
+
+    Returns:
+        The user list with an empty embedded ingredient array.
+    """
+    if user_list.ingredients:
+        ListIngredient.objects.bulk_create([
+            ListIngredient(
+                user_id=user_list.user_id,
+                user_list=user_list,
+                **{field: ingredient.get(field) for field in LIST_INGREDIENT_FIELDS}
+            )
+            for ingredient in user_list.ingredients
+        ])
+        user_list.ingredients = []
+        user_list.save()
+
+    return user_list
+
+
+def _list_item_filter(
+    user_list_id: int,
+    ingredient_name: str,
+    unit: str,
+    is_custom_ingredient: bool
+) -> dict:
+    """
+    Gets the MongoDB filter of an ingredient document of a normalized list.
+    """
+    return {
+        'user_list_id': user_list_id,
+        'ingredient_name': ingredient_name,
+        'unit': unit,
+        'is_custom_ingredient': is_custom_ingredient
+    }
+
+
+def _increment_list_item(user_list: UserListIngredients, list_ingredient: dict):
+    """
+    Adds the amount to the ingredient document of a normalized list in one atomic
+    update, or creates the document if the list does not have the ingredient yet,
+    so concurrent adds of the same ingredient are never lost.
+
+    Args:
+        user_list: The user list to update
+        list_ingredient: The ingredient dictionary created by create_list_ingredient
+    """
+    filter = _list_item_filter(
+        user_list.id,
+        list_ingredient['ingredient_name'],
+        list_ingredient['unit'],
+        list_ingredient['is_custom_ingredient']
+    )
+    increment = {'$inc': {'amount': list_ingredient['amount']}}
+    if ListIngredient.objects.mongo_update_one(filter, increment).matched_count:
+        return
+
+    try:
+        ListIngredient.objects.create(
+            user_id=user_list.user_id,
+            user_list=user_list,
+            **list_ingredient
+        )
+    except DatabaseError:
+        # Another request created the document first, so add to it instead
+        if not ListIngredient.objects.mongo_update_one(filter, increment).matched_count:
+            raise
+
+
+def _decrement_list_item(
+    user_list: UserListIngredients,
+    ingredient_name: str,
+    unit: str,
+    is_custom_ingredient: bool,
+    amount: int | float
+) -> dict | None:
+    """
+    Removes an amount of an ingredient from a normalized list in one atomic update,
+    deleting the ingredient document if the whole amount is removed.
+
+    Args:
+        user_list: The user list to update
+        ingredient_name: Name of the ingredient
+        unit: The unit of measure for the ingredient
+        is_custom_ingredient: Whether the ingredient is custom
+        amount: Quantity of the ingredient to remove
+
+    Returns:
+        The ingredient dictionary with the amount that was removed,
+        or None if the list does not have the ingredient.
+    """
+    filter = _list_item_filter(user_list.id, ingredient_name, unit, is_custom_ingredient)
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        deleted = ListIngredient.objects.mongo_find_one_and_delete(
+            {**filter, 'amount': {'$lte': amount}},
+            projection=LIST_INGREDIENT_FIELDS
+        )
+        if deleted:
+            return {field: deleted[field] for field in LIST_INGREDIENT_FIELDS}
+
+        previous = ListIngredient.objects.mongo_find_one_and_update(
+            {**filter, 'amount': {'$gt': amount}},
+            {'$inc': {'amount': -amount}},
+            projection=LIST_INGREDIENT_FIELDS,
+            return_document=ReturnDocument.BEFORE
+        )
+        if previous:
+            removed = {field: previous[field] for field in LIST_INGREDIENT_FIELDS}
+            return {**removed, 'amount': amount}
+
+        # Another request changed the amount between the two updates
+        if not ListIngredient.objects.mongo_count_documents(filter, limit=1):
+            return None
+
+    raise WriteConflict()
+
+
+def _add_list_item(user_list: UserListIngredients, list_ingredient: dict):
+    """
+    Adds an ingredient document to a normalized list. If the ingredient already exists
+    in the list, then adds the amount to the existing document instead.
+
+    Args:
+        user_list: The user list to update
+        list_ingredient: The ingredient dictionary created by create_list_ingredient
+    """
+    _increment_list_item(user_list, list_ingredient)
+    user_list.touch()
+
+
+@timed_query
 def create_ingredient(name: str, type: str) -> Ingredient:
     """
     Creates an ingredient in the ingredient dimension table.
@@ -38,19 +477,29 @@ def create_ingredient(name: str, type: str) -> Ingredient:
         ingredient already existed in the database.
     """
     obj, new_created = Ingredient.objects.get_or_create(name=name, type=type)
+    if new_created:
+        invalidate_ingredient_index()
     return obj
 
 
-def get_all_ingredients() -> QuerySet:
+def get_all_ingredients(type: str = None) -> QuerySet:
     """
     Gets all the ingredients in the ingredients dimension table.
 
+    Args:
+        type: Only get the ingredients of this type
+
     Returns:
         QuerySet of all the ingredients.
     """
-    return Ingredient.objects.all()
+    result = Ingredient.objects.all()
+    if type:
+        result = result.filter(type=type)
 
+    return result
 
+
+@timed_query
 def get_ingredient(name: str, id: int = None) -> Ingredient:
     """
     Gets the specific ingredient object from the database.
@@ -70,6 +519,7 @@ def get_ingredient(name: str, id: int = None) -> Ingredient:
     return result
 
 
+@timed_query
 def create_custom_ingredient(username: str, name: str, type: str) -> CustomIngredient:
     """
     Creates a custom ingredient in the custom ingredient dimension table.
@@ -90,12 +540,15 @@ def create_custom_ingredient(username: str, name: str, type: str) -> CustomIngre
 
     if not query.exists():
         obj, new_created = CustomIngredient.objects.get_or_create(user=user, name=name, type=type)
+        if new_created:
+            custom_ingredients_changed(user.id)
     else:
         raise ValueError(CANNOT_CREATE_INGREDIENT)
 
     return obj
 
 
+@timed_query
 def delete_custom_ingredient(username: str, ingredient: str) -> QuerySet:
     """
     Deletes a custom ingredient in the CustomIngredient dimension table.
@@ -117,6 +570,19 @@ def delete_custom_ingredient(username: str, ingredient: str) -> QuerySet:
 
     if query.exists():
         query.get().delete()
+        custom_ingredients_changed(user.id)
+
+        if is_normalized_storage():
+            items = ListIngredient.objects.filter(
+                user=user,
+                ingredient_name=ingredient,
+                is_custom_ingredient=True
+            )
+            list_ids = set(items.values_list('user_list_id', flat=True))
+            items.delete()
+            for list in lists:
+                if list.id in list_ids:
+                    list.touch()
 
         # Check if ingredient used in the lists or the recipes. If it is then delete.
         for list in lists:
@@ -146,18 +612,48 @@ def delete_custom_ingredient(username: str, ingredient: str) -> QuerySet:
     return get_all_custom_ingredients(username)
 
 
-def get_all_custom_ingredients(username: str) -> QuerySet:
+@timed_query
+def get_all_custom_ingredients(username: str, type: str = None) -> QuerySet:
     """
     Gets all the custom ingredients in the custom ingredients dimension table.
 
+    Args:
+        username: User's username
+        type: Only get the custom ingredients of this type
+
     Returns:
         QuerySet of all the custom ingredients.
     """
 
     user = User.objects.get(username=username)
-    return CustomIngredient.objects.all().filter(user=user)
+    result = CustomIngredient.objects.all().filter(user=user)
+    if type:
+        result = result.filter(type=type)
+
+    return result
+
 
+@timed_query
+def get_custom_ingredient_values(username: str, type: str = None) -> list[tuple[str, str]]:
+    """
+    Gets the user's custom ingredients from the custom ingredient cache.
 
+    Args:
+        username: User's username
+        type: Only get the custom ingredients of this type
+
+    Returns:
+        List of the (name, type) tuples of the custom ingredients sorted by type and name.
+    """
+    user_id = get_user_id(username)
+    ingredients = get_cached_custom_ingredients(user_id).values()
+    if type:
+        ingredients = [ingredient for ingredient in ingredients if ingredient[1] == type]
+
+    return sorted(ingredients, key=lambda ingredient: (ingredient[1], ingredient[0]))
+
+
+@timed_query
 def get_custom_ingredient(username: str, name: str, id: int = None) -> CustomIngredient:
     """
     Gets the specific custom ingredient object from the user.
@@ -180,6 +676,7 @@ def get_custom_ingredient(username: str, name: str, id: int = None) -> CustomIng
     return result
 
 
+@timed_query
 def create_list_name(list_name: str) -> ListName:
     """
     Creates a list name in the listName dimension table.
@@ -205,6 +702,7 @@ def get_all_list_names() -> QuerySet:
     return ListName.objects.all()
 
 
+@timed_query
 def get_list_name(list_name: str, id: int = None) -> ListName:
     """
     Gets the specific list name object from the database.
@@ -224,6 +722,7 @@ def get_list_name(list_name: str, id: int = None) -> ListName:
     return result
 
 
+@timed_query
 def create_measurement(unit: str) -> Measurement:
     """
     Creates a measurement unit in the measurement dimension table.
@@ -249,6 +748,7 @@ def get_all_measurements() -> QuerySet:
     return Measurement.objects.all()
 
 
+@timed_query
 def get_measurement(unit: str, id: int = None) -> Measurement:
     """
     Gets the specific measurement object from the database.
@@ -268,6 +768,7 @@ def get_measurement(unit: str, id: int = None) -> Measurement:
     return result
 
 
+@timed_query
 def create_user(username: str, email: str) -> User:
     """
     Creates a user in the user dimension table.
@@ -294,6 +795,7 @@ def get_all_users() -> QuerySet:
     return User.objects.all()
 
 
+@timed_query
 def get_user(username: str, id: int = None) -> User:
     """
     Gets the specific user object from the database.
@@ -315,6 +817,24 @@ def get_user(username: str, id: int = None) -> User:
     return result
 
 
+@timed_query
+def get_user_id(username: str) -> int:
+    """
+    Gets the user's ID from the tiered cache, reading it from the database if it is not cached.
+
+    Args:
+        username: User's username
+
+    Returns:
+        The user's ID or exception if user not found.
+    """
+    return cached(
+        USERS_NAMESPACE,
+        username,
+        lambda: User.objects.values_list('id', flat=True).get(username=username)
+    )
+
+
 def create_list_ingredient(
     ingredient: str,
     amount: int | float,
@@ -342,22 +862,35 @@ def create_list_ingredient(
         Exception raised if the ingredient or unit does not exist in the database
         or amount is not int or float type
     """
+    # Check the worker's reference data before the database. Names that are not
+    # found may have been added by another worker since the data was loaded.
+    reference_data = get_reference_data()
     if user_id:
-        ingredient_object = CustomIngredient.objects.get(name=ingredient, user__id=user_id)
+        ingredient_values = get_cached_custom_ingredients(user_id).get(ingredient, None)
+        if ingredient_values is None:
+            ingredient_values = CustomIngredient.objects.values_list('name', 'type').get(
+                name=ingredient,
+                user__id=user_id
+            )
         is_custom_ingredient = True
     else:
-        ingredient_object = Ingredient.objects.get(name=ingredient)
+        ingredient_values = reference_data.ingredients.get(ingredient, None)
+        if ingredient_values is None:
+            ingredient_values = Ingredient.objects.values_list('name', 'type').get(
+                name=ingredient
+            )
         is_custom_ingredient = False
 
-    unit = Measurement.objects.get(unit=unit)
+    if unit not in reference_data.units:
+        unit = Measurement.objects.get(unit=unit).unit
 
     if isinstance(amount, int) or isinstance(amount, float):
         if (amount < 10000):
             ingredient_dict = {
-                'ingredient_name': ingredient_object.name,
-                'ingredient_type': ingredient_object.type,
+                'ingredient_name': ingredient_values[0],
+                'ingredient_type': ingredient_values[1],
                 'amount': amount,
-                'unit': unit.unit,
+                'unit': unit,
                 'is_custom_ingredient': is_custom_ingredient
             }
         else:
@@ -368,12 +901,14 @@ def create_list_ingredient(
     return ingredient_dict
 
 
+@timed_query
 def delete_list_ingredient(
     username: str,
     list_name: str,
     ingredient: str,
     unit: str,
-    is_custom_ingredient: bool
+    is_custom_ingredient: bool,
+    if_match: list[int] = None
 ) -> UserListIngredients:
     """
     Deletes an ingredient in the user's list.
@@ -384,6 +919,7 @@ def delete_list_ingredient(
         ingredient: Ingredient name
         unit: The unit of measure for the ingredient
         is_custom_ingredient: Whether the ingredient is custom or not
+        if_match: If-Match revisions the list must still have, or None to skip the check
 
     Returns:
         The updated list.
@@ -391,12 +927,33 @@ def delete_list_ingredient(
     if isinstance(is_custom_ingredient, str):
         is_custom_ingredient = is_custom_ingredient.lower() == 'true'
 
-    user_list = UserListIngredients.objects.get(
-        user__username=username,
-        list_name__list_name=list_name
-    )
+    if is_normalized_storage():
+        user_list = UserListIngredients.objects.get(
+            user__username=username,
+            list_name__list_name=list_name
+        )
+        _claim_if_match(user_list, if_match)
+        split_embedded_list_items(user_list)
+        ListIngredient.objects.filter(
+            user_list=user_list,
+            ingredient_name=ingredient,
+            unit=unit,
+            is_custom_ingredient=is_custom_ingredient
+        ).delete()
+        user_list.touch()
+        return attach_list_items([user_list])[0]
+
+    # Read, change and save again if another request changed the list in between
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        user_list = UserListIngredients.objects.get(
+            user__username=username,
+            list_name__list_name=list_name
+        )
+        _check_if_match(user_list, if_match)
+
+        if not user_list.ingredients:
+            return user_list
 
-    if user_list.ingredients:
         # Check if ingredient exists, if so delete it
         for dictionary in user_list.ingredients:
             if (
@@ -405,18 +962,22 @@ def delete_list_ingredient(
                 and dictionary.get('is_custom_ingredient', None) == is_custom_ingredient
             ):
                 user_list.ingredients.remove(dictionary)
-        user_list.save()
 
-    return user_list
+        if save_if_unchanged([user_list], ['ingredients']):
+            return user_list
 
+    raise WriteConflict()
 
+
+@timed_query
 def add_list_ingredient(
     username: str,
     list_name: str,
     ingredient: str,
     amount: int | float,
     unit: str,
-    is_custom_ingredient: bool
+    is_custom_ingredient: bool,
+    if_match: list[int] = None
 ) -> UserListIngredients:
     """
     Adds an ingredient in the user's list.
@@ -431,6 +992,7 @@ def add_list_ingredient(
         amount: Quantity of the ingredient
         unit: The unit of measure for the ingredient
         is_custom_ingredient: Whether the ingredient we are adding is custom
+        if_match: If-Match revisions the list must still have, or None to skip the check
 
     Returns:
         The updated list.
@@ -440,7 +1002,7 @@ def add_list_ingredient(
 
     user_id = None
     if is_custom_ingredient:
-        user_id = User.objects.get(username=username).id
+        user_id = get_user_id(username)
 
     # Create the ingredient to put into list
     list_ingredient = create_list_ingredient(
@@ -450,36 +1012,52 @@ def add_list_ingredient(
         user_id=user_id
     )
 
-    user_list = UserListIngredients.objects.get(
-        user__username=username,
-        list_name__list_name=list_name
-    )
+    if is_normalized_storage():
+        user_list = UserListIngredients.objects.get(
+            user__username=username,
+            list_name__list_name=list_name
+        )
+        _claim_if_match(user_list, if_match)
+        split_embedded_list_items(user_list)
+        _add_list_item(user_list, list_ingredient)
+        return attach_list_items([user_list])[0]
+
+    # Read, change and save again if another request changed the list in between
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        user_list = UserListIngredients.objects.get(
+            user__username=username,
+            list_name__list_name=list_name
+        )
+        _check_if_match(user_list, if_match)
 
-    if not user_list.ingredients:
-        # Empty list so set the list
-        user_list.ingredients = [list_ingredient]
-    elif not any(
-        dictionary.get('ingredient_name', None) == ingredient
-        and dictionary.get('unit', None) == unit
-        and dictionary.get('is_custom_ingredient') == is_custom_ingredient
-        for dictionary in user_list.ingredients
-    ):
-        # ingredient does not exist so insert
-        user_list.ingredients.append(list_ingredient)
-    else:
-        # ingredient exists so add or set the ingredient
-        for i in user_list.ingredients:
-            if (
-                i['ingredient_name'] == ingredient
-                and i['unit'] == unit
-                and i['is_custom_ingredient'] == is_custom_ingredient
-            ):
-                i['amount'] += amount
-    user_list.save()
+        if not user_list.ingredients:
+            # Empty list so set the list
+            user_list.ingredients = [list_ingredient]
+        elif not any(
+            dictionary.get('ingredient_name', None) == ingredient
+            and dictionary.get('unit', None) == unit
+            and dictionary.get('is_custom_ingredient') == is_custom_ingredient
+            for dictionary in user_list.ingredients
+        ):
+            # ingredient does not exist so insert
+            user_list.ingredients.append(list_ingredient)
+        else:
+            # ingredient exists so add or set the ingredient
+            for i in user_list.ingredients:
+                if (
+                    i['ingredient_name'] == ingredient
+                    and i['unit'] == unit
+                    and i['is_custom_ingredient'] == is_custom_ingredient
+                ):
+                    i['amount'] += amount
 
-    return user_list
+        if save_if_unchanged([user_list], ['ingredients']):
+            return user_list
 
+    raise WriteConflict()
 
+
+@timed_query
 def set_list_ingredient(
     username: str,
     old_list_name: str,
@@ -491,7 +1069,8 @@ def set_list_ingredient(
     new_ingredient: str,
     new_amount: int | float,
     new_unit: str,
-    new_is_custom_ingredient: bool
+    new_is_custom_ingredient: bool,
+    if_match: list[int] = None
 ) -> QuerySet:
     """
     Sets an ingredient's unit and amount in the user's list.
@@ -511,6 +1090,7 @@ def set_list_ingredient(
         new_amount: Quantity of the ingredient to change to
         new_unit: The unit of measure for the ingredient to change to
         new_is_custom_ingredient: The custom ingredient flag of the ingredient to change to
+        if_match: If-Match revisions the old list must still have, or None to skip the check
 
     Returns:
         All of the user's updated lists.
@@ -523,7 +1103,7 @@ def set_list_ingredient(
 
     user_id = None
     if new_is_custom_ingredient:
-        user_id = User.objects.get(username=username).id
+        user_id = get_user_id(username)
 
     # Create the ingredient to put into list
     list_ingredient = create_list_ingredient(
@@ -533,67 +1113,109 @@ def set_list_ingredient(
         user_id=user_id
     )
 
-    # Get the list to set/remove ingredient from
-    old_user_list = UserListIngredients.objects.get(
-        user__username=username,
-        list_name__list_name=old_list_name
-    )
+    if is_normalized_storage():
+        old_user_list = UserListIngredients.objects.get(
+            user__username=username,
+            list_name__list_name=old_list_name
+        )
+        _claim_if_match(old_user_list, if_match)
+        if old_list_name == new_list_name:
+            new_user_list = old_user_list
+        else:
+            new_user_list = UserListIngredients.objects.get(
+                user__username=username,
+                list_name__list_name=new_list_name
+            )
+        split_embedded_list_items(old_user_list)
+        split_embedded_list_items(new_user_list)
+
+        # Each step is atomic, and a removed amount is put back if adding the new one
+        # fails, so a move is never half applied
+        removed = _decrement_list_item(
+            old_user_list,
+            old_ingredient,
+            old_unit,
+            old_is_custom_ingredient,
+            old_amount
+        )
+        try:
+            _increment_list_item(new_user_list, list_ingredient)
+        except Exception:
+            if removed:
+                _increment_list_item(old_user_list, removed)
+            raise
+
+        if removed and old_user_list.id != new_user_list.id:
+            old_user_list.touch()
+        new_user_list.touch()
+        return get_user_lists_ingredients(username=username)
+
+    # Read, change and save again if another request changed either list in between
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        # Get the list to set/remove ingredient from
+        old_user_list = UserListIngredients.objects.get(
+            user__username=username,
+            list_name__list_name=old_list_name
+        )
+        _check_if_match(old_user_list, if_match)
 
-    # Get the list to set/move ingredient to
-    new_user_list = UserListIngredients.objects.get(
-        user__username=username,
-        list_name__list_name=new_list_name
-    )
+        # Get the list to set/move ingredient to
+        if old_list_name == new_list_name:
+            new_user_list = old_user_list
+        else:
+            new_user_list = UserListIngredients.objects.get(
+                user__username=username,
+                list_name__list_name=new_list_name
+            )
 
-    # Update the old list
-    if old_user_list.ingredients:
-        for ingredient in old_user_list.ingredients:
-            if (
-                ingredient['ingredient_name'] == old_ingredient
-                and ingredient['unit'] == old_unit
-                and ingredient['is_custom_ingredient'] == old_is_custom_ingredient
-            ):
-                if ingredient['amount'] <= old_amount:
-                    old_user_list.ingredients.remove(ingredient)
-                else:
-                    ingredient['amount'] -= old_amount
-
-    if old_list_name == new_list_name:
-        # Same list so update the old_user_list
-        new_user_list = old_user_list
-        old_user_list = None
-    else:
-        # Different list so save the old_user_list
-        # and continue with the new_user_list
-        old_user_list.save()
-
-    # Update the new list
-    if not new_user_list.ingredients:
-        # Empty list so set the list
-        new_user_list.ingredients = [list_ingredient]
-    elif not any(
-        ingredient['ingredient_name'] == new_ingredient
-        and ingredient['unit'] == new_unit
-        and ingredient['is_custom_ingredient'] == new_is_custom_ingredient
-        for ingredient in new_user_list.ingredients
-    ):
-        # ingredient does not exist so insert
-        new_user_list.ingredients.append(list_ingredient)
-    else:
-        # ingredient exists so add or set the ingredient
-        for ingredient in new_user_list.ingredients:
-            if (
-                ingredient['ingredient_name'] == new_ingredient
-                and ingredient['unit'] == new_unit
-                and ingredient['is_custom_ingredient'] == new_is_custom_ingredient
-            ):
-                ingredient['amount'] += new_amount
+        # Update the old list
+        if old_user_list.ingredients:
+            for ingredient in old_user_list.ingredients:
+                if (
+                    ingredient['ingredient_name'] == old_ingredient
+                    and ingredient['unit'] == old_unit
+                    and ingredient['is_custom_ingredient'] == old_is_custom_ingredient
+                ):
+                    if ingredient['amount'] <= old_amount:
+                        old_user_list.ingredients.remove(ingredient)
+                    else:
+                        ingredient['amount'] -= old_amount
+
+        # Update the new list
+        if not new_user_list.ingredients:
+            # Empty list so set the list
+            new_user_list.ingredients = [list_ingredient]
+        elif not any(
+            ingredient['ingredient_name'] == new_ingredient
+            and ingredient['unit'] == new_unit
+            and ingredient['is_custom_ingredient'] == new_is_custom_ingredient
+            for ingredient in new_user_list.ingredients
+        ):
+            # ingredient does not exist so insert
+            new_user_list.ingredients.append(list_ingredient)
+        else:
+            # ingredient exists so add or set the ingredient
+            for ingredient in new_user_list.ingredients:
+                if (
+                    ingredient['ingredient_name'] == new_ingredient
+                    and ingredient['unit'] == new_unit
+                    and ingredient['is_custom_ingredient'] == new_is_custom_ingredient
+                ):
+                    ingredient['amount'] += new_amount
 
-    new_user_list.save()
+        # Save both lists together so a move is never half applied
+        if old_user_list.id == new_user_list.id:
+            saved = save_if_unchanged([new_user_list], ['ingredients'])
+        else:
+            saved = save_if_unchanged([old_user_list, new_user_list], ['ingredients'])
 
-    return get_user_lists_ingredients(username=username)
+        if saved:
+            return get_user_lists_ingredients(username=username)
 
+    raise WriteConflict()
 
+
+@timed_query
 def create_user_list_ingredients(
     username: str,
     list_name: str,
@@ -634,12 +1256,17 @@ def create_user_list_ingredients(
     else:
         raise ValueError(MAX_LISTS_PER_USER)
 
+    if is_normalized_storage():
+        obj = attach_list_items([obj])[0]
+
     return obj
 
 
+@timed_query
 def delete_user_list_ingredients(
     username: str,
-    list_name: str
+    list_name: str,
+    if_match: list[int] = None
 ) -> QuerySet:
     """
     Deletes a user list in the UserListIngredients dimension table.
@@ -648,20 +1275,25 @@ def delete_user_list_ingredients(
         username: User's username
         list_name: List name.
         ingredient: The array of dictionaries with ingredient information to add.
+        if_match: If-Match revisions the list must still have, or None to skip the check
 
     Returns:
         QuerySet of all the lists for the specific user after deletion.
     """
-    query = UserListIngredients.objects.filter(
+    user_list = UserListIngredients.objects.filter(
         user__username=username,
         list_name__list_name=list_name
-    )
-    if query.exists():
-        query.get().delete()
+    ).first()
+    if user_list:
+        _claim_if_match(user_list, if_match)
+        user_list.delete()
+    elif if_match is not None:
+        raise PreconditionFailed()
 
     return get_user_lists_ingredients(username=username)
 
 
+@timed_query
 def get_user_lists_ingredients(username: str, id: int = None) -> QuerySet:
     """
     Gets all lists for the specific user from the database.
@@ -673,19 +1305,25 @@ def get_user_lists_ingredients(username: str, id: int = None) -> QuerySet:
     Returns:
         QuerySet of all the lists for the specific user.
     """
+    # The user and list name are serialized for each list, so they are fetched with the lists
+    lists = UserListIngredients.objects.select_related('user', 'list_name')
     if id:
-        result = UserListIngredients.objects.filter(
+        result = lists.filter(
             user__id=id,
             user__username=username
         )
     else:
-        result = UserListIngredients.objects.filter(
+        result = lists.filter(
             user__username=username
         )
 
+    if is_normalized_storage():
+        result = attach_list_items(result)
+
     return result
 
 
+@timed_query
 def get_specific_user_lists_ingredients(
     username: str,
     list_name: str,
@@ -713,13 +1351,36 @@ def get_specific_user_lists_ingredients(
             list_name__list_name=list_name
         )
 
+    if is_normalized_storage():
+        result = attach_list_items([result])[0]
+
     return result
 
 
+@timed_query
+def get_user_list_revision(username: str, list_name: str) -> int:
+    """
+    Gets only the revision of the user's list without loading its ingredients.
+
+    Args:
+        username: User's username
+        list_name: Name of the list
+
+    Returns:
+        The list's revision or exception if the list is not found.
+    """
+    return UserListIngredients.objects.filter(
+        user__username=username,
+        list_name__list_name=list_name
+    ).values_list('revision', flat=True).get()
+
+
+@timed_query
 def change_user_list_ingredient_name(
     username: str,
     old_list_name: str,
-    new_list_name: str
+    new_list_name: str,
+    if_match: list[int] = None
 ) -> UserListIngredients:
     """
     Changes a user's list name to another list name.
@@ -728,6 +1389,7 @@ def change_user_list_ingredient_name(
         username: User's username
         old_list_name: Name of the list to update
         new_list_name: Name of the list to change to
+        if_match: If-Match revisions the old list must still have, or None to skip the check
 
     Returns:
         The updated UserListIngredient object.
@@ -737,6 +1399,7 @@ def change_user_list_ingredient_name(
         user__username=username,
         list_name__list_name=old_list_name
     )
+    _claim_if_match(user_list, if_match)
 
     if old_list_name != new_list_name:
         # Create the listName object if it doesn't already exist
@@ -746,12 +1409,21 @@ def change_user_list_ingredient_name(
             list_name=new_list_name,
             ingredients=user_list.ingredients
         )
+
+        if is_normalized_storage():
+            # Move the ingredient documents before the old list cascades its delete
+            ListIngredient.objects.filter(user_list=user_list).update(user_list=new_user_list)
+            new_user_list = attach_list_items([new_user_list])[0]
+
         delete_user_list_ingredients(username=username, list_name=old_list_name)
         user_list = new_user_list
+    elif is_normalized_storage():
+        user_list = attach_list_items([user_list])[0]
 
     return user_list
 
 
+@timed_query
 def add_default_user_lists(username: str):
     """
     Adds Grocery and Pantry lists by default.
@@ -765,6 +1437,7 @@ def add_default_user_lists(username: str):
     create_user_list_ingredients(username=username, list_name=PANTRY_LIST_NAME)
 
 
+@timed_query
 def create_recipe(username: str, recipe_name: str) -> Recipe:
     """
     Creates a recipe in the recipe dimension table.
@@ -791,36 +1464,47 @@ def create_recipe(username: str, recipe_name: str) -> Recipe:
     return obj
 
 
-def delete_recipe(username: str, recipe_name: str) -> QuerySet:
+@timed_query
+def delete_recipe(
+    username: str,
+    recipe_name: str,
+    if_match: list[int] = None
+) -> QuerySet:
     """
     Deletes a recipe in the Recipe dimension table.
 
     Args:
         username: User's username
         recipe_name: Recipe's name
+        if_match: If-Match revisions the recipe must still have, or None to skip the check
 
     Returns:
         QuerySet of all the user's remaining recipes.
     """
     user = User.objects.get(username=username)
-    query = Recipe.objects.filter(
+    user_recipe = Recipe.objects.filter(
         user=user,
         recipe_name=recipe_name
-    )
+    ).first()
 
-    if query.exists():
-        query.get().delete()
+    if user_recipe:
+        _claim_if_match(user_recipe, if_match)
+        user_recipe.delete()
+    elif if_match is not None:
+        raise PreconditionFailed()
 
     return get_all_recipes(username)
 
 
+@timed_query
 def add_ingredient_to_recipe(
     username: str,
     recipe_name: str,
     ingredient: str,
     amount: int | float,
     unit: str,
-    is_custom_ingredient: bool
+    is_custom_ingredient: bool,
+    if_match: list[int] = None
 ) -> Recipe:
     """
     Adds an ingredient in the user's recipe.
@@ -835,6 +1519,7 @@ def add_ingredient_to_recipe(
         amount: Quantity of the ingredient
         unit: The unit of measure for the ingredient
         is_custom_ingredient: Whether the ingredient we are adding is custom
+        if_match: If-Match revisions the recipe must still have, or None to skip the check
     Returns:
         The updated list.
     """
@@ -844,7 +1529,7 @@ def add_ingredient_to_recipe(
 
     user_id = None
     if is_custom_ingredient:
-        user_id = User.objects.get(username=username).id
+        user_id = get_user_id(username)
 
     # Create the ingredient to put into list
     list_ingredient = create_list_ingredient(
@@ -854,42 +1539,49 @@ def add_ingredient_to_recipe(
         user_id=user_id
     )
 
-    user_recipe = Recipe.objects.get(
-        user__username=username,
-        recipe_name=recipe_name
-    )
+    # Read, change and save again if another request changed the recipe in between
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        user_recipe = Recipe.objects.get(
+            user__username=username,
+            recipe_name=recipe_name
+        )
+        _check_if_match(user_recipe, if_match)
 
-    if not user_recipe.ingredients:
-        # Empty list so set the list
-        user_recipe.ingredients = [list_ingredient]
-    elif not any(
-        dictionary.get('ingredient_name', None) == ingredient
-        and dictionary.get('unit', None) == unit
-        and dictionary.get('is_custom_ingredient') == is_custom_ingredient
-        for dictionary in user_recipe.ingredients
-    ):
-        # ingredient does not exist so insert
-        user_recipe.ingredients.append(list_ingredient)
-    else:
-        # ingredient exists so set the ingredient
-        for i in user_recipe.ingredients:
-            if (
-                i['ingredient_name'] == ingredient
-                and i['unit'] == unit
-                and i['is_custom_ingredient'] == is_custom_ingredient
-            ):
-                i['amount'] += amount
-    user_recipe.save()
+        if not user_recipe.ingredients:
+            # Empty list so set the list
+            user_recipe.ingredients = [list_ingredient]
+        elif not any(
+            dictionary.get('ingredient_name', None) == ingredient
+            and dictionary.get('unit', None) == unit
+            and dictionary.get('is_custom_ingredient') == is_custom_ingredient
+            for dictionary in user_recipe.ingredients
+        ):
+            # ingredient does not exist so insert
+            user_recipe.ingredients.append(list_ingredient)
+        else:
+            # ingredient exists so set the ingredient
+            for i in user_recipe.ingredients:
+                if (
+                    i['ingredient_name'] == ingredient
+                    and i['unit'] == unit
+                    and i['is_custom_ingredient'] == is_custom_ingredient
+                ):
+                    i['amount'] += amount
+
+        if save_if_unchanged([user_recipe], ['ingredients']):
+            return user_recipe
 
-    return user_recipe
+    raise WriteConflict()
 
 
+@timed_query
 def remove_ingredient_from_recipe(
     username: str,
     recipe_name: str,
     ingredient: str,
     unit: str,
-    is_custom_ingredient: bool
+    is_custom_ingredient: bool,
+    if_match: list[int] = None
 ) -> Recipe:
     """
     Removes an ingredient from the user's recipe.
@@ -900,6 +1592,7 @@ def remove_ingredient_from_recipe(
         ingredient: Ingredient name
         unit: The unit of measure for the ingredient
         is_custom_ingredient: Whether the ingredient is custom or not
+        if_match: If-Match revisions the recipe must still have, or None to skip the check
 
     Returns:
         The updated recipe.
@@ -907,28 +1600,35 @@ def remove_ingredient_from_recipe(
     if isinstance(is_custom_ingredient, str):
         is_custom_ingredient = is_custom_ingredient.lower() == 'true'
 
-    user_recipe = Recipe.objects.get(
-        user__username=username,
-        recipe_name=recipe_name
-    )
+    # Read, change and save again if another request changed the recipe in between
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        user_recipe = Recipe.objects.get(
+            user__username=username,
+            recipe_name=recipe_name
+        )
+        _check_if_match(user_recipe, if_match)
 
-    # Check if ingredient exists, if so delete it
-    for dictionary in user_recipe.ingredients:
-        if (
-            dictionary.get('ingredient_name', None) == ingredient
-            and dictionary.get('unit', None) == unit
-            and dictionary.get('is_custom_ingredient', None) == is_custom_ingredient
-        ):
-            user_recipe.ingredients.remove(dictionary)
-    user_recipe.save()
+        # Check if ingredient exists, if so delete it
+        for dictionary in user_recipe.ingredients:
+            if (
+                dictionary.get('ingredient_name', None) == ingredient
+                and dictionary.get('unit', None) == unit
+                and dictionary.get('is_custom_ingredient', None) == is_custom_ingredient
+            ):
+                user_recipe.ingredients.remove(dictionary)
+
+        if save_if_unchanged([user_recipe], ['ingredients']):
+            return user_recipe
 
-    return user_recipe
+    raise WriteConflict()
 
 
+@timed_query
 def add_step_to_recipe(
     username: str,
     recipe_name: str,
     step: str,
+    if_match: list[int] = None
 ) -> Recipe:
     """
     Adds a step to the user's recipe.
@@ -937,30 +1637,37 @@ def add_step_to_recipe(
         username: User's username
         recipe_name: Name of the recipe to update
         step: Recipe step
+        if_match: If-Match revisions the recipe must still have, or None to skip the check
     Returns:
         The updated recipe.
     """
+    # Read, change and save again if another request changed the recipe in between
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        user_recipe = Recipe.objects.get(
+            user__username=username,
+            recipe_name=recipe_name
+        )
+        _check_if_match(user_recipe, if_match)
 
-    user_recipe = Recipe.objects.get(
-        user__username=username,
-        recipe_name=recipe_name
-    )
+        if not user_recipe.steps:
+            # Empty list so set the list
+            user_recipe.steps = [step]
+        else:
+            # ingredient does not exist so insert
+            user_recipe.steps.append(step)
 
-    if not user_recipe.steps:
-        # Empty list so set the list
-        user_recipe.steps = [step]
-    else:
-        # ingredient does not exist so insert
-        user_recipe.steps.append(step)
-    user_recipe.save()
+        if save_if_unchanged([user_recipe], ['steps']):
+            return user_recipe
 
-    return user_recipe
+    raise WriteConflict()
 
 
+@timed_query
 def remove_step_from_recipe(
     username: str,
     recipe_name: str,
-    step_number: int
+    step_number: int,
+    if_match: list[int] = None
 ) -> Recipe:
     """
     Removes a step from the user's recipe.
@@ -969,29 +1676,38 @@ def remove_step_from_recipe(
         username: User's username
         recipe_name: Name of the recipe to update
         step_number: The index of the step in the step array + 1
+        if_match: If-Match revisions the recipe must still have, or None to skip the check
     Returns:
         The updated recipe.
     """
-    user_recipe = Recipe.objects.get(
-        user__username=username,
-        recipe_name=recipe_name
-    )
-
     if isinstance(step_number, str):
         step_number = int(step_number)
 
-    if len(user_recipe.steps) >= step_number and step_number >= 1:
+    # Read, change and save again if another request changed the recipe in between
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        user_recipe = Recipe.objects.get(
+            user__username=username,
+            recipe_name=recipe_name
+        )
+        _check_if_match(user_recipe, if_match)
+
+        if len(user_recipe.steps) < step_number or step_number < 1:
+            return user_recipe
+
         del user_recipe.steps[step_number - 1]
-        user_recipe.save()
+        if save_if_unchanged([user_recipe], ['steps']):
+            return user_recipe
 
-    return user_recipe
+    raise WriteConflict()
 
 
+@timed_query
 def edit_step_in_recipe(
     username: str,
     recipe_name: str,
     new_step: str,
-    step_number: int
+    step_number: int,
+    if_match: list[int] = None
 ) -> Recipe:
     """
     Edits a step in the user's recipe.
@@ -1001,21 +1717,29 @@ def edit_step_in_recipe(
         recipe_name: Name of the recipe to update
         new_step: The new edited step string
         step_number: The index of the step in the step array + 1
+        if_match: If-Match revisions the recipe must still have, or None to skip the check
     Returns:
         The updated recipe.
     """
-    user_recipe = Recipe.objects.get(
-        user__username=username,
-        recipe_name=recipe_name
-    )
+    # Read, change and save again if another request changed the recipe in between
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        user_recipe = Recipe.objects.get(
+            user__username=username,
+            recipe_name=recipe_name
+        )
+        _check_if_match(user_recipe, if_match)
+
+        if len(user_recipe.steps) < step_number or step_number < 1:
+            return user_recipe
 
-    if len(user_recipe.steps) >= step_number and step_number >= 1:
         user_recipe.steps[step_number - 1] = new_step
-        user_recipe.save()
+        if save_if_unchanged([user_recipe], ['steps']):
+            return user_recipe
 
-    return user_recipe
+    raise WriteConflict()
 
 
+@timed_query
 def get_all_recipes(username: str) -> QuerySet:
     """
     Gets all the recipes in the Recipe dimension table for a given user.
@@ -1024,9 +1748,28 @@ def get_all_recipes(username: str) -> QuerySet:
         QuerySet of all the user's recipes.
     """
     user = User.objects.get(username=username)
-    return Recipe.objects.filter(user=user)
+    return Recipe.objects.select_related('user').filter(user=user)
 
 
+@timed_query
+def get_recipe_revision(username: str, recipe_name: str) -> int:
+    """
+    Gets only the revision of the user's recipe without loading its steps and ingredients.
+
+    Args:
+        username: User's username
+        recipe_name: Name of the recipe
+
+    Returns:
+        The recipe's revision or exception if the recipe is not found.
+    """
+    return Recipe.objects.filter(
+        user__username=username,
+        recipe_name=recipe_name
+    ).values_list('revision', flat=True).get()
+
+
+@timed_query
 def get_recipe(username: str, recipe_name: str) -> Recipe:
     """
     Gets the specific ingredient object from the database.
@@ -1042,3 +1785,82 @@ def get_recipe(username: str, recipe_name: str) -> Recipe:
     result = Recipe.objects.get(user=user, recipe_name=recipe_name)
 
     return result
+
+
+@timed_query
+def get_user_changes(username: str, since: str = None) -> dict:
+    """
+    Gets the user's lists, recipes and custom ingredients that changed or were deleted
+    since the given sync token.
+
+    Args:
+        username: User's username
+        since: Sync token from the previous sync. Gets everything if not given.
+
+    Returns:
+        Dictionary in the form of:
+        {
+            'token': sync token to send on the next sync,
+            'lists': QuerySet of the changed lists,
+            'recipes': QuerySet of the changed recipes,
+            'custom_ingredients': QuerySet of the changed custom ingredients,
+            'deleted': {
+                'lists': names of the deleted lists,
+                'recipes': names of the deleted recipes,
+                'custom_ingredients': names of the deleted custom ingredients
+            }
+        }
+        Raises exception if the sync token is invalid.
+    """
+    # Read the revision before the documents so nothing saved in between is missed
+    user = User.objects.get(username=username)
+    now = datetime.now(timezone.utc)
+    token = f'{user.revision}.{int(now.timestamp())}'
+
+    if since:
+        try:
+            revision, timestamp = (int(value) for value in since.split('.'))
+            issued_at = datetime.fromtimestamp(timestamp, timezone.utc)
+        except (ValueError, OverflowError, OSError):
+            raise ValueError(INVALID_SYNC_TOKEN)
+        if revision > user.revision:
+            raise ValueError(INVALID_SYNC_TOKEN)
+
+        changed = Q(revision__gt=revision) | Q(updated_at__gte=issued_at - SYNC_GRACE_PERIOD)
+        deleted = Tombstone.objects.filter(
+            Q(revision__gt=revision) | Q(deleted_at__gte=issued_at - SYNC_GRACE_PERIOD),
+            user=user
+        )
+    else:
+        changed = Q()
+        deleted = Tombstone.objects.none()
+
+    lists = UserListIngredients.objects.select_related('user', 'list_name').filter(
+        changed,
+        user=user
+    )
+    if is_normalized_storage():
+        lists = attach_list_items(lists)
+
+    deleted_names = {
+        Tombstone.LIST: [],
+        Tombstone.RECIPE: [],
+        Tombstone.CUSTOM_INGREDIENT: []
+    }
+    for kind, name in deleted.order_by('revision').values_list('kind', 'name'):
+        deleted_names[kind].append(name)
+
+    return {
+        'token': token,
+        'lists': lists,
+        'recipes': Recipe.objects.select_related('user').filter(changed, user=user),
+        'custom_ingredients': CustomIngredient.objects.select_related('user').filter(
+            changed,
+            user=user
+        ),
+        'deleted': {
+            'lists': deleted_names[Tombstone.LIST],
+            'recipes': deleted_names[Tombstone.RECIPE],
+            'custom_ingredients': deleted_names[Tombstone.CUSTOM_INGREDIENT]
+        }
+    }
@@ -0,0 +1,516 @@
+import random
+from typing import Callable
+
+from django.db.models.query import QuerySet
+
+from cupboard_app import queries
+from cupboard_app.models import CustomIngredient, ListName, Recipe, UserListIngredients
+from cupboard_app.synthetic_data import (
+    TYPES,
+    UNIT_COUNT,
+    generate_synthetic_data,
+    get_list_names,
+    insert_user_lists,
+    insert_users,
+    invalidate_caches
+)
+
+# Tag of the synthetic data, so every name the benchmark data uses starts with it
+PREFIX = 'bench'
+UNITS = [f'{PREFIX}_unit{i}' for i in range(UNIT_COUNT)]
+BENCHMARK_LIST = queries.GROCERY_LIST_NAME
+
+
+class BenchmarkData:
+    """
+    Names of the seeded documents the benchmarks run against.
+    """
+    def __init__(self, ingredients: list[str], list_sizes: list[int], recipes: int):
+        self.ingredients = ingredients
+        self.list_sizes = list_sizes
+        self.recipes = recipes
+
+    @staticmethod
+    def get_username(list_size: int) -> str:
+        """
+        Gets the user whose list has the given number of items.
+        """
+        return f'{PREFIX}_list{list_size}'
+
+    @staticmethod
+    def get_recipe_name(index: int) -> str:
+        return f'{PREFIX}_recipe{index}'
+
+    @staticmethod
+    def get_custom_ingredient(index: int) -> str:
+        return f'{PREFIX}_custom{index}'
+
+
+def make_list_items(ingredients: list[str], size: int) -> list[dict]:
+    """
+    Makes the items of a list, each a different ingredient and unit.
+
+    Args:
+        ingredients: Names of the catalogue ingredients
+        size: Number of items
+
+    Returns:
+        List of the ingredient dictionaries stored in the lists.
+    """
+    return [
+        {
+            'ingredient_name': ingredients[i // len(UNITS) % len(ingredients)],
+            'ingredient_type': TYPES[i // len(UNITS) % len(TYPES)],
+            'amount': 1 + i % 10,
+            'unit': UNITS[i % len(UNITS)],
+            'is_custom_ingredient': False
+        }
+        for i in range(size)
+    ]
+
+
+def seed_benchmark_data(
+    users: int,
+    ingredients: int,
+    list_sizes: list[int],
+    recipes: int,
+    seed: int = 0
+) -> BenchmarkData:
+    """
+    Fills the database with synthetic data for the catalogue and background users with small
+    lists, and a user for each list size with recipes and custom ingredients. Everything is
+    inserted in bulk.
+
+    Args:
+        users: Number of background users
+        ingredients: Number of ingredients in the catalogue
+        list_sizes: Number of items in the Grocery list of each benchmark user
+        recipes: Number of recipes of each benchmark user
+        seed: Seed of the random generator so the data is the same on every run
+
+    Returns:
+        The BenchmarkData.
+    """
+    generator = random.Random(seed)
+    # Enough ingredients that each list item is a different ingredient and unit,
+    # and the last ingredient is in no list for the benchmarks that add it
+    ingredients = max(ingredients, -(-max(list_sizes, default=0) // len(UNITS)) + 1)
+    generate_synthetic_data(
+        PREFIX,
+        users=users,
+        catalogue=ingredients,
+        list_items=10,
+        max_items=20,
+        recipes=0,
+        custom_ingredients=0,
+        seed=seed
+    )
+    ingredient_names = [f'{PREFIX}_ingredient{i}' for i in range(ingredients)]
+    list_names = get_list_names(PREFIX, lists_per_user=2)
+
+    user_ids = insert_users([BenchmarkData.get_username(size) for size in list_sizes])
+    benchmark_users = [user_ids[BenchmarkData.get_username(size)] for size in list_sizes]
+    user_lists = []
+    for user_id, size in zip(benchmark_users, list_sizes):
+        user_lists.append((
+            user_id,
+            list_names[queries.GROCERY_LIST_NAME],
+            make_list_items(ingredient_names, size)
+        ))
+        user_lists.append((user_id, list_names[queries.PANTRY_LIST_NAME], []))
+    insert_user_lists(user_lists)
+    Recipe.objects.bulk_create([
+        Recipe(
+            user_id=user_id,
+            recipe_name=BenchmarkData.get_recipe_name(i),
+            steps=[f'Step {step}' for step in range(generator.randint(1, 10))],
+            ingredients=make_list_items(ingredient_names, generator.randint(1, 15))
+        )
+        for user_id in benchmark_users
+        for i in range(recipes)
+    ])
+    CustomIngredient.objects.bulk_create([
+        CustomIngredient(
+            user_id=user_id,
+            name=BenchmarkData.get_custom_ingredient(i),
+            type=TYPES[i % len(TYPES)]
+        )
+        for user_id in benchmark_users
+        for i in range(10)
+    ])
+    invalidate_caches()
+
+    return BenchmarkData(ingredient_names, list_sizes, recipes)
+
+
+class QueryBenchmark:
+    """
+    Timed call of a function in queries.py. The untimed setup and teardown
+    run around each call, i.e. to create the document a call deletes.
+    """
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[BenchmarkData, str, int], object],
+        setup: Callable[[BenchmarkData, str, int], None] = None,
+        teardown: Callable[[BenchmarkData, str, int], None] = None,
+        by_list_size: bool = False
+    ):
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.teardown = teardown
+        self.by_list_size = by_list_size
+
+
+def evaluate(result: object) -> object:
+    """
+    Reads the QuerySets a query returns so the timing includes the database round trips.
+    """
+    if isinstance(result, QuerySet):
+        return list(result)
+    if isinstance(result, dict):
+        return {key: evaluate(value) for key, value in result.items()}
+
+    return result
+
+
+def _bench_item(data: BenchmarkData) -> dict:
+    # Catalogue ingredient and unit that no seeded list has
+    return {'ingredient': data.ingredients[-1], 'unit': UNITS[-1], 'is_custom_ingredient': False}
+
+
+def _add_bench_item(data: BenchmarkData, username: str, i: int):
+    queries.add_list_ingredient(username, BENCHMARK_LIST, amount=1, **_bench_item(data))
+
+
+def _delete_bench_item(data: BenchmarkData, username: str, i: int):
+    queries.delete_list_ingredient(username, BENCHMARK_LIST, **_bench_item(data))
+
+
+def _delete_created_user_list(data: BenchmarkData, username: str, i: int):
+    queries.delete_user_list_ingredients(username, f'{PREFIX}_list{i}')
+
+
+def _create_list_name(data: BenchmarkData, username: str, i: int):
+    ListName.objects.get_or_create(list_name=f'{PREFIX}_list{i}')
+
+
+def _create_user_list(data: BenchmarkData, username: str, i: int):
+    queries.create_user_list_ingredients(username, f'{PREFIX}_list{i}')
+
+
+def _create_list_name_and_user_list(data: BenchmarkData, username: str, i: int):
+    _create_list_name(data, username, i)
+    _create_user_list(data, username, i)
+
+
+def _get_user_list(username: str) -> UserListIngredients:
+    return UserListIngredients.objects.get(
+        user__username=username,
+        list_name__list_name=BENCHMARK_LIST
+    )
+
+
+def _get_user_list_id(username: str) -> int:
+    return _get_user_list(username).id
+
+
+def _create_recipe(data: BenchmarkData, username: str, i: int):
+    queries.create_recipe(username, f'{PREFIX}_new_recipe{i}')
+
+
+def _add_step(data: BenchmarkData, username: str, i: int):
+    queries.add_step_to_recipe(username, data.get_recipe_name(0), f'{PREFIX} step')
+
+
+def _remove_last_step(data: BenchmarkData, username: str, i: int):
+    steps = queries.get_recipe(username, data.get_recipe_name(0)).steps
+    queries.remove_step_from_recipe(username, data.get_recipe_name(0), len(steps))
+
+
+def _add_recipe_ingredient(data: BenchmarkData, username: str, i: int):
+    queries.add_ingredient_to_recipe(
+        username,
+        data.get_recipe_name(0),
+        amount=1,
+        **_bench_item(data)
+    )
+
+
+def _remove_recipe_ingredient(data: BenchmarkData, username: str, i: int):
+    queries.remove_ingredient_from_recipe(username, data.get_recipe_name(0), **_bench_item(data))
+
+
+def _create_custom_ingredient(data: BenchmarkData, username: str, i: int):
+    queries.create_custom_ingredient(username, f'{PREFIX}_new_custom{i}', 'Spice')
+
+
+def _rename_list_back(data: BenchmarkData, username: str, i: int):
+    queries.change_user_list_ingredient_name(username, f'{PREFIX}_renamed', BENCHMARK_LIST)
+
+
+def _delete_default_lists(data: BenchmarkData, username: str, i: int):
+    queries.delete_user_list_ingredients(username, queries.GROCERY_LIST_NAME)
+    queries.delete_user_list_ingredients(username, queries.PANTRY_LIST_NAME)
+
+
+def _create_benchmark_user(data: BenchmarkData, username: str, i: int):
+    queries.create_user(f'{PREFIX}_new_user{i}', f'{PREFIX}_new_user{i}@example.com')
+
+
+# Benchmarks of every public function in queries.py. The ones that read or change a
+# user's list run once for each list size with the user whose list has that many items.
+QUERY_BENCHMARKS = [
+    QueryBenchmark(
+        'run_in_transaction',
+        lambda data, username, i: queries.run_in_transaction(
+            lambda session: None,
+            lambda: None
+        )
+    ),
+    QueryBenchmark(
+        'save_if_unchanged',
+        lambda data, username, i: queries.save_if_unchanged(
+            [_get_user_list(username)],
+            ['ingredients']
+        ),
+        by_list_size=True
+    ),
+    QueryBenchmark(
+        'is_normalized_storage',
+        lambda data, username, i: queries.is_normalized_storage()
+    ),
+    QueryBenchmark(
+        'get_list_items',
+        lambda data, username, i: queries.get_list_items([_get_user_list_id(username)]),
+        by_list_size=True
+    ),
+    QueryBenchmark(
+        'attach_list_items',
+        lambda data, username, i: queries.attach_list_items(
+            UserListIngredients.objects.filter(user__username=username)
+        ),
+        by_list_size=True
+    ),
+    QueryBenchmark(
+        'split_embedded_list_items',
+        lambda data, username, i: queries.split_embedded_list_items(_get_user_list(username)),
+        by_list_size=True
+    ),
+    QueryBenchmark(
+        'create_ingredient',
+        lambda data, username, i: queries.create_ingredient(
+            f'{PREFIX}_new_ingredient{i}',
+            'Meat'
+        )
+    ),
+    QueryBenchmark('get_all_ingredients', lambda data, username, i: queries.get_all_ingredients()),
+    QueryBenchmark(
+        'get_ingredient',
+        lambda data, username, i: queries.get_ingredient(
+            data.ingredients[i % len(data.ingredients)]
+        )
+    ),
+    QueryBenchmark(
+        'create_custom_ingredient',
+        lambda data, username, i: queries.create_custom_ingredient(
+            username,
+            f'{PREFIX}_new_custom{i}',
+            'Spice'
+        )
+    ),
+    QueryBenchmark(
+        'delete_custom_ingredient',
+        lambda data, username, i: queries.delete_custom_ingredient(
+            username,
+            f'{PREFIX}_new_custom{i}'
+        ),
+        setup=_create_custom_ingredient
+    ),
+    QueryBenchmark(
+        'get_all_custom_ingredients',
+        lambda data, username, i: queries.get_all_custom_ingredients(username)
+    ),
+    QueryBenchmark(
+        'get_custom_ingredient_values',
+        lambda data, username, i: queries.get_custom_ingredient_values(username)
+    ),
+    QueryBenchmark(
+        'get_custom_ingredient',
+        lambda data, username, i: queries.get_custom_ingredient(
+            username,
+            data.get_custom_ingredient(i % 10)
+        )
+    ),
+    QueryBenchmark(
+        'create_list_name',
+        lambda data, username, i: queries.create_list_name(f'{PREFIX}_list_name{i}')
+    ),
+    QueryBenchmark('get_all_list_names', lambda data, username, i: queries.get_all_list_names()),
+    QueryBenchmark(
+        'get_list_name',
+        lambda data, username, i: queries.get_list_name(BENCHMARK_LIST)
+    ),
+    QueryBenchmark(
+        'create_measurement',
+        lambda data, username, i: queries.create_measurement(f'{PREFIX}_new_unit{i}')
+    ),
+    QueryBenchmark(
+        'get_all_measurements',
+        lambda data, username, i: queries.get_all_measurements()
+    ),
+    QueryBenchmark(
+        'get_measurement',
+        lambda data, username, i: queries.get_measurement(UNITS[i % len(UNITS)])
+    ),
+    QueryBenchmark(
+        'create_user',
+        lambda data, username, i: queries.create_user(
+            f'{PREFIX}_new_user{i}',
+            f'{PREFIX}_new_user{i}@example.com'
+        )
+    ),
+    QueryBenchmark('get_all_users', lambda data, username, i: queries.get_all_users()),
+    QueryBenchmark('get_user', lambda data, username, i: queries.get_user(username)),
+    QueryBenchmark('get_user_id', lambda data, username, i: queries.get_user_id(username)),
+    QueryBenchmark(
+        'create_list_ingredient',
+        lambda data, username, i: queries.create_list_ingredient(
+            data.ingredients[i % len(data.ingredients)],
+            1,
+            UNITS[i % len(UNITS)]
+        )
+    ),
+    QueryBenchmark(
+        'delete_list_ingredient',
+        lambda data, username, i: _delete_bench_item(data, username, i),
+        setup=_add_bench_item,
+        by_list_size=True
+    ),
+    QueryBenchmark(
+        'add_list_ingredient',
+        lambda data, username, i: _add_bench_item(data, username, i),
+        teardown=_delete_bench_item,
+        by_list_size=True
+    ),
+    QueryBenchmark(
+        'set_list_ingredient',
+        lambda data, username, i: queries.set_list_ingredient(
+            username,
+            BENCHMARK_LIST,
+            data.ingredients[-1],
+            1,
+            UNITS[-1],
+            False,
+            BENCHMARK_LIST,
+            data.ingredients[-1],
+            2,
+            UNITS[-1],
+            False
+        ),
+        setup=_add_bench_item,
+        teardown=_delete_bench_item,
+        by_list_size=True
+    ),
+    QueryBenchmark(
+        'create_user_list_ingredients',
+        _create_user_list,
+        setup=_create_list_name,
+        teardown=_delete_created_user_list
+    ),
+    QueryBenchmark(
+        'delete_user_list_ingredients',
+        _delete_created_user_list,
+        setup=_create_list_name_and_user_list
+    ),
+    QueryBenchmark(
+        'get_user_lists_ingredients',
+        lambda data, username, i: queries.get_user_lists_ingredients(username),
+        by_list_size=True
+    ),
+    QueryBenchmark(
+        'get_specific_user_lists_ingredients',
+        lambda data, username, i: queries.get_specific_user_lists_ingredients(
+            username,
+            BENCHMARK_LIST
+        ),
+        by_list_size=True
+    ),
+    QueryBenchmark(
+        'get_user_list_revision',
+        lambda data, username, i: queries.get_user_list_revision(username, BENCHMARK_LIST),
+        by_list_size=True
+    ),
+    QueryBenchmark(
+        'change_user_list_ingredient_name',
+        lambda data, username, i: queries.change_user_list_ingredient_name(
+            username,
+            BENCHMARK_LIST,
+            f'{PREFIX}_renamed'
+        ),
+        teardown=_rename_list_back,
+        by_list_size=True
+    ),
+    QueryBenchmark(
+        'add_default_user_lists',
+        lambda data, username, i: queries.add_default_user_lists(f'{PREFIX}_new_user{i}'),
+        setup=_create_benchmark_user,
+        teardown=lambda data, username, i: _delete_default_lists(
+            data,
+            f'{PREFIX}_new_user{i}',
+            i
+        )
+    ),
+    QueryBenchmark(
+        'create_recipe',
+        _create_recipe,
+        teardown=lambda data, username, i: queries.delete_recipe(
+            username,
+            f'{PREFIX}_new_recipe{i}'
+        )
+    ),
+    QueryBenchmark(
+        'delete_recipe',
+        lambda data, username, i: queries.delete_recipe(username, f'{PREFIX}_new_recipe{i}'),
+        setup=_create_recipe
+    ),
+    QueryBenchmark(
+        'add_ingredient_to_recipe',
+        _add_recipe_ingredient,
+        teardown=_remove_recipe_ingredient
+    ),
+    QueryBenchmark(
+        'remove_ingredient_from_recipe',
+        _remove_recipe_ingredient,
+        setup=_add_recipe_ingredient
+    ),
+    QueryBenchmark('add_step_to_recipe', _add_step, teardown=_remove_last_step),
+    QueryBenchmark('remove_step_from_recipe', _remove_last_step, setup=_add_step),
+    QueryBenchmark(
+        'edit_step_in_recipe',
+        lambda data, username, i: queries.edit_step_in_recipe(
+            username,
+            data.get_recipe_name(0),
+            f'Step {i}',
+            1
+        )
+    ),
+    QueryBenchmark('get_all_recipes', lambda data, username, i: queries.get_all_recipes(username)),
+    QueryBenchmark(
+        'get_recipe_revision',
+        lambda data, username, i: queries.get_recipe_revision(username, data.get_recipe_name(0))
+    ),
+    QueryBenchmark(
+        'get_recipe',
+        lambda data, username, i: queries.get_recipe(
+            username,
+            data.get_recipe_name(i % data.recipes)
+        )
+    ),
+    QueryBenchmark(
+        'get_user_changes',
+        lambda data, username, i: queries.get_user_changes(username),
+        by_list_size=True
+    ),
+]
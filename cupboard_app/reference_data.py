@@ -0,0 +1,85 @@
+from time import monotonic
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from cupboard_app.models import Counter, Ingredient, Measurement
+
+# Seconds between checks if another process changed the common ingredients or measurements
+VERSION_CHECK_INTERVAL = 60
+# Counter bumped on every change of the common ingredients or measurements
+REFERENCE_DATA_COUNTER = 'reference_data'
+
+_reference_data = None
+
+
+def get_reference_version() -> int:
+    """
+    Gets the version of the reference data in the database, which every
+    process bumps when it changes the common ingredients or measurements.
+
+    Returns:
+        The number of changes of the reference data.
+    """
+    return Counter.objects.get_value(REFERENCE_DATA_COUNTER)
+
+
+def bump_reference_version():
+    """
+    Records a change of the reference data so every process loads it again,
+    and drops this process's copy right away. Bulk inserts, updates and deletes
+    of ingredients or measurements do not send signals, so they call this themselves.
+    """
+    Counter.objects.increment(REFERENCE_DATA_COUNTER)
+    invalidate_reference_data()
+
+
+class ReferenceData:
+    """
+    Common ingredients and measurement units kept by each worker, so list and
+    recipe ingredients are checked without a database round trip.
+    """
+    def __init__(self):
+        self.version = get_reference_version()
+        self.ingredients = {
+            name: (name, type)
+            for name, type in Ingredient.objects.values_list('name', 'type')
+        }
+        self.units = set(Measurement.objects.values_list('unit', flat=True))
+        self.checked_at = monotonic()
+
+
+def get_reference_data() -> ReferenceData:
+    """
+    Gets the worker's reference data, loading it if it does not exist yet or
+    if the version in the database changed since the last check.
+
+    Returns:
+        The ReferenceData of the common ingredients and measurement units.
+    """
+    global _reference_data
+    if _reference_data is None:
+        _reference_data = ReferenceData()
+    elif monotonic() - _reference_data.checked_at > VERSION_CHECK_INTERVAL:
+        if get_reference_version() != _reference_data.version:
+            _reference_data = ReferenceData()
+        else:
+            _reference_data.checked_at = monotonic()
+
+    return _reference_data
+
+
+def invalidate_reference_data():
+    """
+    Drops the worker's reference data so it is loaded again on the next lookup.
+    """
+    global _reference_data
+    _reference_data = None
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Measurement)
+@receiver(post_delete, sender=Measurement)
+def _reference_data_changed(sender, **kwargs):
+    bump_reference_version()
@@ -0,0 +1,141 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+from typing import Callable, Iterator
+
+# Phases of a request in the order they are reported
+AUTH_PHASE = 'auth'
+QUERIES_PHASE = 'queries'
+SERIALIZE_PHASE = 'serialize'
+RENDER_PHASE = 'render'
+
+_current_timings = ContextVar('request_timings', default=None)
+_instrumented = False
+
+
+class RequestTimings:
+    """
+    Time spent in each phase of a request and in each function of queries.py.
+    Phases can overlap, i.e. a lazy QuerySet is read while serializing it.
+    """
+    def __init__(self):
+        self.phases = {}
+        self.functions = {}
+        self.in_query = False
+
+    def add(self, phase: str, seconds: float, function: str = None):
+        """
+        Adds a timed call to a phase.
+
+        Args:
+            phase: Name of the phase
+            seconds: Duration of the call
+            function: Name of the function called, if it is reported separately
+        """
+        self.phases.setdefault(phase, [0.0, 0])
+        self.phases[phase][0] += seconds
+        self.phases[phase][1] += 1
+
+        if function:
+            self.functions.setdefault(function, [0.0, 0])
+            self.functions[function][0] += seconds
+            self.functions[function][1] += 1
+
+
+@contextmanager
+def collect_request_timings() -> Iterator[RequestTimings]:
+    """
+    Collects the time spent in each phase by this thread inside the block.
+
+    Returns:
+        The RequestTimings updated until the block exits.
+    """
+    timings = RequestTimings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+def time_call(phase: str, function: Callable, *args, **kwargs):
+    """
+    Calls a function and adds its duration to a phase if the timings are being collected.
+
+    Args:
+        phase: Name of the phase
+        function: The function to call
+        args: Positional arguments of the function
+        kwargs: Keyword arguments of the function
+
+    Returns:
+        The result of the function.
+    """
+    timings = _current_timings.get()
+    if timings is None:
+        return function(*args, **kwargs)
+
+    start = perf_counter()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        timings.add(phase, perf_counter() - start)
+
+
+def timed_query(function: Callable) -> Callable:
+    """
+    Times each call of a function in queries.py. Calls made by another timed
+    function are part of the outer call, so they are not counted twice.
+
+    Args:
+        function: The function to time
+
+    Returns:
+        The timed function.
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        timings = _current_timings.get()
+        if timings is None or timings.in_query:
+            return function(*args, **kwargs)
+
+        timings.in_query = True
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            timings.in_query = False
+            timings.add(QUERIES_PHASE, perf_counter() - start, function.__name__)
+
+    return wrapper
+
+
+def instrument_request_phases():
+    """
+    Times the token authentication, serializer data and renderer of the API views.
+    Only called when SERVER_TIMING is set so the views run unchanged otherwise.
+    """
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.serializers import ListSerializer, Serializer
+    from rest_framework_simplejwt.authentication import JWTTokenUserAuthentication
+
+    authenticate = JWTTokenUserAuthentication.authenticate
+    render = JSONRenderer.render
+
+    JWTTokenUserAuthentication.authenticate = wraps(authenticate)(
+        lambda self, request: time_call(AUTH_PHASE, authenticate, self, request)
+    )
+    JSONRenderer.render = wraps(render)(
+        lambda self, *args, **kwargs: time_call(RENDER_PHASE, render, self, *args, **kwargs)
+    )
+    for serializer_class in (Serializer, ListSerializer):
+        data = serializer_class.data.fget
+        serializer_class.data = property(
+            wraps(data)(lambda self, data=data: time_call(SERIALIZE_PHASE, data, self))
+        )
@@ -0,0 +1,330 @@
+import os
+import sys
+import sysconfig
+from collections import Counter
+from threading import Event, Lock, Thread, get_ident
+from time import monotonic, time, time_ns
+from types import CodeType, FrameType
+
+from django.conf import settings
+
+# Extension of the collapsed stack files, one "frame;frame;frame count" line per stack
+COLLAPSED_EXTENSION = '.collapsed'
+
+# Paths removed from the frame labels, longest first so site-packages wins over the prefix
+LIBRARY_PATHS = sorted(
+    {path for path in sysconfig.get_paths().values() if path},
+    key=len,
+    reverse=True
+)
+
+_sampler = None
+_sampler_lock = Lock()
+_frame_labels = {}
+
+
+def get_frame_label(code: CodeType) -> str:
+    """
+    Gets the label of a function in the collapsed stacks. Labels are kept
+    per code object since the same functions are sampled over and over.
+
+    Args:
+        code: The code object of the function
+
+    Returns:
+        The function name with its file relative to the project or the libraries and its line.
+    """
+    label = _frame_labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        for path in [str(settings.BASE_DIR), *LIBRARY_PATHS]:
+            if filename.startswith(path):
+                filename = filename[len(path):].lstrip(os.sep)
+                break
+        # ; separates the frames in the collapsed format
+        label = f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ',')
+        _frame_labels[code] = label
+
+    return label
+
+
+def get_stack(frame: FrameType, root: FrameType) -> str:
+    """
+    Gets the collapsed stack of a frame, from the root frame to the frame.
+
+    Args:
+        frame: The innermost frame
+        root: The outermost frame to include
+
+    Returns:
+        The frame labels from the root separated by ;.
+    """
+    labels = []
+    while frame is not None:
+        labels.append(get_frame_label(frame.f_code))
+        if frame is root:
+            break
+        frame = frame.f_back
+
+    return ';'.join(reversed(labels))
+
+
+class StackSampler:
+    """
+    Background thread that samples the stacks of the threads handling profiled requests
+    every interval. Unlike a tracing profiler it does not slow down the profiled code.
+    Each thread is only sampled from its start time on, so requests can be sampled only
+    once they are slow, and the thread waits without waking up while nothing is due.
+    """
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.threads = {}
+        self.lock = Lock()
+        # Set when a thread starts being sampled, so the sampler recomputes its wait
+        self.wake = Event()
+        self.next_sample = 0.0
+        self.thread = None
+
+    def start(self, root: FrameType, delay: float = 0) -> Counter:
+        """
+        Starts sampling the current thread.
+
+        Args:
+            root: The outermost frame of the samples
+            delay: Seconds before the first sample
+
+        Returns:
+            Counter of the samples of each collapsed stack, filled until stop is called.
+        """
+        stacks = Counter()
+        with self.lock:
+            self.threads[get_ident()] = (root, stacks, monotonic() + delay)
+            # Started on first use so each forked worker runs its own thread
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = Thread(target=self.run, name='stack-sampler', daemon=True)
+                self.thread.start()
+        self.wake.set()
+
+        return stacks
+
+    def stop(self) -> Counter:
+        """
+        Stops sampling the current thread.
+
+        Returns:
+            Counter of the samples of each collapsed stack.
+        """
+        with self.lock:
+            root, stacks, since = self.threads.pop(get_ident())
+
+        return stacks
+
+    def get_timeout(self) -> float | None:
+        """
+        Gets the seconds until the next sample is due.
+
+        Returns:
+            The seconds to wait, or None if no thread is being sampled.
+        """
+        with self.lock:
+            if not self.threads:
+                return None
+            due = max(self.next_sample, min(since for root, stacks, since in self.threads.values()))
+
+        return max(due - monotonic(), 0)
+
+    def sample(self):
+        """
+        Adds the current stack of every sampled thread past its start time.
+        """
+        now = monotonic()
+        if now < self.next_sample:
+            return
+
+        with self.lock:
+            due = {
+                thread_id: (root, stacks)
+                for thread_id, (root, stacks, since) in self.threads.items()
+                if since <= now
+            }
+            if not due:
+                return
+
+            frames = sys._current_frames()
+            for thread_id, (root, stacks) in due.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    stacks[get_stack(frame, root)] += 1
+        self.next_sample = now + self.interval
+
+    def run(self):
+        while True:
+            # Blocks while no thread is being sampled
+            self.wake.wait(self.get_timeout())
+            self.wake.clear()
+            self.sample()
+
+
+class ProfileRateLimiter:
+    """
+    Limits the profiles kept for each view to a number per minute,
+    so a slow endpoint under load does not fill the disk.
+    """
+    def __init__(self, max_per_minute: int):
+        self.max_per_minute = max_per_minute
+        self.windows = {}
+        self.lock = Lock()
+
+    def allow(self, view: str) -> bool:
+        """
+        Counts a profile of the view if the view is under its limit.
+
+        Args:
+            view: URL name of the view
+
+        Returns:
+            True if the profile can be kept.
+        """
+        minute = int(time() // 60)
+        with self.lock:
+            window, count = self.windows.get(view, (minute, 0))
+            if window != minute:
+                count = 0
+            if count >= self.max_per_minute:
+                return False
+            self.windows[view] = (minute, count + 1)
+
+        return True
+
+
+class ProfileStore:
+    """
+    Directory of collapsed stack files with a subdirectory for each view. Each view
+    keeps its newest max_files profiles, and profiles older than retention are deleted.
+    """
+    def __init__(self, directory: str, max_files: int, retention: float):
+        self.directory = directory
+        self.max_files = max_files
+        self.retention = retention
+
+    def get_view_directory(self, view: str) -> str:
+        return os.path.join(self.directory, view.replace(':', '.').replace(os.sep, '_'))
+
+    def save(self, view: str, method: str, duration: float, stacks: Counter) -> str:
+        """
+        Writes the collapsed stacks of a request and removes the profiles
+        of the view that are over the limits.
+
+        Args:
+            view: URL name of the view
+            method: HTTP method
+            duration: Seconds taken by the request
+            stacks: Samples of each collapsed stack
+
+        Returns:
+            The path of the profile.
+        """
+        directory = self.get_view_directory(view)
+        os.makedirs(directory, exist_ok=True)
+
+        name = f'{time_ns()}-{os.getpid()}-{method}-{int(duration * 1000)}ms'
+        path = os.path.join(directory, name + COLLAPSED_EXTENSION)
+        with open(path, 'w') as profile:
+            for stack, count in stacks.most_common():
+                profile.write(f'{stack} {count}\n')
+
+        self.prune(directory)
+
+        return path
+
+    def prune(self, directory: str):
+        """
+        Deletes the oldest profiles of a view over max_files and the ones older than retention.
+
+        Args:
+            directory: The view's directory
+        """
+        oldest = time() - self.retention
+        profiles = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith(COLLAPSED_EXTENSION):
+                profiles.append((entry.stat().st_mtime, entry.path))
+        profiles.sort(reverse=True)
+
+        for index, (modified, path) in enumerate(profiles):
+            if index >= self.max_files or modified < oldest:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+def get_stack_sampler() -> StackSampler:
+    """
+    Gets the process' stack sampler, creating it the first time.
+
+    Returns:
+        The StackSampler.
+    """
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = StackSampler(settings.PROFILER_INTERVAL)
+
+    return _sampler
+
+
+def read_collapsed(path: str) -> Counter:
+    """
+    Reads a collapsed stack file.
+
+    Args:
+        path: Path of the file
+
+    Returns:
+        Counter of the samples of each collapsed stack.
+    """
+    stacks = Counter()
+    with open(path) as profile:
+        for line in profile:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack:
+                stacks[stack] += int(count)
+
+    return stacks
+
+
+def to_speedscope(name: str, stacks: Counter) -> dict:
+    """
+    Converts collapsed stacks to a sampled profile in the speedscope file format. The
+    weights are sample counts, since the sampler thread waits for the GIL between samples.
+
+    Args:
+        name: Name of the profile
+        stacks: Samples of each collapsed stack
+
+    Returns:
+        Dictionary of the speedscope file.
+    """
+    frames = {}
+    samples = []
+    weights = []
+    for stack, count in stacks.most_common():
+        samples.append([frames.setdefault(label, len(frames)) for label in stack.split(';')])
+        weights.append(count)
+
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'shared': {'frames': [{'name': label} for label in frames]},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'none',
+            'startValue': 0,
+            'endValue': sum(weights),
+            'samples': samples,
+            'weights': weights
+        }],
+        'name': name,
+        'exporter': 'cupboard'
+    }
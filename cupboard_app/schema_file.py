@@ -0,0 +1,118 @@
+import json
+from hashlib import sha256
+from threading import Lock
+
+import yaml
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from cupboard_app.middleware import ENCODERS, choose_encoding
+from utils.api_helper import is_not_modified
+from utils.url_helper import lazy_view
+
+YAML_CONTENT_TYPE = 'application/vnd.oai.openapi'
+JSON_CONTENT_TYPE = 'application/vnd.oai.openapi+json'
+# Seconds clients may use their copy of the schema before checking its ETag
+SCHEMA_MAX_AGE = 5 * 60
+
+_schema = None
+_schema_lock = Lock()
+
+
+class SchemaVariant:
+    """
+    One format of the schema with its ETag and its body compressed with every supported coding.
+    """
+    def __init__(self, content: bytes, content_type: str):
+        self.content = content
+        self.content_type = content_type
+        self.etag = f'W/"{sha256(content).hexdigest()[:32]}"'
+        self.compressed = {
+            coding: compress(content, cached_level)
+            for coding, (compress, level, cached_level) in ENCODERS.items()
+        }
+
+
+class PrecomputedSchema:
+    """
+    OpenAPI schema read from the file generated at build time, so requests
+    never walk the views to generate it.
+    """
+    def __init__(self, path: str):
+        with open(path, 'rb') as schema_file:
+            content = schema_file.read()
+
+        self.variants = {
+            'yaml': SchemaVariant(content, YAML_CONTENT_TYPE),
+            'json': SchemaVariant(
+                json.dumps(yaml.safe_load(content)).encode('utf8'),
+                JSON_CONTENT_TYPE
+            )
+        }
+
+
+def get_precomputed_schema() -> PrecomputedSchema | None:
+    """
+    Gets the process' precomputed schema, reading it from OPENAPI_SCHEMA_FILE the first time.
+
+    Returns:
+        The PrecomputedSchema or None if the schema file does not exist.
+    """
+    global _schema
+    with _schema_lock:
+        if _schema is None:
+            try:
+                _schema = PrecomputedSchema(settings.OPENAPI_SCHEMA_FILE)
+            except FileNotFoundError:
+                return None
+
+    return _schema
+
+
+def reset_precomputed_schema():
+    """
+    Drops the process' precomputed schema so it is read again from the file.
+    """
+    global _schema
+    _schema = None
+
+
+def _wants_json(request: HttpRequest) -> bool:
+    return (
+        request.GET.get('format') == 'json'
+        or JSON_CONTENT_TYPE in request.META.get('HTTP_ACCEPT', '')
+    )
+
+
+# Generates the schema on each request when the schema file was not generated
+_generated_schema_view = lazy_view('drf_spectacular.views.SpectacularAPIView')
+
+
+def schema_view(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+    """
+    Serves the precomputed schema in YAML, or in JSON with ?format=json, compressed with
+    the best coding the client accepts. Responds 304 if the If-None-Match ETag is current.
+    """
+    schema = get_precomputed_schema()
+    if schema is None:
+        return _generated_schema_view(request, *args, **kwargs)
+
+    variant = schema.variants['json' if _wants_json(request) else 'yaml']
+
+    if is_not_modified(request, variant.etag):
+        response = HttpResponse(status=304)
+    else:
+        coding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if coding:
+            response = HttpResponse(variant.compressed[coding], content_type=variant.content_type)
+            response['Content-Encoding'] = coding
+        else:
+            response = HttpResponse(variant.content, content_type=variant.content_type)
+        response['Content-Length'] = str(len(response.content))
+
+    response['ETag'] = variant.etag
+    patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+    patch_cache_control(response, public=True, max_age=SCHEMA_MAX_AGE)
+
+    return response
@@ -30,6 +30,12 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ['name', 'type']
 
 
+class IngredientSearchSerializer(serializers.Serializer):
+    name = serializers.CharField()
+    type = serializers.CharField()
+    is_custom_ingredient = serializers.BooleanField()
+
+
 class ListNameSerializer(serializers.ModelSerializer):
     class Meta:
         model = ListName
@@ -0,0 +1,416 @@
+import random
+import re
+from collections import Counter
+from math import log
+
+from django.db.models.query import QuerySet
+
+from cupboard_app import queries
+from cupboard_app.custom_ingredient_cache import reset_custom_ingredient_cache
+from cupboard_app.ingredient_search import invalidate_ingredient_index
+from cupboard_app.models import (
+    CustomIngredient,
+    Ingredient,
+    ListIngredient,
+    ListName,
+    Measurement,
+    Recipe,
+    Tombstone,
+    User,
+    UserListIngredients
+)
+from cupboard_app.reference_data import bump_reference_version
+from cupboard_app.tiered_cache import (
+    INGREDIENTS_NAMESPACE,
+    LISTS_NAMESPACE,
+    MEASUREMENTS_NAMESPACE,
+    USERS_NAMESPACE,
+    invalidate_namespace,
+    reset_tiered_cache
+)
+
+DEFAULT_TAG = 'synthetic'
+# Tags start every generated name, so they are short enough to fit the name fields
+TAG = re.compile(r'^[a-z][a-z0-9]{0,9}$')
+# Domain of the generated users' emails, so the teardown never matches a real user
+EMAIL_DOMAIN = 'synthetic.invalid'
+UNIT_COUNT = 5
+TYPES = ['Meat', 'Vegetable', 'Fruit', 'Dairy', 'Grain', 'Spice']
+# Documents sent in each bulk insert and users deleted in each bulk delete
+BATCH_SIZE = 1000
+# Emails and list names of the load test data created before load tests were tagged,
+# which utils/db_helper/remove_load_test_values.py used to remove
+LEGACY_LOAD_TEST_EMAIL = 'cupboard_load_test'
+LEGACY_LOAD_TEST_LIST_NAMES = ['load_test_list', 'load_test_list2']
+# Spread of the list and recipe sizes; most are near the mean with a long tail of large ones
+SIZE_SIGMA = 1.0
+
+
+def get_prefix(tag: str) -> str:
+    """
+    Gets the prefix of the names of the documents generated with a tag.
+
+    Args:
+        tag: Tag of the synthetic data
+
+    Returns:
+        The prefix.
+
+    Raises:
+        ValueError: If the tag is not 1 to 10 lowercase letters and digits starting with a letter.
+    """
+    if not TAG.match(tag):
+        raise ValueError(
+            f'Invalid tag {tag!r}: use 1 to 10 lowercase letters and digits '
+            'starting with a letter.'
+        )
+
+    return f'{tag}_'
+
+
+def get_email(username: str) -> str:
+    return f'{username}@{EMAIL_DOMAIN}'
+
+
+def get_synthetic_users(tag: str) -> QuerySet:
+    """
+    Gets the users generated with a tag.
+
+    Args:
+        tag: Tag of the synthetic data
+
+    Returns:
+        QuerySet of the users.
+    """
+    return User.objects.filter(
+        username__startswith=get_prefix(tag),
+        email__endswith=f'@{EMAIL_DOMAIN}'
+    )
+
+
+def sample_size(generator: random.Random, mean: float, maximum: int) -> int:
+    """
+    Samples a size from a log-normal distribution, so a few lists and recipes are much
+    larger than the others as they are in production.
+
+    Args:
+        generator: The seeded random generator
+        mean: Mean of the sizes
+        maximum: Largest size returned
+
+    Returns:
+        The size.
+    """
+    if mean <= 0:
+        return 0
+
+    size = generator.lognormvariate(log(mean) - SIZE_SIGMA ** 2 / 2, SIZE_SIGMA)
+    return min(round(size), maximum)
+
+
+def make_items(
+    generator: random.Random,
+    catalogue: list[tuple[str, str]],
+    units: list[str],
+    size: int,
+    custom_ingredients: list[tuple[str, str]] = [],
+    custom_ratio: float = 0.0
+) -> list[dict]:
+    """
+    Makes the items of a list or recipe, each a different ingredient and unit.
+
+    Args:
+        generator: The seeded random generator
+        catalogue: Name and type of the catalogue ingredients
+        units: Units of the items
+        size: Number of items, fewer if there are not enough ingredient and unit pairs
+        custom_ingredients: Name and type of the user's custom ingredients
+        custom_ratio: Fraction of the items that are custom ingredients
+
+    Returns:
+        List of the ingredient dictionaries stored in the lists and recipes.
+    """
+    custom_size = min(round(size * custom_ratio), len(custom_ingredients) * len(units))
+    items = []
+    for ingredients, count, is_custom in (
+        (catalogue, min(size - custom_size, len(catalogue) * len(units)), False),
+        (custom_ingredients, custom_size, True)
+    ):
+        # Sampling the pair indexes without replacement keeps each pair unique
+        for pair in generator.sample(range(len(ingredients) * len(units)), count):
+            name, ingredient_type = ingredients[pair // len(units)]
+            items.append({
+                'ingredient_name': name,
+                'ingredient_type': ingredient_type,
+                'amount': generator.randint(1, 10),
+                'unit': units[pair % len(units)],
+                'is_custom_ingredient': is_custom
+            })
+
+    return items
+
+
+def insert_catalogue(tag: str, ingredients: int, batch_size: int = BATCH_SIZE) -> tuple:
+    """
+    Inserts the common ingredients and units in bulk.
+
+    Args:
+        tag: Tag of the synthetic data
+        ingredients: Number of ingredients in the catalogue
+        batch_size: Documents sent in each insert
+
+    Returns:
+        Tuple of the name and type of the ingredients and the list of the units.
+    """
+    prefix = get_prefix(tag)
+    catalogue = [
+        (f'{prefix}ingredient{i}', TYPES[i % len(TYPES)])
+        for i in range(ingredients)
+    ]
+    units = [f'{prefix}unit{i}' for i in range(UNIT_COUNT)]
+
+    Ingredient.objects.bulk_create(
+        [Ingredient(name=name, type=ingredient_type) for name, ingredient_type in catalogue],
+        batch_size=batch_size
+    )
+    Measurement.objects.bulk_create([Measurement(unit=unit) for unit in units])
+    return catalogue, units
+
+
+def get_list_names(tag: str, lists_per_user: int) -> dict[str, int]:
+    """
+    Gets the ids of the names of each user's lists, creating the ones that do not exist.
+    Users have the default lists first and then lists named with the tag.
+
+    Args:
+        tag: Tag of the synthetic data
+        lists_per_user: Number of lists of each user
+
+    Returns:
+        Dictionary of the list name ids by name, in the order the users have them.
+    """
+    names = [queries.GROCERY_LIST_NAME, queries.PANTRY_LIST_NAME]
+    names += [f'{get_prefix(tag)}list{i}' for i in range(len(names), lists_per_user)]
+    names = names[:lists_per_user]
+    for name in names:
+        ListName.objects.get_or_create(list_name=name)
+
+    ids = dict(ListName.objects.filter(list_name__in=names).values_list('list_name', 'id'))
+    return {name: ids[name] for name in names}
+
+
+def insert_users(usernames: list[str], batch_size: int = BATCH_SIZE) -> dict[str, int]:
+    """
+    Inserts users in bulk.
+
+    Args:
+        usernames: Usernames of the users
+        batch_size: Documents sent in each insert
+
+    Returns:
+        Dictionary of the user ids by username.
+    """
+    User.objects.bulk_create(
+        [User(username=username, email=get_email(username)) for username in usernames],
+        batch_size=batch_size
+    )
+    # Bulk inserts do not set the ids of the documents
+    return dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+
+
+def insert_user_lists(user_lists: list[tuple[int, int, list[dict]]], batch_size: int = BATCH_SIZE):
+    """
+    Inserts user lists in bulk, with their items in the lists or as their own documents
+    depending on LIST_INGREDIENTS_STORAGE.
+
+    Args:
+        user_lists: List of the (user id, list name id, items) of each list
+        batch_size: Documents sent in each insert
+    """
+    normalized = queries.is_normalized_storage()
+    UserListIngredients.objects.bulk_create(
+        [
+            UserListIngredients(
+                user_id=user_id,
+                list_name_id=list_name_id,
+                ingredients=[] if normalized else items
+            )
+            for user_id, list_name_id, items in user_lists
+        ],
+        batch_size=batch_size
+    )
+    if not normalized:
+        return
+
+    items = {(user_id, list_name_id): items for user_id, list_name_id, items in user_lists}
+    list_ids = UserListIngredients.objects.filter(
+        user_id__in={user_id for user_id, list_name_id, items in user_lists}
+    ).values_list('user_id', 'list_name_id', 'id')
+    ListIngredient.objects.bulk_create(
+        [
+            ListIngredient(user_id=user_id, user_list_id=list_id, **item)
+            for user_id, list_name_id, list_id in list_ids
+            for item in items.get((user_id, list_name_id), [])
+        ],
+        batch_size=batch_size
+    )
+
+
+def invalidate_caches():
+    """
+    Drops the cached ingredients, measurements, users and lists. Bulk inserts and
+    deletes do not send the signals that invalidate them.
+    """
+    for namespace in (
+        INGREDIENTS_NAMESPACE,
+        MEASUREMENTS_NAMESPACE,
+        USERS_NAMESPACE,
+        LISTS_NAMESPACE
+    ):
+        invalidate_namespace(namespace)
+
+    bump_reference_version()
+    invalidate_ingredient_index()
+    reset_custom_ingredient_cache()
+    reset_tiered_cache()
+
+
+def generate_synthetic_data(
+    tag: str = DEFAULT_TAG,
+    users: int = 1000,
+    catalogue: int = 10000,
+    lists_per_user: int = 2,
+    list_items: float = 20,
+    max_items: int = 1000,
+    recipes: float = 3,
+    recipe_items: float = 8,
+    custom_ingredients: float = 5,
+    custom_ratio: float = 0.1,
+    seed: int = 0,
+    batch_size: int = BATCH_SIZE
+) -> Counter:
+    """
+    Fills the database with a catalogue and users with lists, recipes and custom ingredients.
+    Every name starts with the tag so delete_synthetic_data can remove them. The same
+    arguments always generate the same data, whatever the batch size.
+
+    Args:
+        tag: Tag of the synthetic data
+        users: Number of users
+        catalogue: Number of ingredients in the catalogue
+        lists_per_user: Number of lists of each user, up to the maximum a user can have
+        list_items: Mean number of items in each list
+        max_items: Largest number of items in a list or recipe
+        recipes: Mean number of recipes of each user
+        recipe_items: Mean number of ingredients in each recipe
+        custom_ingredients: Mean number of custom ingredients of each user
+        custom_ratio: Fraction of the list and recipe items that are custom ingredients
+        seed: Seed of the random generator
+        batch_size: Documents sent in each insert, and users generated at a time
+
+    Returns:
+        Counter of the documents inserted by model name.
+    """
+    prefix = get_prefix(tag)
+    generator = random.Random(seed)
+    created = Counter()
+
+    catalogue, units = insert_catalogue(tag, catalogue, batch_size)
+    created['Ingredient'] = len(catalogue)
+    created['Measurement'] = len(units)
+    list_names = get_list_names(tag, min(lists_per_user, queries.MAX_LISTS))
+
+    # Users are generated a batch at a time so the memory used does not grow with their number
+    for start in range(0, users, batch_size):
+        usernames = [f'{prefix}user{i}' for i in range(start, min(start + batch_size, users))]
+        user_ids = insert_users(usernames, batch_size)
+        user_lists = []
+        user_recipes = []
+        user_custom_ingredients = []
+        for username in usernames:
+            user_id = user_ids[username]
+            custom = [
+                (f'{prefix}custom{i}', TYPES[generator.randrange(len(TYPES))])
+                for i in range(sample_size(generator, custom_ingredients, max_items))
+            ]
+            user_custom_ingredients += [
+                CustomIngredient(user_id=user_id, name=name, type=ingredient_type)
+                for name, ingredient_type in custom
+            ]
+            for list_name_id in list_names.values():
+                size = sample_size(generator, list_items, max_items)
+                user_lists.append((
+                    user_id,
+                    list_name_id,
+                    make_items(generator, catalogue, units, size, custom, custom_ratio)
+                ))
+            for i in range(sample_size(generator, recipes, max_items)):
+                size = max(1, sample_size(generator, recipe_items, max_items))
+                user_recipes.append(Recipe(
+                    user_id=user_id,
+                    recipe_name=f'{prefix}recipe{i}',
+                    steps=[f'Step {step}' for step in range(1, generator.randint(1, 10) + 1)],
+                    ingredients=make_items(generator, catalogue, units, size, custom, custom_ratio)
+                ))
+
+        insert_user_lists(user_lists, batch_size)
+        Recipe.objects.bulk_create(user_recipes, batch_size=batch_size)
+        CustomIngredient.objects.bulk_create(user_custom_ingredients, batch_size=batch_size)
+
+        created['User'] += len(user_ids)
+        created['UserListIngredients'] += len(user_lists)
+        created['Recipe'] += len(user_recipes)
+        created['CustomIngredient'] += len(user_custom_ingredients)
+        if queries.is_normalized_storage():
+            created['ListIngredient'] += sum(len(items) for _, _, items in user_lists)
+
+    invalidate_caches()
+    return created
+
+
+def _delete(queryset: QuerySet) -> int:
+    # One delete of every matching document, without loading them or sending their signals
+    return queryset._raw_delete(queryset.db) or 0
+
+
+def delete_synthetic_data(tag: str = DEFAULT_TAG, batch_size: int = BATCH_SIZE) -> Counter:
+    """
+    Deletes every document generated with a tag in bulk, a batch of users at a time,
+    along with the load test users and list names created before load tests were tagged.
+    List names that a user who is not synthetic still uses are kept.
+
+    Args:
+        tag: Tag of the synthetic data
+        batch_size: Users deleted in each batch
+
+    Returns:
+        Counter of the documents deleted by model name.
+    """
+    prefix = get_prefix(tag)
+    deleted = Counter()
+    user_ids = list(get_synthetic_users(tag).values_list('id', flat=True)) + list(
+        User.objects.filter(
+            email__contains=LEGACY_LOAD_TEST_EMAIL
+        ).values_list('id', flat=True)
+    )
+
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        # Children first so no document is left pointing at a deleted one
+        for model in (ListIngredient, Tombstone, Recipe, CustomIngredient, UserListIngredients):
+            deleted[model.__name__] += _delete(model.objects.filter(user_id__in=batch))
+        deleted['User'] += _delete(User.objects.filter(id__in=batch))
+
+    deleted['Ingredient'] = _delete(Ingredient.objects.filter(name__startswith=prefix))
+    deleted['Measurement'] = _delete(Measurement.objects.filter(unit__startswith=prefix))
+    for list_names in (
+        ListName.objects.filter(list_name__startswith=prefix),
+        ListName.objects.filter(list_name__in=LEGACY_LOAD_TEST_LIST_NAMES)
+    ):
+        used_list_names = UserListIngredients.objects.filter(
+            list_name_id__in=list(list_names.values_list('id', flat=True))
+        ).values_list('list_name_id', flat=True)
+        deleted['ListName'] += _delete(list_names.exclude(id__in=list(used_list_names)))
+
+    invalidate_caches()
+    return deleted
@@ -1,14 +1,21 @@
 import os
 import json
+from base64 import b64encode
 from time import time
 from unittest.mock import patch
 from urllib.parse import urlencode
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls.exceptions import NoReverseMatch
 from rest_framework.reverse import reverse
 from rest_framework_simplejwt.backends import TokenBackend
 
+import cupboard_app.queries as queries
+from cupboard_app.custom_ingredient_cache import reset_custom_ingredient_cache
+from cupboard_app.db_stats import collect_query_stats
+from cupboard_app.ingredient_search import invalidate_ingredient_index
+from cupboard_app.reference_data import invalidate_reference_data
+from cupboard_app.tiered_cache import reset_tiered_cache
 from cupboard_app.models import (
     Ingredient,
     ListName,
@@ -24,15 +31,21 @@ from cupboard_app.queries import (
     GROCERY_LIST_NAME,
     PANTRY_LIST_NAME,
     INVALID_RECIPE,
+    INVALID_SYNC_TOKEN,
     INVALID_USER_LIST,
     MAX_LISTS,
-    MAX_LISTS_PER_USER
+    MAX_LISTS_PER_USER,
+    add_step_to_recipe
 )
+from cupboard_app.batch import OPERATION_SKIPPED, SKIPPED_STATUS
+from cupboard_app.exceptions import PreconditionFailed
 from cupboard_app.views import (
+    BatchViewSet,
     UserViewSet,
     UserListIngredientsViewSet,
     UpdateUserListIngredientsViewSet
 )
+from utils.api_helper import get_etag
 
 AUTH0_DOMAIN = os.getenv('AUTH0_DOMAIN')
 AUTH0_API_IDENTIFIER = os.getenv('AUTH0_API_IDENTIFIER')
@@ -57,6 +70,27 @@ TEST_INVALID_TOKEN_PAYLOAD = {
     CUPBOARD_EMAIL_CLAIM: None,
 }
 
+# Requests over the query budget of their view in QUERY_BUDGETS fail the tests
+enforce_query_budgets = override_settings(QUERY_BUDGET_ENFORCED=True)
+
+
+def setUpModule():
+    enforce_query_budgets.enable()
+
+
+def tearDownModule():
+    enforce_query_budgets.disable()
+
+
+def reset_caches():
+    """
+    Drops the caches of every worker, so a request makes the queries of a cold start
+    whichever tests ran before it.
+    """
+    reset_tiered_cache()
+    reset_custom_ingredient_cache()
+    invalidate_reference_data()
+
 
 class GetUserListIngredientsApi(TestCase):
     user1 = None
@@ -275,6 +309,7 @@ class GetSpecificUserListIngredientsApi(TestCase):
         """
         Sets up a test database with test values
         """
+        reset_tiered_cache()
         self.user1 = User.objects.create(
             username=USER_VALID_TOKEN_PAYLOAD.get('sub'),
             email=USER_VALID_TOKEN_PAYLOAD.get(CUPBOARD_EMAIL_CLAIM)
@@ -380,20 +415,24 @@ class ChangeUserListIngredientsApi(TestCase):
         """
         mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
 
-        response = self.client.put(
-            reverse(f'{API_VERSION}:user_list_ingredients'),
-            json.dumps(
-                {
-                    'old_list_name': self.list_name1.list_name,
-                    'new_list_name': self.list_name2.list_name
-                }
-            ),
-            content_type='application/json',
-            HTTP_AUTHORIZATION='Bearer valid-token'
-        )
+        reset_caches()
+        with collect_query_stats() as stats:
+            response = self.client.put(
+                reverse(f'{API_VERSION}:user_list_ingredients'),
+                json.dumps(
+                    {
+                        'old_list_name': self.list_name1.list_name,
+                        'new_list_name': self.list_name2.list_name
+                    }
+                ),
+                content_type='application/json',
+                HTTP_AUTHORIZATION='Bearer valid-token'
+            )
 
         # Make sure user has the correct response
         self.assertEqual(response.status_code, 200)
+        # The query budget of the view in QUERY_BUDGETS is this count plus a margin
+        self.assertEqual(stats.queries, 12)
         self.assertEqual(
             response.json(),
             {
@@ -1551,6 +1590,7 @@ class GetAllIngredientsApi(TestCase):
         """
         Sets up a test database with test values
         """
+        reset_tiered_cache()
         self.user1 = User.objects.create(
             username=USER_VALID_TOKEN_PAYLOAD.get('sub'),
             email=USER_VALID_TOKEN_PAYLOAD.get(CUPBOARD_EMAIL_CLAIM)
@@ -1562,6 +1602,7 @@ class GetAllIngredientsApi(TestCase):
             name='test_ingredient1',
             type='test_type1'
         )
+        reset_custom_ingredient_cache()
 
     @patch.object(TokenBackend, 'decode')
     def test_get_all_ingredients(self, mock_decode):
@@ -1580,6 +1621,7 @@ class GetAllIngredientsApi(TestCase):
         self.assertEqual(
             response.json(),
             {
+                'next': None,
                 'common_ingredients': [
                     {'name': self.ing1.name, 'type': self.ing1.type},
                     {'name': self.ing2.name, 'type': self.ing2.type}
@@ -1594,6 +1636,228 @@ class GetAllIngredientsApi(TestCase):
             }
         )
 
+    @patch.object(TokenBackend, 'decode')
+    def test_get_ingredients_compressed_body_cached(self, mock_decode):
+        """
+        Testing only the bodies without custom ingredients, which are the same
+        for every user, have their compressed body cached
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+
+        response = self.client.get(
+            reverse(f'{API_VERSION}:ingredients'),
+            HTTP_AUTHORIZATION='Bearer valid-token'
+        )
+        self.assertFalse(response.cache_compressed)
+
+        self.cust_ing1.delete()
+        reset_custom_ingredient_cache()
+        response = self.client.get(
+            reverse(f'{API_VERSION}:ingredients'),
+            HTTP_AUTHORIZATION='Bearer valid-token'
+        )
+        self.assertEqual(response.json()['custom_ingredients'], [])
+        self.assertTrue(response.cache_compressed)
+
+    @patch.object(TokenBackend, 'decode')
+    def test_get_ingredients_pages(self, mock_decode):
+        """
+        Testing get_all_ingredients pages through the common ingredients
+        ordered by type and name
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+        ing3 = Ingredient.objects.create(name='test_ingredient0', type='test_type2')
+
+        response = self.client.get(
+            f'{reverse(f"{API_VERSION}:ingredients")}?limit=2',
+            HTTP_AUTHORIZATION='Bearer valid-token'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['common_ingredients'],
+            [
+                {'name': self.ing1.name, 'type': self.ing1.type},
+                {'name': ing3.name, 'type': ing3.type}
+            ]
+        )
+        self.assertIsNotNone(response.json()['next'])
+
+        response = self.client.get(
+            response.json()['next'],
+            HTTP_AUTHORIZATION='Bearer valid-token'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['common_ingredients'],
+            [{'name': self.ing2.name, 'type': self.ing2.type}]
+        )
+        self.assertIsNone(response.json()['next'])
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'other.testserver'])
+    @patch.object(TokenBackend, 'decode')
+    def test_get_ingredients_cached_page_links_to_request_host(self, mock_decode):
+        """
+        Testing a page cached by a request to one host links to the next page
+        on the host of each request that reads it
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+        url = f'{reverse(f"{API_VERSION}:ingredients")}?limit=1'
+
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer valid-token')
+        self.assertTrue(response.json()['next'].startswith('http://testserver/'))
+
+        with patch('cupboard_app.views.get_all_ingredients') as mock_get_all_ingredients:
+            get_ingredients_pages = self.client.get(
+                url,
+                HTTP_AUTHORIZATION='Bearer valid-token',
+                HTTP_HOST='other.testserver'
+            )
+        mock_get_all_ingredients.assert_not_called()
+        self.assertTrue(get_ingredients_pages.json()['next'].startswith('http://other.testserver/'))
+
+    @patch.object(TokenBackend, 'decode')
+    def test_get_ingredients_by_type(self, mock_decode):
+        """
+        Testing get_all_ingredients filters the ingredients by type
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+
+        response = self.client.get(
+            f'{reverse(f"{API_VERSION}:ingredients")}?{urlencode({"type": self.ing2.type})}',
+            HTTP_AUTHORIZATION='Bearer valid-token'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {
+                'next': None,
+                'common_ingredients': [{'name': self.ing2.name, 'type': self.ing2.type}],
+                'custom_ingredients': []
+            }
+        )
+
+    @patch.object(TokenBackend, 'decode')
+    def test_get_ingredients_invalid_cursor(self, mock_decode):
+        """
+        Testing get_all_ingredients with an invalid cursor returns an error
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+
+        response = self.client.get(
+            f'{reverse(f"{API_VERSION}:ingredients")}?cursor=invalid',
+            HTTP_AUTHORIZATION='Bearer valid-token'
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'message': 'Invalid cursor'})
+
+    @patch.object(TokenBackend, 'decode')
+    def test_get_ingredients_malformed_cursor(self, mock_decode):
+        """
+        Testing get_all_ingredients with a cursor that is valid json but not
+        a list of the ordering values returns an error
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+
+        for position in [{}, [{}, 'x'], ['Meat'], ['Meat', None], 'Meat']:
+            cursor = b64encode(json.dumps(position).encode('utf8')).decode('ascii')
+            response = self.client.get(
+                f'{reverse(f"{API_VERSION}:ingredients")}',
+                {'cursor': cursor},
+                HTTP_AUTHORIZATION='Bearer valid-token'
+            )
+
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'message': 'Invalid cursor'})
+
+
+class SearchIngredientsApi(TestCase):
+    user1 = None
+
+    def setUp(self):
+        """
+        Sets up a test database with test values
+        """
+        self.user1 = User.objects.create(
+            username=USER_VALID_TOKEN_PAYLOAD.get('sub'),
+            email=USER_VALID_TOKEN_PAYLOAD.get(CUPBOARD_EMAIL_CLAIM)
+        )
+        Ingredient.objects.create(name='Beef', type='Meat')
+        Ingredient.objects.create(name='Ground Beef', type='Meat')
+        Ingredient.objects.create(name='Chicken Breast', type='Meat')
+        Ingredient.objects.create(name='2% Milk', type='Dairy')
+        CustomIngredient.objects.create(user=self.user1, name='Beef Jerky', type='Meat')
+        invalidate_ingredient_index()
+        reset_custom_ingredient_cache()
+
+    def search(self, query: str, limit: int = None):
+        params = {'q': query}
+        if limit:
+            params['limit'] = limit
+        return self.client.get(
+            f'{reverse(f"{API_VERSION}:search_ingredients")}?{urlencode(params)}',
+            HTTP_AUTHORIZATION='Bearer valid-token'
+        )
+
+    @patch.object(TokenBackend, 'decode')
+    def test_search_ingredients_by_prefix(self, mock_decode):
+        """
+        Testing search ranks exact, prefix and word prefix matches and
+        merges in the user's custom ingredients
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+
+        response = self.search('beef')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            [
+                {'name': 'Beef', 'type': 'Meat', 'is_custom_ingredient': False},
+                {'name': 'Beef Jerky', 'type': 'Meat', 'is_custom_ingredient': True},
+                {'name': 'Ground Beef', 'type': 'Meat', 'is_custom_ingredient': False}
+            ]
+        )
+
+        response = self.search('beef', limit=1)
+        self.assertEqual(
+            response.json(),
+            [{'name': 'Beef', 'type': 'Meat', 'is_custom_ingredient': False}]
+        )
+
+    @patch.object(TokenBackend, 'decode')
+    def test_search_ingredients_with_typos(self, mock_decode):
+        """
+        Testing search tolerates typos in the query
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+
+        response = self.search('chiken brest')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            [{'name': 'Chicken Breast', 'type': 'Meat', 'is_custom_ingredient': False}]
+        )
+
+        response = self.search('milj')
+        self.assertEqual(response.json()[0]['name'], '2% Milk')
+
+    @patch.object(TokenBackend, 'decode')
+    def test_search_ingredients_missing_query(self, mock_decode):
+        """
+        Testing search without a query returns an error
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+
+        response = self.search('')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'message': 'q parameter is missing or empty.'})
+
 
 class GetAllMeasurementsApi(TestCase):
     unit1 = None
@@ -1603,6 +1867,7 @@ class GetAllMeasurementsApi(TestCase):
         """
         Sets up a test database with test values
         """
+        reset_tiered_cache()
         self.unit1 = Measurement.objects.create(unit='test_unit1')
         self.unit2 = Measurement.objects.create(unit='test_unit2')
 
@@ -1639,11 +1904,15 @@ class CreateUserApi(TestCase):
         username = USER_VALID_TOKEN_PAYLOAD.get('sub')
         email = USER_VALID_TOKEN_PAYLOAD.get(CUPBOARD_EMAIL_CLAIM)
 
-        response = self.client.post(
-            reverse(f'{API_VERSION}:user'),
-            HTTP_AUTHORIZATION='Bearer valid-token'
-        )
+        reset_caches()
+        with collect_query_stats() as stats:
+            response = self.client.post(
+                reverse(f'{API_VERSION}:user'),
+                HTTP_AUTHORIZATION='Bearer valid-token'
+            )
         self.assertEqual(response.status_code, 201)
+        # The query budget of the view in QUERY_BUDGETS is this count plus a margin
+        self.assertEqual(stats.queries, 17)
         self.assertDictEqual(
             response.json(),
             {'username': username, 'email': email}
@@ -1817,16 +2086,20 @@ class DeleteCustomIngredientsApi(TestCase):
         """
         mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
 
-        response = self.client.delete(
-            reverse(
-                f'{API_VERSION}:specific_custom_ingredient',
-                kwargs={'ingredient': self.cust_ing.name}
-            ),
-            content_type='application/json',
-            HTTP_AUTHORIZATION='Bearer valid-token'
-        )
+        reset_caches()
+        with collect_query_stats() as stats:
+            response = self.client.delete(
+                reverse(
+                    f'{API_VERSION}:specific_custom_ingredient',
+                    kwargs={'ingredient': self.cust_ing.name}
+                ),
+                content_type='application/json',
+                HTTP_AUTHORIZATION='Bearer valid-token'
+            )
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json(), [])
+        # The query budget of the view in QUERY_BUDGETS is this count plus a margin
+        self.assertEqual(stats.queries, 12)
 
         list = UserListIngredients.objects.get(user=self.user1, list_name=self.list_name1)
         self.assertEqual(len(list.ingredients), 0)
@@ -2544,3 +2817,409 @@ class RecipeIngredientApi(TestCase):
                 'ingredients': [self.list_ing1, self.list_cust_ing1]
             }
         )
+
+
+class SyncApi(TestCase):
+    user1 = None
+    list_name1 = None
+    list_name2 = None
+
+    def setUp(self):
+        """
+        Sets up a test database with test values
+        """
+        self.user1 = User.objects.create(
+            username=USER_VALID_TOKEN_PAYLOAD.get('sub'),
+            email=USER_VALID_TOKEN_PAYLOAD.get(CUPBOARD_EMAIL_CLAIM)
+        )
+        self.list_name1 = ListName.objects.create(list_name=GROCERY_LIST_NAME)
+        self.list_name2 = ListName.objects.create(list_name=PANTRY_LIST_NAME)
+        UserListIngredients.objects.create(
+            user=self.user1,
+            list_name=self.list_name1,
+            ingredients=[]
+        )
+
+    def sync(self, since: str = None):
+        url = reverse(f'{API_VERSION}:sync')
+        if since:
+            url = f'{url}?{urlencode({"since": since})}'
+        return self.client.get(url, HTTP_AUTHORIZATION='Bearer valid-token')
+
+    @patch.object(TokenBackend, 'decode')
+    def test_sync_returns_only_changes(self, mock_decode):
+        """
+        Testing sync returns everything on the first sync and
+        only the changes and deletions afterwards
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+
+        response = self.sync()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['lists'],
+            [{'user': self.user1.username, 'list_name': GROCERY_LIST_NAME, 'ingredients': []}]
+        )
+        token = response.json()['token']
+
+        # Simulate the grace period passing since the first sync
+        revision, timestamp = token.split('.')
+        token = f'{revision}.{int(timestamp) + 3600}'
+
+        response = self.sync(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {
+                'token': response.json()['token'],
+                'lists': [],
+                'recipes': [],
+                'custom_ingredients': [],
+                'deleted': {'lists': [], 'recipes': [], 'custom_ingredients': []}
+            }
+        )
+
+        Recipe.objects.create(user=self.user1, recipe_name='my_recipe', steps=[], ingredients=[])
+        UserListIngredients.objects.get(list_name=self.list_name1).delete()
+
+        response = self.sync(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['lists'], [])
+        self.assertEqual(
+            response.json()['recipes'],
+            [
+                {
+                    'user': self.user1.username,
+                    'recipe_name': 'my_recipe',
+                    'steps': [],
+                    'ingredients': []
+                }
+            ]
+        )
+        self.assertEqual(response.json()['deleted']['lists'], [GROCERY_LIST_NAME])
+
+    @patch.object(TokenBackend, 'decode')
+    def test_sync_invalid_token(self, mock_decode):
+        """
+        Testing sync with an invalid token returns an error
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+
+        response = self.sync('invalid')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'message': INVALID_SYNC_TOKEN})
+
+        response = self.sync('1000.0')
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalRequestApi(TestCase):
+    user1 = None
+    list_name1 = None
+    recipe = None
+
+    def setUp(self):
+        """
+        Sets up a test database with test values
+        """
+        reset_tiered_cache()
+        self.user1 = User.objects.create(
+            username=USER_VALID_TOKEN_PAYLOAD.get('sub'),
+            email=USER_VALID_TOKEN_PAYLOAD.get(CUPBOARD_EMAIL_CLAIM)
+        )
+        self.list_name1 = ListName.objects.create(list_name=GROCERY_LIST_NAME)
+        UserListIngredients.objects.create(
+            user=self.user1,
+            list_name=self.list_name1,
+            ingredients=[]
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user1,
+            recipe_name='My_Recipe',
+            steps=[],
+            ingredients=[]
+        )
+
+    def get_list(self, **headers):
+        return self.client.get(
+            reverse(
+                f'{API_VERSION}:specific_user_list_ingredients',
+                kwargs={'list_name': self.list_name1.list_name}
+            ),
+            HTTP_AUTHORIZATION='Bearer valid-token',
+            **headers
+        )
+
+    def add_step(self, step: str, **headers):
+        return self.client.post(
+            reverse(
+                f'{API_VERSION}:recipe_steps',
+                kwargs={'recipe_name': self.recipe.recipe_name},
+            ),
+            json.dumps({'step': step}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION='Bearer valid-token',
+            **headers
+        )
+
+    @patch.object(TokenBackend, 'decode')
+    def test_get_list_not_modified(self, mock_decode):
+        """
+        Testing a list is only sent again once it has changed
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+
+        response = self.get_list()
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/'))
+
+        response = self.get_list(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+        # Any save gives the list a new version
+        UserListIngredients.objects.get(user=self.user1, list_name=self.list_name1).touch()
+        response = self.get_list(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @patch.object(TokenBackend, 'decode')
+    def test_get_recipe_not_modified(self, mock_decode):
+        """
+        Testing a recipe is only sent again once it has changed
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+        url = reverse(
+            f'{API_VERSION}:specific_recipe',
+            kwargs={'recipe_name': self.recipe.recipe_name},
+        )
+
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer valid-token')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get(
+            url,
+            HTTP_AUTHORIZATION='Bearer valid-token',
+            HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+
+        new_etag = self.add_step('Step one of my recipe!')['ETag']
+        response = self.client.get(
+            url,
+            HTTP_AUTHORIZATION='Bearer valid-token',
+            HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], new_etag)
+
+    @patch.object(TokenBackend, 'decode')
+    def test_if_match_rejects_stale_changes(self, mock_decode):
+        """
+        Testing a change based on an outdated copy of the recipe is rejected
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+
+        etag = self.client.get(
+            reverse(
+                f'{API_VERSION}:specific_recipe',
+                kwargs={'recipe_name': self.recipe.recipe_name},
+            ),
+            HTTP_AUTHORIZATION='Bearer valid-token'
+        )['ETag']
+
+        response = self.add_step('Step one of my recipe!', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        # The second change was based on the same copy as the first
+        response = self.add_step('Step two of my recipe!', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response.json(), {'message': PreconditionFailed.default_detail})
+        self.assertEqual(Recipe.objects.get(id=self.recipe.id).steps, ['Step one of my recipe!'])
+
+    @patch.object(TokenBackend, 'decode')
+    def test_if_match_rejects_change_made_after_the_check(self, mock_decode):
+        """
+        Testing a change made by another request after the recipe was read is
+        not overwritten by a change with a matching If-Match header
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+        etag = get_etag(Recipe.objects.get(id=self.recipe.id).revision)
+        save_if_unchanged = queries.save_if_unchanged
+
+        def concurrent_save(documents, field_names):
+            if not concurrent_save.called:
+                concurrent_save.called = True
+                # Another device adds a step after this request read the recipe
+                add_step_to_recipe(self.user1.username, self.recipe.recipe_name, 'Other step')
+            return save_if_unchanged(documents, field_names)
+
+        concurrent_save.called = False
+        with patch.object(queries, 'save_if_unchanged', side_effect=concurrent_save):
+            response = self.add_step('Step one of my recipe!', HTTP_IF_MATCH=etag)
+
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(Recipe.objects.get(id=self.recipe.id).steps, ['Other step'])
+
+    @patch.object(TokenBackend, 'decode')
+    def test_if_match_delete_recipe(self, mock_decode):
+        """
+        Testing a recipe is only deleted if it was not changed since the client's copy
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+        url = reverse(
+            f'{API_VERSION}:specific_recipe',
+            kwargs={'recipe_name': self.recipe.recipe_name},
+        )
+        etag = get_etag(Recipe.objects.get(id=self.recipe.id).revision)
+        self.add_step('Step one of my recipe!')
+
+        response = self.client.delete(
+            url,
+            HTTP_AUTHORIZATION='Bearer valid-token',
+            HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 412)
+        self.assertTrue(Recipe.objects.filter(id=self.recipe.id).exists())
+
+        etag = get_etag(Recipe.objects.get(id=self.recipe.id).revision)
+        response = self.client.delete(
+            url,
+            HTTP_AUTHORIZATION='Bearer valid-token',
+            HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Recipe.objects.filter(id=self.recipe.id).exists())
+
+
+class BatchApi(TestCase):
+    user1 = None
+
+    def setUp(self):
+        """
+        Sets up a test database with test values
+        """
+        self.user1 = User.objects.create(
+            username=USER_VALID_TOKEN_PAYLOAD.get('sub'),
+            email=USER_VALID_TOKEN_PAYLOAD.get(CUPBOARD_EMAIL_CLAIM)
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user1,
+            recipe_name='My_Recipe',
+            steps=[],
+            ingredients=[]
+        )
+
+    def batch(self, operations: list, stop_on_error: bool = False, **headers):
+        return self.client.post(
+            reverse(f'{API_VERSION}:batch'),
+            json.dumps({'operations': operations, 'stop_on_error': stop_on_error}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION='Bearer valid-token',
+            **headers
+        )
+
+    def recipe_path(self, recipe_name: str, suffix: str = '') -> str:
+        return reverse(
+            f'{API_VERSION}:specific_recipe',
+            kwargs={'recipe_name': recipe_name}
+        ) + suffix
+
+    @patch.object(TokenBackend, 'decode')
+    def test_batch_runs_operations_in_order(self, mock_decode):
+        """
+        Testing the operations run in order and the token is only decoded once
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+
+        response = self.batch([
+            {
+                'method': 'POST',
+                'path': self.recipe_path(self.recipe.recipe_name, '/step'),
+                'body': {'step': 'Step one of my recipe!'}
+            },
+            {'method': 'GET', 'path': self.recipe_path(self.recipe.recipe_name)},
+            {'method': 'GET', 'path': self.recipe_path('nonexistent')}
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_decode.call_count, 1)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], [200, 200, 404])
+        self.assertEqual(results[1]['body']['steps'], ['Step one of my recipe!'])
+        self.assertEqual(results[1]['headers']['ETag'], results[0]['headers']['ETag'])
+        self.assertEqual(results[2]['body'], {'message': INVALID_RECIPE})
+
+    @patch.object(TokenBackend, 'decode')
+    def test_batch_operations_only_use_their_own_conditional_headers(self, mock_decode):
+        """
+        Testing the batch request's If-Match header is not applied to its operations
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+        etag = get_etag(Recipe.objects.get(id=self.recipe.id).revision)
+        step_path = self.recipe_path(self.recipe.recipe_name, '/step')
+
+        response = self.batch(
+            [
+                {'method': 'POST', 'path': step_path, 'body': {'step': 'Step one'}},
+                {
+                    'method': 'POST',
+                    'path': step_path,
+                    'body': {'step': 'Step two'},
+                    'headers': {'If-Match': etag}
+                }
+            ],
+            HTTP_IF_MATCH=etag
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.json()['results']], [200, 412])
+        self.assertEqual(Recipe.objects.get(id=self.recipe.id).steps, ['Step one'])
+
+    @patch.object(TokenBackend, 'decode')
+    def test_batch_stop_on_error(self, mock_decode):
+        """
+        Testing the operations after a failed operation are skipped
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+
+        response = self.batch(
+            [
+                {'method': 'GET', 'path': self.recipe_path('nonexistent')},
+                {'method': 'DELETE', 'path': self.recipe_path(self.recipe.recipe_name)}
+            ],
+            stop_on_error=True
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result['status'] for result in response.json()['results']],
+            [404, SKIPPED_STATUS]
+        )
+        self.assertEqual(
+            response.json()['results'][1]['body'],
+            {'message': OPERATION_SKIPPED}
+        )
+        self.assertTrue(Recipe.objects.filter(id=self.recipe.id).exists())
+
+    @patch.object(TokenBackend, 'decode')
+    def test_batch_invalid_operation(self, mock_decode):
+        """
+        Testing no operation is run if any operation is invalid
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+
+        response = self.batch([
+            {'method': 'DELETE', 'path': self.recipe_path(self.recipe.recipe_name)},
+            {'method': 'POST', 'path': reverse(f'{API_VERSION}:batch')}
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(Recipe.objects.filter(id=self.recipe.id).exists())
+
+        response = self.batch([])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'message': BatchViewSet.MISSING_OPERATIONS_MSG})
@@ -0,0 +1,361 @@
+import json
+import os
+import tempfile
+from inspect import isfunction
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.migrations.recorder import MigrationRecorder
+from django.test import TestCase
+
+from cupboard_app import queries
+from cupboard_app.management.commands.benchmark_queries import compare_to_baseline, summarize
+from cupboard_app.management.commands.check_migrations import get_migration_fingerprint
+from cupboard_app.management.commands.import_ingredients import iter_json_array
+from cupboard_app.management.commands.profile_startup import (
+    LAZY_MODULES,
+    STARTUP_BUDGET,
+    get_startup_time,
+    parse_import_times,
+    profile_startup
+)
+from cupboard_app.management.commands.ensure_indexes import (
+    find_collection_scans,
+    find_missing_indexes,
+    get_database
+)
+from cupboard_app.models import Ingredient, ListName, Recipe, User, UserListIngredients
+from cupboard_app.query_benchmarks import QUERY_BENCHMARKS, seed_benchmark_data
+
+# Times the startup budget the tests allow, since test machines are slower and busier
+STARTUP_BUDGET_TEST_FACTOR = 3
+
+
+class EnsureIndexesCommand(TestCase):
+    def test_ensure_indexes(self):
+        """
+        Testing ensure_indexes creates all the required indexes and
+        none of the probed queries scan a whole collection
+        """
+        out = StringIO()
+        call_command('ensure_indexes', stdout=out, stderr=StringIO())
+
+        db = get_database()
+        self.assertEqual(find_missing_indexes(db), [])
+        self.assertEqual(find_collection_scans(db), [])
+        self.assertIn('All required indexes exist.', out.getvalue())
+
+        # Running the check again does not need to create anything
+        out = StringIO()
+        call_command('ensure_indexes', '--check', stdout=out, stderr=StringIO())
+        self.assertNotIn('Created index', out.getvalue())
+
+
+class CheckMigrationsCommand(TestCase):
+    def test_check_migrations_up_to_date(self):
+        """
+        Testing check_migrations passes when every migration on disk is applied
+        """
+        out = StringIO()
+        call_command('check_migrations', stdout=out, stderr=StringIO())
+
+        self.assertIn('Migrations are up to date', out.getvalue())
+
+    def test_check_migrations_pending(self):
+        """
+        Testing check_migrations fails and lists the migrations that are not applied
+        """
+        err = StringIO()
+        with patch.object(MigrationRecorder, 'applied_migrations', return_value={}):
+            with self.assertRaises(CommandError):
+                call_command('check_migrations', stdout=StringIO(), stderr=err)
+
+        self.assertIn('Pending migration cupboard_app.0001_initial', err.getvalue())
+
+    def test_migration_fingerprint(self):
+        """
+        Testing the fingerprint does not depend on the order of the migrations
+        """
+        self.assertEqual(
+            get_migration_fingerprint([('app', '0001'), ('app', '0002')]),
+            get_migration_fingerprint([('app', '0002'), ('app', '0001')])
+        )
+        self.assertNotEqual(
+            get_migration_fingerprint([('app', '0001')]),
+            get_migration_fingerprint([('app', '0001'), ('app', '0002')])
+        )
+
+
+class ProfileStartupCommand(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.profile = profile_startup()
+
+    def test_lazy_modules(self):
+        """
+        Testing the app serves its first request without importing the lazily loaded modules
+        """
+        for module in LAZY_MODULES:
+            self.assertNotIn(module, self.profile['modules'])
+
+    def test_startup_regression(self):
+        """
+        Testing the app serves its first request within a multiple of the startup budget,
+        loose enough for slow test machines but not for an import that adds seconds
+        """
+        self.assertLess(
+            get_startup_time(self.profile),
+            STARTUP_BUDGET * STARTUP_BUDGET_TEST_FACTOR
+        )
+
+    def test_parse_import_times(self):
+        """
+        Testing the -X importtime output is parsed into the self and cumulative times
+        """
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |   encodings.aliases\n'
+            'import time:       300 |        420 | encodings\n'
+        )
+
+        self.assertEqual(
+            parse_import_times(output),
+            [('encodings.aliases', 120, 120), ('encodings', 300, 420)]
+        )
+
+
+class BenchmarkQueriesCommand(TestCase):
+    def test_every_query_benchmarked(self):
+        """
+        Testing every public function in queries.py has a benchmark
+        """
+        functions = {
+            name for name, value in vars(queries).items()
+            if isfunction(value) and value.__module__ == queries.__name__
+            and not name.startswith('_')
+        }
+
+        self.assertEqual({benchmark.name for benchmark in QUERY_BENCHMARKS}, functions)
+
+    def test_seed_benchmark_data(self):
+        """
+        Testing the benchmark data has a user with a list of each size
+        """
+        data = seed_benchmark_data(users=5, ingredients=3, list_sizes=[2, 30], recipes=2)
+
+        self.assertEqual(User.objects.count(), 7)
+        self.assertEqual(Recipe.objects.count(), 4)
+        for size in [2, 30]:
+            user_list = queries.get_specific_user_lists_ingredients(
+                data.get_username(size),
+                queries.GROCERY_LIST_NAME
+            )
+            self.assertEqual(len(user_list.ingredients), size)
+        self.assertEqual(UserListIngredients.objects.count(), 14)
+
+    def test_compare_to_baseline(self):
+        """
+        Testing only medians slower than the baseline by more than the tolerance are regressions
+        """
+        baseline = {
+            'get_user': summarize([0.002]),
+            'get_recipe': summarize([0.002]),
+            'get_all_recipes': summarize([0.0001])
+        }
+        results = {
+            'get_user': summarize([0.0024]),
+            'get_recipe': summarize([0.003, 0.004, 0.005]),
+            'get_all_recipes': summarize([0.0003]),
+            'get_user_id': summarize([0.01])
+        }
+
+        self.assertEqual(
+            compare_to_baseline(results, baseline, tolerance=0.25),
+            [('get_recipe', 2.0, 4.0)]
+        )
+
+
+class SyntheticDataCommands(TestCase):
+    def get_dataset(self) -> list:
+        dataset = []
+        for username in User.objects.order_by('username').values_list('username', flat=True):
+            dataset += [
+                (username, user_list.list_name.list_name, user_list.ingredients)
+                for user_list in queries.get_user_lists_ingredients(username)
+            ]
+            dataset += [
+                (username, recipe.recipe_name, recipe.steps, recipe.ingredients)
+                for recipe in queries.get_all_recipes(username).order_by('recipe_name')
+            ]
+
+        return dataset
+
+    def test_generate_deterministic(self):
+        """
+        Testing the same seed generates the same data whatever the batch size
+        """
+        options = {
+            'users': 7,
+            'catalogue': 20,
+            'lists_per_user': 3,
+            'custom_ratio': 0.5,
+            'seed': 4,
+            'stdout': StringIO()
+        }
+        call_command('generate_synthetic_data', batch_size=3, **options)
+        dataset = self.get_dataset()
+
+        self.assertEqual(User.objects.count(), 7)
+        self.assertEqual(UserListIngredients.objects.count(), 21)
+        self.assertEqual(Ingredient.objects.count(), 20)
+        self.assertTrue(any(
+            item['is_custom_ingredient'] for *_, items in dataset for item in items
+        ))
+
+        call_command('delete_synthetic_data', stdout=StringIO())
+        call_command('generate_synthetic_data', batch_size=1000, **options)
+        self.assertEqual(self.get_dataset(), dataset)
+
+    def test_delete_by_tag(self):
+        """
+        Testing only the documents generated with the tag are deleted
+        """
+        user = User.objects.create(username='synthetic_real', email='real@example.com')
+        Ingredient.objects.create(name='Apple', type='Fruit')
+        call_command('generate_synthetic_data', users=3, catalogue=10, stdout=StringIO())
+        call_command('generate_synthetic_data', tag='other', users=2, stdout=StringIO())
+
+        with self.assertRaises(CommandError):
+            call_command('generate_synthetic_data', users=1, stdout=StringIO())
+
+        call_command('delete_synthetic_data', stdout=StringIO())
+
+        self.assertEqual(
+            list(User.objects.order_by('username').values_list('username', flat=True)),
+            ['other_user0', 'other_user1', user.username]
+        )
+        self.assertEqual(UserListIngredients.objects.count(), 4)
+        self.assertFalse(Ingredient.objects.filter(name__startswith='synthetic_').exists())
+        self.assertTrue(Ingredient.objects.filter(name='Apple').exists())
+
+    def test_delete_legacy_load_test_data(self):
+        """
+        Testing the load test users and list names created before load tests
+        were tagged are deleted too
+        """
+        user = User.objects.create(username='real_user', email='real@example.com')
+        load_test_user = User.objects.create(
+            username='load_test_user0',
+            email='cupboard_load_test0@example.com'
+        )
+        list_name = ListName.objects.create(list_name='load_test_list')
+        ListName.objects.create(list_name='load_test_list2')
+        UserListIngredients.objects.create(
+            user=load_test_user,
+            list_name=list_name,
+            ingredients=[]
+        )
+
+        call_command('delete_synthetic_data', stdout=StringIO())
+
+        self.assertEqual(list(User.objects.values_list('username', flat=True)), [user.username])
+        self.assertFalse(UserListIngredients.objects.exists())
+        self.assertFalse(ListName.objects.filter(list_name__startswith='load_test_').exists())
+
+    def test_invalid_tag(self):
+        """
+        Testing tags that could match names which are not synthetic are refused
+        """
+        for tag in ['', 'Upper', 'a_b', 'waytoolongtag']:
+            with self.assertRaises(CommandError):
+                call_command('delete_synthetic_data', tag=tag, stdout=StringIO())
+
+
+class ImportIngredientsCommand(TestCase):
+    def setUp(self):
+        Ingredient.objects.create(name='Apple', type='Fruit')
+        Ingredient.objects.create(name='Beef', type='Miscellaneous')
+        self.file = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+        json.dump(
+            [
+                {'name': 'Apple', 'food_group': 'Fruit'},
+                {'name': 'Beef', 'food_group': 'Meat'},
+                {'name': 'Carrot', 'food_group': 'Vegetable'},
+                {'name': 'Dill', 'food_group': None},
+                {'name': 'Carrot', 'food_group': 'Fruit'},
+                {'name': 'x' * 31, 'food_group': 'Spice'},
+                {'food_group': 'Spice'}
+            ],
+            self.file
+        )
+        self.file.close()
+
+    def tearDown(self):
+        os.remove(self.file.name)
+
+    def test_iter_json_array(self):
+        """
+        Testing the values of an array are parsed across chunks
+        """
+        values = [{'name': 'a, ]b', 'n': [1, 2]}, 12345, 'c', None, {}]
+
+        self.assertEqual(
+            list(iter_json_array(StringIO(f' {json.dumps(values)} '), chunk_size=3)),
+            values
+        )
+        with self.assertRaises(ValueError):
+            list(iter_json_array(StringIO('{"name": "Apple"}')))
+        with self.assertRaises(ValueError):
+            list(iter_json_array(StringIO('[{"name": "Apple"}, '), chunk_size=4))
+
+    def test_iter_json_array_numbers_across_chunks(self):
+        """
+        Testing numbers split across chunks are parsed whole
+        """
+        for chunk_size in range(1, 12):
+            self.assertEqual(
+                list(iter_json_array(StringIO('[45.6e3, 1, -0.25 ]'), chunk_size=chunk_size)),
+                [45.6e3, 1, -0.25]
+            )
+        with self.assertRaises(ValueError):
+            list(iter_json_array(StringIO('[45.6e3'), chunk_size=3))
+        with self.assertRaises(ValueError):
+            list(iter_json_array(StringIO('[1 2]'), chunk_size=3))
+
+    def test_dry_run(self):
+        """
+        Testing a dry run prints the differences without changing the catalogue
+        """
+        out = StringIO()
+        call_command('import_ingredients', self.file.name, dry_run=True, stdout=out, stderr=out)
+
+        self.assertIn('+ Carrot (Vegetable)', out.getvalue())
+        self.assertIn('+ Dill (Miscellaneous)', out.getvalue())
+        self.assertIn('~ Beef (Miscellaneous -> Meat)', out.getvalue())
+        self.assertIn('2 added, 1 changed, 1 unchanged, 1 duplicate, 2 invalid', out.getvalue())
+        self.assertEqual(Ingredient.objects.count(), 2)
+
+    def test_import(self):
+        """
+        Testing new ingredients are added and the types of existing ones are updated
+        """
+        call_command(
+            'import_ingredients',
+            self.file.name,
+            batch_size=2,
+            stdout=StringIO(),
+            stderr=StringIO()
+        )
+
+        self.assertEqual(
+            list(Ingredient.objects.order_by('name').values_list('name', 'type')),
+            [
+                ('Apple', 'Fruit'),
+                ('Beef', 'Meat'),
+                ('Carrot', 'Vegetable'),
+                ('Dill', 'Miscellaneous')
+            ]
+        )
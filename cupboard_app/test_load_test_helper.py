@@ -0,0 +1,82 @@
+import os
+import tempfile
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+from rest_framework_simplejwt.backends import TokenBackend
+
+from utils import api_helper
+from utils.load_test_helper import (
+    EMAIL_CLAIM,
+    JWKS_PATH,
+    SLO,
+    TokenSigner,
+    check_slos,
+    start_jwks_server
+)
+
+ISSUER = 'https://cupboard.test/'
+AUDIENCE = 'cupboard-api'
+
+
+def make_entry(method: str, name: str, requests: int, fail_ratio: float, p95: float):
+    percentiles = {0.5: p95 / 2, 0.95: p95, 0.99: p95 * 2}
+    return SimpleNamespace(
+        method=method,
+        name=name,
+        num_requests=requests,
+        fail_ratio=fail_ratio,
+        get_response_time_percentile=percentiles.get
+    )
+
+
+class LoadTestHelperTests(SimpleTestCase):
+    def test_minted_token_verified(self):
+        """
+        Testing the minted tokens are verified against the JWKS stub and the key is reused
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            key_path = os.path.join(directory, 'key.pem')
+            signer = TokenSigner(key_path)
+            self.assertEqual(TokenSigner(key_path).kid, signer.kid)
+
+            server = start_jwks_server(signer, '127.0.0.1', 0)
+            try:
+                backend = TokenBackend(
+                    'RS256',
+                    audience=AUDIENCE,
+                    issuer=ISSUER,
+                    jwk_url=f'http://127.0.0.1:{server.server_address[1]}{JWKS_PATH}'
+                )
+                payload = backend.decode(signer.mint('loadtest_user1', ISSUER, AUDIENCE))
+            finally:
+                server.shutdown()
+
+        self.assertEqual(payload['sub'], 'loadtest_user1')
+        self.assertEqual(payload[api_helper.EMAIL_CLAIM], 'loadtest_user1@synthetic.invalid')
+        self.assertEqual(EMAIL_CLAIM, api_helper.EMAIL_CLAIM)
+
+    def test_check_slos(self):
+        """
+        Testing each endpoint is checked against its SLO or the default one
+        """
+        report = check_slos(
+            [
+                make_entry('GET', '/api/v3/user/lists', 100, 0.0, 200),
+                make_entry('GET', '/api/v3/measurements', 100, 0.0, 200),
+                make_entry('POST', '/api/v3/user', 100, 0.05, 100),
+                make_entry('POST', '/api/v3/batch', 0, 0.0, 0)
+            ],
+            {'GET /api/v3/measurements': SLO(p95=100, p99=300)},
+            SLO(p95=300, p99=500)
+        )
+
+        self.assertFalse(report['passed'])
+        self.assertEqual(
+            [(endpoint['endpoint'], endpoint['violations']) for endpoint in report['endpoints']],
+            [
+                ('GET /api/v3/measurements', ['p95 200ms > 100ms', 'p99 400ms > 300ms']),
+                ('POST /api/v3/user', ['failure ratio 5.00% > 1.00%']),
+                ('GET /api/v3/user/lists', [])
+            ]
+        )
@@ -0,0 +1,119 @@
+from types import SimpleNamespace
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+
+from cupboard_app.db_stats import MongoCommandListener, collect_query_stats
+from cupboard_app.metrics import record_cache_lookup
+from cupboard_app.models import Measurement
+
+API_VERSION = 'v3'
+
+
+def get_sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class MetricsApi(TestCase):
+    @override_settings(METRICS_TOKEN='test_token')
+    def test_request_counted_by_view(self):
+        """
+        Testing a request is counted with the URL name of its view and exported
+        """
+        labels = {'view': f'{API_VERSION}:measurements', 'method': 'GET'}
+        response = self.client.get(reverse(f'{API_VERSION}:measurements'))
+        status = str(response.status_code)
+        before = get_sample('cupboard_http_requests_total', status=status, **labels)
+
+        self.client.get(reverse(f'{API_VERSION}:measurements'))
+
+        after = get_sample('cupboard_http_requests_total', status=status, **labels)
+        self.assertEqual(after, before + 1)
+
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer test_token')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'cupboard_http_requests_total{', response.content)
+        self.assertIn(b'cupboard_db_queries_per_request_bucket{', response.content)
+
+    def test_unmatched_path_label(self):
+        """
+        Testing requests to unknown paths share one view label
+        """
+        labels = {'view': 'unmatched', 'method': 'GET', 'status': '404'}
+        before = get_sample('cupboard_http_requests_total', **labels)
+
+        self.client.get('/unknown/path/1')
+        self.client.get('/unknown/path/2')
+
+        self.assertEqual(get_sample('cupboard_http_requests_total', **labels), before + 2)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_metrics_disabled_without_token(self):
+        """
+        Testing the metrics cannot be read when no token is set
+        """
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN='test_token')
+    def test_metrics_token(self):
+        """
+        Testing the metrics require the token
+        """
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 401)
+
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 401)
+
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer test_token')
+        self.assertEqual(response.status_code, 200)
+
+
+class QueryStatsTests(TestCase):
+    def test_orm_queries_counted(self):
+        """
+        Testing the ORM queries made inside the block are counted
+        """
+        with collect_query_stats() as stats:
+            Measurement.objects.create(unit='test_unit')
+            list(Measurement.objects.all())
+
+        self.assertEqual(stats.queries, 2)
+
+        list(Measurement.objects.all())
+        self.assertEqual(stats.queries, 2)
+
+    def test_mongo_commands_counted(self):
+        """
+        Testing the Mongo commands are only added to the stats being collected
+        """
+        listener = MongoCommandListener()
+        event = SimpleNamespace(duration_micros=1500)
+
+        listener.succeeded(event)
+        with collect_query_stats() as stats:
+            listener.succeeded(event)
+            listener.failed(event)
+
+        self.assertEqual(stats.mongo_commands, 2)
+        self.assertAlmostEqual(stats.mongo_duration, 0.003)
+
+
+class CacheLookupMetrics(TestCase):
+    def test_cache_lookup(self):
+        """
+        Testing the cache lookups are counted by result
+        """
+        labels = {'cache': 'test_cache', 'namespace': 'test'}
+
+        record_cache_lookup('test_cache', 'local', 'test')
+        record_cache_lookup('test_cache', 'miss', 'test')
+        record_cache_lookup('test_cache', 'miss', 'test')
+
+        self.assertEqual(get_sample('cupboard_cache_lookups_total', result='local', **labels), 1)
+        self.assertEqual(get_sample('cupboard_cache_lookups_total', result='miss', **labels), 2)
@@ -0,0 +1,184 @@
+import gzip
+import json
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.http import HttpResponse, JsonResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from cupboard_app.db_stats import get_query_shape
+from cupboard_app.middleware import (
+    brotli,
+    choose_encoding,
+    CompressionMiddleware,
+    ENCODERS,
+    QueryBudgetExceeded,
+    QueryBudgetMiddleware
+)
+from cupboard_app.models import Measurement
+
+# Queries with different shapes
+DIFFERENT_QUERIES = [
+    lambda: Measurement.objects.count(),
+    lambda: Measurement.objects.exists(),
+    lambda: Measurement.objects.first(),
+    lambda: Measurement.objects.last(),
+    lambda: Measurement.objects.filter(unit='test').exists(),
+    lambda: Measurement.objects.filter(id=0).exists(),
+]
+LARGE_PAYLOAD = {'ingredients': [{'name': f'Ingredient {i}', 'type': 'Meat'} for i in range(100)]}
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1024)
+class CompressionMiddlewareTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.payload = LARGE_PAYLOAD
+
+    def get(self, middleware: CompressionMiddleware, accept_encoding: str = None):
+        headers = {'HTTP_ACCEPT_ENCODING': accept_encoding} if accept_encoding else {}
+        return middleware(self.factory.get('/', **headers))
+
+    def make_middleware(self, payload: dict, cache_compressed: bool = False):
+        def get_response(request):
+            response = JsonResponse(payload)
+            response.cache_compressed = cache_compressed
+            return response
+
+        return CompressionMiddleware(get_response)
+
+    def test_choose_encoding(self):
+        """
+        Testing the client's preference and quality values are respected
+        """
+        self.assertEqual(choose_encoding('gzip'), 'gzip')
+        self.assertEqual(choose_encoding('gzip;q=0.5, identity'), 'gzip')
+        self.assertIsNone(choose_encoding('gzip;q=0'))
+        self.assertIsNone(choose_encoding('identity'))
+        self.assertIsNone(choose_encoding(''))
+        self.assertEqual(choose_encoding('*'), next(iter(ENCODERS)))
+
+    def test_compress_large_response(self):
+        """
+        Testing a large response is compressed with the accepted coding
+        """
+        response = self.get(self.make_middleware(self.payload), 'gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(json.loads(gzip.decompress(response.content)), self.payload)
+
+    @skipUnless(brotli, 'brotli is not installed')
+    def test_compress_brotli(self):
+        """
+        Testing brotli is preferred over gzip when the client accepts both
+        """
+        response = self.get(self.make_middleware(self.payload), 'gzip, deflate, br')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(json.loads(brotli.decompress(response.content)), self.payload)
+
+    def test_small_or_unaccepted_response_not_compressed(self):
+        """
+        Testing small responses and clients not accepting a coding get the plain response
+        """
+        response = self.get(self.make_middleware({'message': 'ok'}), 'gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(json.loads(response.content), {'message': 'ok'})
+
+        response = self.get(self.make_middleware(self.payload))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(json.loads(response.content), self.payload)
+
+    def test_cached_payload_compressed_once(self):
+        """
+        Testing identical cacheable responses reuse the compressed payload
+        """
+        middleware = self.make_middleware(self.payload, cache_compressed=True)
+
+        with patch.object(gzip, 'compress', wraps=gzip.compress) as mock_compress:
+            first = self.get(middleware, 'gzip')
+            second = self.get(middleware, 'gzip')
+
+        self.assertEqual(mock_compress.call_count, 1)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(json.loads(gzip.decompress(second.content)), self.payload)
+
+
+@override_settings(
+    QUERY_BUDGET=3,
+    QUERY_BUDGETS={},
+    REPEATED_QUERY_LIMIT=2,
+    QUERY_BUDGET_ENFORCED=False
+)
+class QueryBudgetMiddlewareTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.units = [
+            Measurement.objects.create(unit=f'test_unit{i}').id for i in range(4)
+        ]
+
+    def make_middleware(self, units: int, same_query: bool = True):
+        def get_response(request):
+            for i in range(units):
+                if same_query:
+                    Measurement.objects.get(id=self.units[i])
+                else:
+                    DIFFERENT_QUERIES[i]()
+            return HttpResponse()
+
+        return QueryBudgetMiddleware(get_response)
+
+    def test_query_shape(self):
+        """
+        Testing queries that only differ by their values have the same shape
+        """
+        self.assertEqual(
+            get_query_shape("SELECT * FROM t1 WHERE id = %s AND name = 'a''b' LIMIT 21"),
+            get_query_shape("SELECT * FROM t1 WHERE id = %s AND name = 'c' LIMIT 2")
+        )
+        self.assertEqual(
+            get_query_shape('SELECT * FROM t1 WHERE id IN (%s, %s, %s)'),
+            get_query_shape('SELECT * FROM t1 WHERE id IN (%s)')
+        )
+
+    def test_within_budget(self):
+        """
+        Testing requests within the budget are not reported
+        """
+        with self.assertNoLogs('cupboard_app.middleware'):
+            response = self.make_middleware(2)(self.factory.get('/'))
+
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_over_budget(self):
+        """
+        Testing requests over the budget are logged with their database time
+        """
+        with self.assertLogs('cupboard_app.middleware', level='WARNING') as logs:
+            response = self.make_middleware(4, same_query=False)(self.factory.get('/'))
+
+        self.assertIn('4 queries over the budget of 3', logs.output[0])
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="4 queries"$')
+
+    def test_repeated_queries(self):
+        """
+        Testing the same query run once per object is reported as N+1 queries
+        """
+        with override_settings(QUERY_BUDGET=10):
+            with self.assertLogs('cupboard_app.middleware', level='WARNING') as logs:
+                self.make_middleware(3)(self.factory.get('/'))
+
+        self.assertIn('3 times the query SELECT', logs.output[0])
+
+    @override_settings(QUERY_BUDGET_ENFORCED=True, QUERY_BUDGETS={'unmatched': 5})
+    def test_enforced_view_budget(self):
+        """
+        Testing requests over their view's budget fail when the budgets are enforced
+        """
+        self.make_middleware(4, same_query=False)(self.factory.get('/'))
+
+        with self.assertRaises(QueryBudgetExceeded):
+            self.make_middleware(6, same_query=False)(self.factory.get('/'))
@@ -1,10 +1,30 @@
 import json
-
-from django.test import TestCase
-
+from unittest.mock import MagicMock, patch
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from pymongo.errors import OperationFailure
+
+import cupboard_app.queries as queries
+from cupboard_app.exceptions import WriteConflict
+from cupboard_app.custom_ingredient_cache import (
+    CustomIngredientCache,
+    get_cached_custom_ingredients,
+    reset_custom_ingredient_cache
+)
+from cupboard_app.ingredient_search import get_ingredient_index
+from cupboard_app.reference_data import (
+    REFERENCE_DATA_COUNTER,
+    VERSION_CHECK_INTERVAL,
+    get_reference_data,
+    invalidate_reference_data
+)
 from cupboard_app.models import (
+    Counter,
     Ingredient,
     ListName,
+    ListIngredient,
     Measurement,
     User,
     UserListIngredients,
@@ -47,9 +67,15 @@ from cupboard_app.queries import (
     edit_step_in_recipe,
     get_all_recipes,
     get_recipe,
+    run_in_transaction,
     GROCERY_LIST_NAME,
     PANTRY_LIST_NAME,
-    MAX_LISTS
+    MAX_LISTS,
+    MAX_TRANSACTION_ATTEMPTS,
+    MAX_WRITE_ATTEMPTS,
+    PARTLY_APPLIED,
+    NORMALIZED_STORAGE,
+    TRANSACTIONS_NOT_SUPPORTED
 )
 
 
@@ -1155,6 +1181,252 @@ class UserListIngredientsQueries(TestCase):
         self.assertEqual(user_list.ingredients, [updated_ing1, self.list_cust_ing1])
 
 
+@override_settings(LIST_INGREDIENTS_STORAGE=NORMALIZED_STORAGE)
+class NormalizedUserListIngredientsQueries(TestCase):
+    user1 = None
+    ing1 = None
+    cust_ing1 = None
+    list_name1 = None
+    list_name2 = None
+    unit1 = None
+    list_ing1 = None
+
+    def setUp(self):
+        self.user1 = User.objects.create(username='test_user1', email='user1@test.com')
+        self.ing1 = Ingredient.objects.create(name='test_ingredient1', type='test_type1')
+        self.cust_ing1 = CustomIngredient.objects.create(
+            user=self.user1,
+            name='test_custom_ingredient1',
+            type='test_type1'
+        )
+        self.list_name1 = ListName.objects.create(list_name='test_listname1')
+        self.list_name2 = ListName.objects.create(list_name='test_listname2')
+        self.unit1 = Measurement.objects.create(unit='test_unit1')
+        self.list_ing1 = {
+            'ingredient_name': self.ing1.name,
+            'ingredient_type': self.ing1.type,
+            'amount': 500,
+            'unit': self.unit1.unit,
+            'is_custom_ingredient': False
+        }
+
+    def test_add_list_ingredient(self):
+        """
+        Testing add_list_ingredient stores the ingredient as its own document
+        and returns the list with the same shape as the embedded storage mode
+        """
+        create_user_list_ingredients(
+            username=self.user1.username,
+            list_name=self.list_name1.list_name
+        )
+        add_list_ingredient(
+            username=self.user1.username,
+            list_name=self.list_name1.list_name,
+            ingredient=self.ing1.name,
+            amount=500,
+            unit=self.unit1.unit,
+            is_custom_ingredient=False
+        )
+        result = add_list_ingredient(
+            username=self.user1.username,
+            list_name=self.list_name1.list_name,
+            ingredient=self.ing1.name,
+            amount=100,
+            unit=self.unit1.unit,
+            is_custom_ingredient=False
+        )
+
+        self.assertEqual(result.ingredients, [{**self.list_ing1, 'amount': 600}])
+        self.assertEqual(
+            UserListIngredients.objects.get(list_name=self.list_name1).ingredients,
+            []
+        )
+        self.assertEqual(ListIngredient.objects.filter(user=self.user1).count(), 1)
+
+    def test_add_list_ingredient_interleaved(self):
+        """
+        Testing two requests adding the same ingredient to a normalized list at the
+        same time both add their amount when neither found a document to add to
+        """
+        create_user_list_ingredients(
+            username=self.user1.username,
+            list_name=self.list_name1.list_name
+        )
+        user_list = UserListIngredients.objects.get(list_name=self.list_name1)
+        create = ListIngredient.objects.create
+
+        def create_after_other_request(**kwargs):
+            # The other request creates the document first, so this insert is a duplicate
+            create(**{**kwargs, 'amount': 100})
+            raise DatabaseError('duplicate key error')
+
+        with patch.object(
+            ListIngredient.objects,
+            'create',
+            side_effect=create_after_other_request
+        ):
+            add_list_ingredient(
+                username=self.user1.username,
+                list_name=self.list_name1.list_name,
+                ingredient=self.ing1.name,
+                amount=500,
+                unit=self.unit1.unit,
+                is_custom_ingredient=False
+            )
+        add_list_ingredient(
+            username=self.user1.username,
+            list_name=self.list_name1.list_name,
+            ingredient=self.ing1.name,
+            amount=50,
+            unit=self.unit1.unit,
+            is_custom_ingredient=False
+        )
+
+        amounts = ListIngredient.objects.filter(user_list=user_list).values_list('amount')
+        self.assertEqual(list(amounts), [(650,)])
+
+    def test_set_list_ingredient_failed_move_put_back(self):
+        """
+        Testing a move between normalized lists that fails to add to the new list
+        puts the amount back in the old list
+        """
+        create_user_list_ingredients(
+            username=self.user1.username,
+            list_name=self.list_name1.list_name,
+            ingredients=[self.list_ing1]
+        )
+        create_user_list_ingredients(
+            username=self.user1.username,
+            list_name=self.list_name2.list_name
+        )
+
+        with patch.object(
+            ListIngredient.objects,
+            'create',
+            side_effect=DatabaseError('connection lost')
+        ), self.assertRaises(DatabaseError):
+            set_list_ingredient(
+                username=self.user1.username,
+                old_list_name=self.list_name1.list_name,
+                old_ingredient=self.ing1.name,
+                old_amount=200,
+                old_unit=self.unit1.unit,
+                old_is_custom_ingredient=False,
+                new_list_name=self.list_name2.list_name,
+                new_ingredient=self.ing1.name,
+                new_amount=200,
+                new_unit=self.unit1.unit,
+                new_is_custom_ingredient=False
+            )
+
+        result = get_user_lists_ingredients(username=self.user1.username)
+        self.assertEqual(result[0].ingredients, [self.list_ing1])
+        self.assertEqual(result[1].ingredients, [])
+
+    def test_split_embedded_list(self):
+        """
+        Testing lists created in the embedded storage mode are split into
+        ingredient documents when read
+        """
+        UserListIngredients.objects.create(
+            user=self.user1,
+            list_name=self.list_name1,
+            ingredients=[self.list_ing1]
+        )
+
+        result = get_specific_user_lists_ingredients(
+            username=self.user1.username,
+            list_name=self.list_name1.list_name
+        )
+
+        self.assertEqual(result.ingredients, [self.list_ing1])
+        self.assertEqual(ListIngredient.objects.filter(user=self.user1).count(), 1)
+
+    def test_set_and_delete_list_ingredient(self):
+        """
+        Testing set_list_ingredient moves ingredient documents between lists
+        and delete_list_ingredient removes them
+        """
+        create_user_list_ingredients(
+            username=self.user1.username,
+            list_name=self.list_name1.list_name,
+            ingredients=[self.list_ing1]
+        )
+        create_user_list_ingredients(
+            username=self.user1.username,
+            list_name=self.list_name2.list_name
+        )
+
+        result = set_list_ingredient(
+            username=self.user1.username,
+            old_list_name=self.list_name1.list_name,
+            old_ingredient=self.ing1.name,
+            old_amount=500,
+            old_unit=self.unit1.unit,
+            old_is_custom_ingredient=False,
+            new_list_name=self.list_name2.list_name,
+            new_ingredient=self.ing1.name,
+            new_amount=500,
+            new_unit=self.unit1.unit,
+            new_is_custom_ingredient=False
+        )
+
+        self.assertEqual(result[0].ingredients, [])
+        self.assertEqual(result[1].ingredients, [self.list_ing1])
+
+        result = delete_list_ingredient(
+            username=self.user1.username,
+            list_name=self.list_name2.list_name,
+            ingredient=self.ing1.name,
+            unit=self.unit1.unit,
+            is_custom_ingredient=False
+        )
+
+        self.assertEqual(result.ingredients, [])
+        self.assertFalse(ListIngredient.objects.filter(user=self.user1).exists())
+
+    def test_change_list_name_keeps_ingredients(self):
+        """
+        Testing change_user_list_ingredient_name keeps the ingredient documents
+        """
+        create_user_list_ingredients(
+            username=self.user1.username,
+            list_name=self.list_name1.list_name,
+            ingredients=[self.list_ing1]
+        )
+
+        result = change_user_list_ingredient_name(
+            username=self.user1.username,
+            old_list_name=self.list_name1.list_name,
+            new_list_name=self.list_name2.list_name
+        )
+
+        self.assertEqual(result.list_name, self.list_name2)
+        self.assertEqual(result.ingredients, [self.list_ing1])
+        self.assertEqual(ListIngredient.objects.filter(user=self.user1).count(), 1)
+
+    def test_delete_custom_ingredient_removes_list_items(self):
+        """
+        Testing delete_custom_ingredient removes the custom ingredient documents
+        """
+        create_user_list_ingredients(
+            username=self.user1.username,
+            list_name=self.list_name1.list_name
+        )
+        add_list_ingredient(
+            username=self.user1.username,
+            list_name=self.list_name1.list_name,
+            ingredient=self.cust_ing1.name,
+            amount=5,
+            unit=self.unit1.unit,
+            is_custom_ingredient=True
+        )
+
+        delete_custom_ingredient(username=self.user1.username, ingredient=self.cust_ing1.name)
+
+        self.assertFalse(ListIngredient.objects.filter(user=self.user1).exists())
+
+
 class RecipeQueries(TestCase):
     user1 = None
     ing1 = None
@@ -1665,3 +1937,473 @@ class RecipeQueries(TestCase):
         )
         recipe = get_recipe(self.user1.username, self.recipe_name2)
         self.assertEqual(recipe, recipe_created2)
+
+
+@patch('cupboard_app.queries.connection')
+class TransactionQueries(TestCase):
+    def transient_error(self) -> OperationFailure:
+        return OperationFailure(
+            'Write conflict',
+            code=112,
+            details={'errorLabels': ['TransientTransactionError']}
+        )
+
+    def test_run_in_transaction(self, mock_connection):
+        """
+        Testing run_in_transaction runs the writes with the transaction's session
+        """
+        session = mock_connection.client_connection.start_session.return_value.__enter__()
+        write = MagicMock()
+        write_without_transaction = MagicMock()
+
+        run_in_transaction(write, write_without_transaction)
+
+        write.assert_called_once_with(session)
+        session.start_transaction.assert_called_once()
+        write_without_transaction.assert_not_called()
+
+    def test_run_in_transaction_retries_transient_errors(self, mock_connection):
+        """
+        Testing run_in_transaction runs the transaction again after a transient error
+        and gives up after the max attempts
+        """
+        write = MagicMock(side_effect=[self.transient_error(), None])
+        run_in_transaction(write, MagicMock())
+        self.assertEqual(write.call_count, 2)
+
+        write = MagicMock(side_effect=self.transient_error())
+        with self.assertRaises(OperationFailure):
+            run_in_transaction(write, MagicMock())
+        self.assertEqual(write.call_count, MAX_TRANSACTION_ATTEMPTS)
+
+        write = MagicMock(side_effect=OperationFailure('Bad value', code=2))
+        with self.assertRaises(OperationFailure):
+            run_in_transaction(write, MagicMock())
+        self.assertEqual(write.call_count, 1)
+
+    def test_run_in_transaction_not_supported(self, mock_connection):
+        """
+        Testing run_in_transaction runs the writes without a transaction on a standalone server
+        """
+        write = MagicMock(side_effect=self.not_supported_error())
+        write_without_transaction = MagicMock()
+
+        run_in_transaction(write, write_without_transaction)
+
+        write.assert_called_once()
+        write_without_transaction.assert_called_once_with()
+
+    def not_supported_error(self) -> OperationFailure:
+        return OperationFailure(
+            'Transaction numbers are only allowed on a replica set member or mongos',
+            code=TRANSACTIONS_NOT_SUPPORTED
+        )
+
+    def create_recipes(self) -> tuple[Recipe, Recipe]:
+        user = User.objects.create(username='test_user1', email='user1@test.com')
+        return tuple(
+            Recipe.objects.create(user=user, recipe_name=name, steps=[], ingredients=[])
+            for name in ('test_recipename1', 'test_recipename2')
+        )
+
+    def test_save_if_unchanged_without_transaction_puts_back_saved_documents(self, mock_connection):
+        """
+        Testing save_if_unchanged on a standalone server puts back the documents it already
+        saved when a later one was changed, so nothing is applied and the change can run again
+        """
+        session = mock_connection.client_connection.start_session.return_value.__enter__()
+        session.start_transaction.side_effect = self.not_supported_error()
+        recipe1, recipe2 = self.create_recipes()
+        read_revision1 = recipe1.revision
+        previous1 = {'steps': [], 'revision': read_revision1}
+        recipe1.steps = ['My step']
+        recipe2.steps = ['My step']
+
+        with (
+            patch.object(
+                Recipe.objects,
+                'mongo_find_one_and_update',
+                create=True,
+                side_effect=[previous1, None]
+            ) as mock_find_one_and_update,
+            patch.object(
+                Recipe.objects,
+                'mongo_update_one',
+                create=True,
+                return_value=MagicMock(matched_count=1)
+            ) as mock_update_one
+        ):
+            self.assertFalse(queries.save_if_unchanged([recipe1, recipe2], ['steps']))
+
+        self.assertEqual(
+            [call.args[0] for call in mock_find_one_and_update.call_args_list],
+            [
+                {'id': recipe1.id, 'revision': read_revision1},
+                {'id': recipe2.id, 'revision': read_revision1 + 1}
+            ]
+        )
+        filter, update = mock_update_one.call_args.args
+        self.assertEqual(filter, {'id': recipe1.id, 'revision': recipe1.revision})
+        self.assertEqual(update['$set'], previous1)
+        self.assertEqual(set(update['$unset']), {'updated_at'})
+
+    def test_save_if_unchanged_without_transaction_partly_applied(self, mock_connection):
+        """
+        Testing save_if_unchanged on a standalone server raises a conflict instead of returning
+        False when another request changed a saved document before it could be put back
+        """
+        session = mock_connection.client_connection.start_session.return_value.__enter__()
+        session.start_transaction.side_effect = self.not_supported_error()
+        recipe1, recipe2 = self.create_recipes()
+
+        with (
+            patch.object(
+                Recipe.objects,
+                'mongo_find_one_and_update',
+                create=True,
+                side_effect=[{'steps': []}, None]
+            ),
+            patch.object(
+                Recipe.objects,
+                'mongo_update_one',
+                create=True,
+                return_value=MagicMock(matched_count=0)
+            )
+        ):
+            with self.assertRaises(WriteConflict) as context:
+                queries.save_if_unchanged([recipe1, recipe2], ['steps'])
+
+        self.assertEqual(context.exception.detail, PARTLY_APPLIED)
+
+
+class ConcurrentWriteQueries(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username='test_user1', email='user1@test.com')
+        self.recipe = Recipe.objects.create(
+            user=self.user1,
+            recipe_name='test_recipename1',
+            steps=[],
+            ingredients=[]
+        )
+
+    def test_add_step_to_recipe_retries_after_concurrent_change(self):
+        """
+        Testing a step added by another request between the read and the save
+        is kept instead of being overwritten
+        """
+        save_if_unchanged = queries.save_if_unchanged
+        calls = []
+
+        def concurrent_save(documents, field_names):
+            if not calls:
+                calls.append(documents)
+                # Another device adds a step after this request read the recipe
+                add_step_to_recipe(self.user1.username, self.recipe.recipe_name, 'Other step')
+            return save_if_unchanged(documents, field_names)
+
+        with patch.object(queries, 'save_if_unchanged', side_effect=concurrent_save):
+            user_recipe = add_step_to_recipe(
+                self.user1.username,
+                self.recipe.recipe_name,
+                'My step'
+            )
+
+        self.assertEqual(user_recipe.steps, ['Other step', 'My step'])
+        self.assertEqual(
+            Recipe.objects.get(id=self.recipe.id).steps,
+            ['Other step', 'My step']
+        )
+
+    def test_add_step_to_recipe_gives_up_after_max_attempts(self):
+        """
+        Testing add_step_to_recipe raises a conflict if the recipe keeps changing
+        """
+        with patch.object(queries, 'save_if_unchanged', return_value=False) as mock_save:
+            with self.assertRaises(WriteConflict):
+                add_step_to_recipe(self.user1.username, self.recipe.recipe_name, 'My step')
+
+        self.assertEqual(mock_save.call_count, MAX_WRITE_ATTEMPTS)
+        self.assertEqual(Recipe.objects.get(id=self.recipe.id).steps, [])
+
+    def test_edit_step_in_recipe_retries_after_concurrent_change(self):
+        """
+        Testing a step added by another request between the read and the save
+        is kept when a step is edited
+        """
+        Recipe.objects.filter(id=self.recipe.id).update(steps=['Step 1'])
+        save_if_unchanged = queries.save_if_unchanged
+        calls = []
+
+        def concurrent_save(documents, field_names):
+            if not calls:
+                calls.append(documents)
+                add_step_to_recipe(self.user1.username, self.recipe.recipe_name, 'Other step')
+            return save_if_unchanged(documents, field_names)
+
+        with patch.object(queries, 'save_if_unchanged', side_effect=concurrent_save):
+            edit_step_in_recipe(self.user1.username, self.recipe.recipe_name, 'My step', 1)
+
+        self.assertEqual(Recipe.objects.get(id=self.recipe.id).steps, ['My step', 'Other step'])
+
+    def test_remove_ingredient_from_recipe_retries_after_concurrent_change(self):
+        """
+        Testing a step added by another request between the read and the save
+        is kept when an ingredient is removed
+        """
+        ingredient = {
+            'ingredient_name': 'test_ingredient1',
+            'ingredient_type': 'test_type1',
+            'amount': 1,
+            'unit': 'test_unit1',
+            'is_custom_ingredient': False
+        }
+        Recipe.objects.filter(id=self.recipe.id).update(ingredients=[ingredient])
+        save_if_unchanged = queries.save_if_unchanged
+        calls = []
+
+        def concurrent_save(documents, field_names):
+            if not calls:
+                calls.append(documents)
+                add_step_to_recipe(self.user1.username, self.recipe.recipe_name, 'Other step')
+            return save_if_unchanged(documents, field_names)
+
+        with patch.object(queries, 'save_if_unchanged', side_effect=concurrent_save):
+            remove_ingredient_from_recipe(
+                self.user1.username,
+                self.recipe.recipe_name,
+                'test_ingredient1',
+                'test_unit1',
+                False
+            )
+
+        user_recipe = Recipe.objects.get(id=self.recipe.id)
+        self.assertEqual(user_recipe.ingredients, [])
+        self.assertEqual(user_recipe.steps, ['Other step'])
+
+    def test_remove_step_from_recipe_gives_up_after_max_attempts(self):
+        """
+        Testing remove_step_from_recipe raises a conflict if the recipe keeps changing
+        """
+        Recipe.objects.filter(id=self.recipe.id).update(steps=['Step 1'])
+
+        with patch.object(queries, 'save_if_unchanged', return_value=False) as mock_save:
+            with self.assertRaises(WriteConflict):
+                remove_step_from_recipe(self.user1.username, self.recipe.recipe_name, 1)
+
+        self.assertEqual(mock_save.call_count, MAX_WRITE_ATTEMPTS)
+        self.assertEqual(Recipe.objects.get(id=self.recipe.id).steps, ['Step 1'])
+
+
+class ReferenceDataQueries(TestCase):
+    def setUp(self):
+        invalidate_reference_data()
+        reset_custom_ingredient_cache()
+        self.user1 = User.objects.create(username='test_user1', email='user1@test.com')
+        self.ing1 = Ingredient.objects.create(name='test_ingredient1', type='test_type1')
+        self.cust_ing1 = CustomIngredient.objects.create(
+            user=self.user1,
+            name='test_custom1',
+            type='test_type1'
+        )
+        self.unit1 = Measurement.objects.create(unit='test_unit1')
+
+    def test_create_list_ingredient_uses_reference_data(self):
+        """
+        Testing create_list_ingredient does not query the database once
+        the reference data is loaded
+        """
+        create_list_ingredient(self.ing1.name, 1, self.unit1.unit)
+        create_list_ingredient(self.cust_ing1.name, 1, self.unit1.unit, self.user1.id)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                create_list_ingredient(self.ing1.name, 1, self.unit1.unit),
+                {
+                    'ingredient_name': self.ing1.name,
+                    'ingredient_type': self.ing1.type,
+                    'amount': 1,
+                    'unit': self.unit1.unit,
+                    'is_custom_ingredient': False
+                }
+            )
+
+        # Custom ingredients only read the user's revision
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                create_list_ingredient(self.cust_ing1.name, 1, self.unit1.unit, self.user1.id),
+                {
+                    'ingredient_name': self.cust_ing1.name,
+                    'ingredient_type': self.cust_ing1.type,
+                    'amount': 1,
+                    'unit': self.unit1.unit,
+                    'is_custom_ingredient': True
+                }
+            )
+
+    def test_create_list_ingredient_added_by_another_process(self):
+        """
+        Testing ingredients and units added after the reference data was loaded
+        are still found in the database
+        """
+        create_list_ingredient(self.ing1.name, 1, self.unit1.unit)
+
+        # bulk_create does not notify this process, like a change from another worker
+        Ingredient.objects.bulk_create([Ingredient(name='test_ingredient2', type='test_type2')])
+        Measurement.objects.bulk_create([Measurement(unit='test_unit2')])
+
+        result = create_list_ingredient('test_ingredient2', 1, 'test_unit2')
+        self.assertEqual(result['ingredient_type'], 'test_type2')
+        self.assertEqual(result['unit'], 'test_unit2')
+
+        # Deleting an ingredient drops the reference data
+        self.ing1.delete()
+        with self.assertRaises(Ingredient.DoesNotExist):
+            create_list_ingredient(self.ing1.name, 1, self.unit1.unit)
+
+    def test_reference_data_changed_by_another_process(self):
+        """
+        Testing a change made by another process is loaded once the version is checked
+        again, even if the number of ingredients and measurements did not change
+        """
+        reference_data = get_reference_data()
+
+        # Another process changes a type, which sends no signal here, and bumps the version
+        Ingredient.objects.filter(id=self.ing1.id).update(type='test_type2')
+        Counter.objects.increment(REFERENCE_DATA_COUNTER)
+        self.assertIs(get_reference_data(), reference_data)
+
+        reference_data.checked_at -= VERSION_CHECK_INTERVAL + 1
+        self.assertEqual(
+            get_reference_data().ingredients[self.ing1.name],
+            (self.ing1.name, 'test_type2')
+        )
+
+    def test_ingredient_index_follows_reference_data(self):
+        """
+        Testing the ingredient index is kept while the reference data is unchanged
+        and rebuilt once a change made by another process is loaded
+        """
+        index = get_ingredient_index()
+        self.assertIs(get_ingredient_index(), index)
+
+        # Another process adds an ingredient, which sends no signal here, and bumps the version
+        Ingredient.objects.bulk_create([Ingredient(name='test_ingredient2', type='test_type2')])
+        Counter.objects.increment(REFERENCE_DATA_COUNTER)
+        self.assertIs(get_ingredient_index(), index)
+
+        get_reference_data().checked_at -= VERSION_CHECK_INTERVAL + 1
+        self.assertIsNot(get_ingredient_index(), index)
+        self.assertIn('test_ingredient2', get_ingredient_index().keys)
+
+    def test_reference_data_change_bumps_version(self):
+        """
+        Testing saving or deleting an ingredient or measurement bumps the version
+        """
+        version = Counter.objects.get_value(REFERENCE_DATA_COUNTER)
+
+        Ingredient.objects.create(name='test_ingredient2', type='test_type2')
+        self.unit1.delete()
+
+        self.assertEqual(Counter.objects.get_value(REFERENCE_DATA_COUNTER), version + 2)
+
+
+@override_settings(SHARED_CACHE=None)
+class CustomIngredientCacheQueries(TestCase):
+    def setUp(self):
+        reset_custom_ingredient_cache()
+        self.shared = LocMemCache('custom_ingredients_test', {})
+        self.shared.clear()
+        self.user1 = User.objects.create(username='test_user1', email='user1@test.com')
+        self.user2 = User.objects.create(username='test_user2', email='user2@test.com')
+        self.cust_ing1 = CustomIngredient.objects.create(
+            user=self.user1,
+            name='test_custom1',
+            type='test_type1'
+        )
+
+    def tearDown(self):
+        reset_custom_ingredient_cache()
+
+    def test_write_through_on_create_and_delete(self):
+        """
+        Testing creating and deleting custom ingredients updates the cached ingredients
+        """
+        self.assertEqual(
+            get_cached_custom_ingredients(self.user1.id),
+            {'test_custom1': ('test_custom1', 'test_type1')}
+        )
+
+        # Only the user's revision is read
+        create_custom_ingredient(self.user1.username, 'test_custom2', 'test_type2')
+        with self.assertNumQueries(1):
+            self.assertIn('test_custom2', get_cached_custom_ingredients(self.user1.id))
+
+        delete_custom_ingredient(self.user1.username, 'test_custom1')
+        with self.assertNumQueries(1):
+            self.assertNotIn('test_custom1', get_cached_custom_ingredients(self.user1.id))
+
+    def test_shared_cache_invalidates_other_processes(self):
+        """
+        Testing a write in one process is seen by another process sharing the cache
+        """
+        worker1 = CustomIngredientCache(self.shared)
+        worker2 = CustomIngredientCache(self.shared)
+
+        self.assertIn('test_custom1', worker1.get(self.user1.id))
+        # The second worker reads the first worker's copy from the shared cache
+        # after checking the user's revision
+        with self.assertNumQueries(1):
+            self.assertIn('test_custom1', worker2.get(self.user1.id))
+
+        CustomIngredient.objects.create(user=self.user1, name='test_custom2', type='test_type2')
+        worker1.changed(self.user1.id)
+
+        with self.assertNumQueries(1):
+            self.assertIn('test_custom2', worker2.get(self.user1.id))
+
+    def test_shared_cache_version_is_user_revision(self):
+        """
+        Testing the shared cache keeps no version of its own, so concurrent writes
+        cannot lose an increment on a backend without an atomic incr
+        """
+        worker = CustomIngredientCache(self.shared)
+        CustomIngredient.objects.create(user=self.user1, name='test_custom2', type='test_type2')
+        worker.changed(self.user1.id)
+
+        self.user1.refresh_from_db()
+        self.assertEqual(
+            self.shared.get(f'custom_ingredients:{self.user1.id}')[0],
+            self.user1.revision
+        )
+        self.assertIsNone(self.shared.get(f'custom_ingredients:{self.user1.id}:version'))
+
+    def test_user_revision_invalidates_other_processes(self):
+        """
+        Testing a custom ingredient deleted in one process is not used by another
+        process without a shared cache
+        """
+        worker1 = CustomIngredientCache()
+        worker2 = CustomIngredientCache()
+        self.assertIn('test_custom1', worker2.get(self.user1.id))
+
+        # Only the user's revision is read while it is unchanged
+        with self.assertNumQueries(1):
+            self.assertIn('test_custom1', worker2.get(self.user1.id))
+
+        self.cust_ing1.delete()
+        worker1.changed(self.user1.id)
+
+        self.assertNotIn('test_custom1', worker2.get(self.user1.id))
+
+    def test_budget_evicts_least_recently_used(self):
+        """
+        Testing the least recently used users are dropped over the budget
+        """
+        CustomIngredient.objects.create(user=self.user2, name='test_custom2', type='test_type2')
+        cache = CustomIngredientCache(budget=1)
+
+        cache.get(self.user1.id)
+        cache.get(self.user2.id)
+
+        self.assertEqual(list(cache.entries), [self.user2.id])
+        self.assertEqual(cache.size, 1)
@@ -0,0 +1,117 @@
+import json
+import re
+from inspect import isfunction
+from unittest.mock import patch
+
+from django.test import TestCase, modify_settings
+from rest_framework.reverse import reverse
+from rest_framework_simplejwt.backends import TokenBackend
+
+import cupboard_app.queries as queries
+from cupboard_app.models import ListName, User, UserListIngredients
+from cupboard_app.queries import GROCERY_LIST_NAME, get_user_lists_ingredients
+from cupboard_app.request_timing import (
+    QUERIES_PHASE,
+    collect_request_timings,
+    instrument_request_phases,
+    timed_query
+)
+from cupboard_app.test_api import API_VERSION, CUPBOARD_EMAIL_CLAIM, USER_VALID_TOKEN_PAYLOAD
+from cupboard_app.tiered_cache import reset_tiered_cache
+
+SERVER_TIMING_ENTRY = re.compile(r'^(\w+);dur=[\d.]+(;desc="[^"]*")?$')
+
+
+@modify_settings(MIDDLEWARE={'append': 'cupboard_app.middleware.ServerTimingMiddleware'})
+class ServerTimingApi(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        instrument_request_phases()
+
+    def setUp(self):
+        reset_tiered_cache()
+        user = User.objects.create(
+            username=USER_VALID_TOKEN_PAYLOAD.get('sub'),
+            email=USER_VALID_TOKEN_PAYLOAD.get(CUPBOARD_EMAIL_CLAIM)
+        )
+        UserListIngredients.objects.create(
+            user=user,
+            list_name=ListName.objects.create(list_name=GROCERY_LIST_NAME),
+            ingredients=[]
+        )
+
+    @patch.object(TokenBackend, 'decode')
+    def test_server_timing(self, mock_decode):
+        """
+        Testing the time of each phase is sent in the Server-Timing header and logged as JSON
+        """
+        mock_decode.return_value = USER_VALID_TOKEN_PAYLOAD
+
+        with self.assertLogs('cupboard_app.timing', level='INFO') as logs:
+            response = self.client.get(
+                reverse(f'{API_VERSION}:user_list_ingredients'),
+                HTTP_AUTHORIZATION='Bearer valid-token'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        entries = [entry.strip() for entry in response['Server-Timing'].split(',')]
+        for entry in entries:
+            self.assertRegex(entry, SERVER_TIMING_ENTRY)
+        self.assertEqual(
+            [entry.split(';')[0] for entry in entries],
+            ['auth', 'queries', 'serialize', 'render', 'db', 'mongo', 'total']
+        )
+
+        timing = json.loads(logs.records[0].getMessage())
+        self.assertEqual(timing['view'], f'{API_VERSION}:user_list_ingredients')
+        self.assertEqual(timing['status'], 200)
+        self.assertEqual(timing['phases']['auth']['calls'], 1)
+        self.assertEqual(timing['queries']['get_user_lists_ingredients']['calls'], 1)
+
+
+class RequestTimingsTests(TestCase):
+    def test_nested_queries_timed_once(self):
+        """
+        Testing only the outermost call of the functions in queries.py is timed
+        """
+        @timed_query
+        def outer():
+            get_user_lists_ingredients(username='test_user')
+            get_user_lists_ingredients(username='test_user')
+
+        with collect_request_timings() as timings:
+            outer()
+            get_user_lists_ingredients(username='test_user')
+
+        self.assertEqual(timings.phases[QUERIES_PHASE][1], 2)
+        self.assertEqual(
+            {function: calls for function, (seconds, calls) in timings.functions.items()},
+            {'outer': 1, 'get_user_lists_ingredients': 1}
+        )
+
+    def test_public_queries_timed(self):
+        """
+        Testing every public function in queries.py that queries the database is timed,
+        and the functions that only build a queryset or a dictionary are not
+        """
+        untimed = {
+            name for name, value in vars(queries).items()
+            if isfunction(value) and value.__module__ == queries.__name__
+            and not name.startswith('_') and not hasattr(value, '__wrapped__')
+        }
+
+        self.assertEqual(untimed, {
+            'is_normalized_storage',
+            'get_all_ingredients',
+            'get_all_list_names',
+            'get_all_measurements',
+            'get_all_users',
+            'create_list_ingredient'
+        })
+
+    def test_not_collected(self):
+        """
+        Testing the functions run unchanged when the timings are not collected
+        """
+        self.assertEqual(list(get_user_lists_ingredients(username='test_user')), [])
@@ -0,0 +1,142 @@
+import json
+import os
+import sys
+import tempfile
+from collections import Counter
+from io import StringIO
+from time import perf_counter, time
+
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from cupboard_app.middleware import SamplingProfilerMiddleware
+from cupboard_app.sampling_profiler import (
+    ProfileRateLimiter,
+    ProfileStore,
+    StackSampler,
+    read_collapsed
+)
+
+STACKS = Counter({'view (views.py:1);query (queries.py:1)': 3, 'view (views.py:1)': 1})
+
+
+def busy_view(request):
+    start = perf_counter()
+    while perf_counter() - start < 0.1:
+        sum(i * i for i in range(1000))
+    return HttpResponse()
+
+
+def fast_view(request):
+    return HttpResponse()
+
+
+class SamplingProfilerTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.directory = tempfile.TemporaryDirectory()
+        self.view_directory = os.path.join(self.directory.name, 'unmatched')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def get_profiles(self) -> list[str]:
+        if not os.path.isdir(self.view_directory):
+            return []
+        return os.listdir(self.view_directory)
+
+    def test_slow_request_profiled(self):
+        """
+        Testing requests slower than the threshold are profiled and faster ones are not
+        """
+        with override_settings(
+            PROFILER_DIR=self.directory.name,
+            PROFILER_SAMPLE_RATE=1000000,
+            PROFILER_SLOW_THRESHOLD=0.05
+        ):
+            SamplingProfilerMiddleware(fast_view)(self.factory.get('/'))
+            self.assertEqual(self.get_profiles(), [])
+
+            SamplingProfilerMiddleware(busy_view)(self.factory.get('/'))
+
+        profiles = self.get_profiles()
+        self.assertEqual(len(profiles), 1)
+        self.assertRegex(profiles[0], r'^\d+-\d+-GET-\d+ms\.collapsed$')
+
+        stacks = read_collapsed(os.path.join(self.view_directory, profiles[0]))
+        self.assertTrue(stacks)
+        for stack in stacks:
+            self.assertTrue(stack.startswith('__call__ (cupboard_app/middleware.py:'))
+        self.assertTrue(any('busy_view (cupboard_app/test_sampling_profiler.py:' in stack
+                            for stack in stacks))
+
+    def test_sampler_waits_for_start_time(self):
+        """
+        Testing a thread is only sampled once it runs past its delay and
+        the sampler waits without a timeout while no thread is sampled
+        """
+        sampler = StackSampler(0.001)
+        self.assertIsNone(sampler.get_timeout())
+
+        stacks = sampler.start(sys._getframe(), delay=60)
+        self.assertGreater(sampler.get_timeout(), 59)
+        sampler.sample()
+        self.assertEqual(sampler.stop(), Counter())
+        self.assertEqual(stacks, Counter())
+        self.assertIsNone(sampler.get_timeout())
+
+        stacks = sampler.start(sys._getframe())
+        sampler.sample()
+        sampler.stop()
+        self.assertGreaterEqual(sum(stacks.values()), 1)
+
+    def test_rate_limit(self):
+        """
+        Testing each view keeps at most the limit of profiles per minute
+        """
+        limiter = ProfileRateLimiter(2)
+
+        self.assertTrue(limiter.allow('v3:measurements'))
+        self.assertTrue(limiter.allow('v3:measurements'))
+        self.assertFalse(limiter.allow('v3:measurements'))
+        self.assertTrue(limiter.allow('v3:ingredients'))
+
+    def test_store_limits(self):
+        """
+        Testing the store keeps the newest profiles up to the limit and none past the retention
+        """
+        store = ProfileStore(self.directory.name, max_files=2, retention=60)
+        expired = store.save('unmatched', 'GET', 0.5, STACKS)
+        os.utime(expired, (time() - 120, time() - 120))
+
+        store.save('unmatched', 'GET', 0.5, STACKS)
+        self.assertEqual(len(self.get_profiles()), 1)
+
+        store.save('unmatched', 'GET', 0.5, STACKS)
+        store.save('unmatched', 'GET', 0.5, STACKS)
+        self.assertEqual(len(self.get_profiles()), 2)
+
+    def test_aggregate_profiles(self):
+        """
+        Testing the profiles of each view are added up into a flame graph
+        """
+        store = ProfileStore(self.directory.name, max_files=10, retention=60)
+        store.save('v3:measurements', 'GET', 0.5, STACKS)
+        store.save('v3:measurements', 'GET', 0.5, STACKS)
+
+        out = StringIO()
+        call_command('aggregate_profiles', dir=self.directory.name, stdout=out)
+        self.assertIn('v3.measurements: 2 profiles, 8 samples', out.getvalue())
+
+        stacks = read_collapsed(
+            os.path.join(self.directory.name, 'v3.measurements.all.collapsed')
+        )
+        self.assertEqual(stacks, STACKS + STACKS)
+
+        with open(os.path.join(self.directory.name, 'v3.measurements.speedscope.json')) as file:
+            speedscope = json.load(file)
+        frames = [frame['name'] for frame in speedscope['shared']['frames']]
+        self.assertEqual(frames, ['view (views.py:1)', 'query (queries.py:1)'])
+        self.assertEqual(speedscope['profiles'][0]['samples'], [[0, 1], [0]])
+        self.assertEqual(speedscope['profiles'][0]['weights'], [6, 2])
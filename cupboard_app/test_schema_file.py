@@ -0,0 +1,87 @@
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+
+import yaml
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from cupboard_app.schema_file import (
+    JSON_CONTENT_TYPE,
+    YAML_CONTENT_TYPE,
+    reset_precomputed_schema
+)
+
+API_VERSION = 'v3'
+
+
+class SchemaFileApi(TestCase):
+    def setUp(self):
+        reset_precomputed_schema()
+        self.url = reverse(f'{API_VERSION}:schema-v3')
+        with open(settings.OPENAPI_SCHEMA_FILE, 'rb') as schema_file:
+            self.content = schema_file.read()
+
+    def tearDown(self):
+        reset_precomputed_schema()
+
+    def test_schema_served_from_file(self):
+        """
+        Testing the schema is the generated file with an ETag and
+        is compressed with the accepted coding
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], YAML_CONTENT_TYPE)
+        self.assertEqual(response.content, self.content)
+        self.assertTrue(response.has_header('ETag'))
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.content)
+
+    def test_schema_json(self):
+        """
+        Testing the schema is served as JSON with ?format=json
+        """
+        response = self.client.get(self.url, {'format': 'json'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], JSON_CONTENT_TYPE)
+        self.assertEqual(json.loads(response.content), yaml.safe_load(self.content))
+
+    def test_schema_not_modified(self):
+        """
+        Testing the schema is not sent again while the client's ETag is current
+        """
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_schema_generated_without_file(self):
+        """
+        Testing the schema is generated when the schema file does not exist
+        """
+        with override_settings(OPENAPI_SCHEMA_FILE=os.path.join(tempfile.gettempdir(), 'none.yml')):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(yaml.safe_load(response.content)['info']['title'], 'Cupboard API')
+
+    def test_schema_file_up_to_date(self):
+        """
+        Testing the schema file matches the schema generated from the views
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'schema.yml')
+            call_command('spectacular', '--file', path, stdout=StringIO(), stderr=StringIO())
+            with open(path, 'rb') as schema_file:
+                generated = schema_file.read()
+
+        self.assertEqual(yaml.safe_load(generated), yaml.safe_load(self.content))
@@ -0,0 +1,202 @@
+from threading import Thread
+from time import sleep
+from unittest.mock import MagicMock
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase, override_settings
+
+from cupboard_app.models import Measurement, User
+from cupboard_app.queries import get_user_id
+from cupboard_app.tiered_cache import (
+    MEASUREMENTS_NAMESPACE,
+    TieredCache,
+    cached,
+    reset_tiered_cache
+)
+
+
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        self.shared = LocMemCache('tiered_cache_test', {})
+        self.shared.clear()
+
+    def test_local_hit_skips_compute(self):
+        """
+        Testing a cached value is not computed again
+        """
+        cache = TieredCache()
+        compute = MagicMock(return_value='value')
+
+        self.assertEqual(cache.get_or_set('test', 'key', compute), 'value')
+        self.assertEqual(cache.get_or_set('test', 'key', compute), 'value')
+        self.assertEqual(compute.call_count, 1)
+
+    def test_shared_value_used_by_other_process(self):
+        """
+        Testing a value computed in one process is read from the shared cache by another
+        """
+        worker1 = TieredCache(self.shared)
+        worker2 = TieredCache(self.shared)
+
+        worker1.get_or_set('test', 'key', lambda: 'value')
+        compute = MagicMock(return_value='other')
+
+        self.assertEqual(worker2.get_or_set('test', 'key', compute), 'value')
+        compute.assert_not_called()
+
+    def test_invalidate_namespace(self):
+        """
+        Testing invalidating a namespace only drops the entries of that namespace,
+        including in the other processes sharing the cache
+        """
+        worker1 = TieredCache(self.shared)
+        worker2 = TieredCache(self.shared)
+        worker2.get_or_set('test', 'key', lambda: 'old')
+        worker2.get_or_set('other', 'key', lambda: 'kept')
+
+        worker1.invalidate('test')
+        # Forget when the version was last read, as if VERSION_CHECK_INTERVAL passed
+        worker2.versions.clear()
+
+        self.assertEqual(worker2.get_or_set('test', 'key', lambda: 'new'), 'new')
+        self.assertEqual(worker2.get_or_set('other', 'key', lambda: 'new'), 'kept')
+
+    def test_lru_eviction(self):
+        """
+        Testing the least recently used entries are dropped over the max entries
+        """
+        cache = TieredCache(max_entries=2)
+        cache.get_or_set('test', 'a', lambda: 'a')
+        cache.get_or_set('test', 'b', lambda: 'b')
+        cache.get_or_set('test', 'a', lambda: 'a')
+        cache.get_or_set('test', 'c', lambda: 'c')
+
+        self.assertEqual(cache.get_or_set('test', 'a', lambda: 'new'), 'a')
+        self.assertEqual(cache.get_or_set('test', 'b', lambda: 'new'), 'new')
+
+    def test_stampede_computes_once(self):
+        """
+        Testing concurrent callers of a missing key only compute it once
+        """
+        cache = TieredCache(self.shared)
+        # Read the namespace's version first so the threads only race on computing the value
+        cache.make_key('test', 'key')
+        calls = []
+
+        def compute():
+            calls.append(1)
+            sleep(0.05)
+            return 'value'
+
+        results = []
+        threads = [
+            Thread(target=lambda: results.append(cache.get_or_set('test', 'key', compute)))
+            for i in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 5)
+
+    def test_lock_taken_over_not_released(self):
+        """
+        Testing a caller whose lock expired does not release the lock
+        another process took over while it was computing
+        """
+        cache = TieredCache(self.shared)
+        lock_key = f"{cache.make_key('test', 'key')}:lock"
+
+        def compute():
+            # The lock expired and another process took it
+            self.shared.set(lock_key, 'other')
+            return 'value'
+
+        self.assertEqual(cache.get_or_set('test', 'key', compute), 'value')
+        self.assertEqual(self.shared.get(lock_key), 'other')
+
+    def test_lock_released_after_compute(self):
+        """
+        Testing a caller releases its own lock after computing the value
+        """
+        cache = TieredCache(self.shared)
+        lock_key = f"{cache.make_key('test', 'key')}:lock"
+
+        cache.get_or_set('test', 'key', lambda: 'value')
+
+        self.assertIsNone(self.shared.get(lock_key))
+
+    def test_invalidate_without_shared_cache(self):
+        """
+        Testing invalidating a namespace without a shared cache is seen by the other processes
+        """
+        worker1 = TieredCache()
+        worker2 = TieredCache()
+        worker2.get_or_set('test', 'key', lambda: 'old')
+
+        worker1.invalidate('test')
+        # Forget when the version was last read, as if VERSION_CHECK_INTERVAL passed
+        worker2.versions.clear()
+
+        self.assertEqual(worker2.get_or_set('test', 'key', lambda: 'new'), 'new')
+
+    def test_failed_compute_not_cached(self):
+        """
+        Testing an exception while computing is raised and nothing is cached
+        """
+        cache = TieredCache(self.shared)
+
+        with self.assertRaises(User.DoesNotExist):
+            cache.get_or_set('test', 'key', MagicMock(side_effect=User.DoesNotExist))
+
+        self.assertEqual(cache.get_or_set('test', 'key', lambda: 'value'), 'value')
+
+
+@override_settings(SHARED_CACHE=None)
+class TieredCacheEntityTests(TestCase):
+    def setUp(self):
+        reset_tiered_cache()
+        self.user1 = User.objects.create(username='test_user1', email='user1@test.com')
+
+    def tearDown(self):
+        reset_tiered_cache()
+
+    def test_get_user_id_cached(self):
+        """
+        Testing the user's ID is only read from the database once
+        """
+        self.assertEqual(get_user_id(self.user1.username), self.user1.id)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_id(self.user1.username), self.user1.id)
+
+        with self.assertRaises(User.DoesNotExist):
+            get_user_id('test_user2')
+
+    def test_user_change_drops_cached_id(self):
+        """
+        Testing deleting a user drops the cached ID
+        """
+        get_user_id(self.user1.username)
+        self.user1.delete()
+
+        with self.assertRaises(User.DoesNotExist):
+            get_user_id(self.user1.username)
+
+    def test_measurement_change_invalidates_namespace(self):
+        """
+        Testing adding a measurement invalidates the cached measurements
+        """
+        def get_units():
+            return list(Measurement.objects.values_list('unit', flat=True))
+
+        Measurement.objects.create(unit='test_unit1')
+        self.assertEqual(cached(MEASUREMENTS_NAMESPACE, 'all', get_units), ['test_unit1'])
+
+        Measurement.objects.create(unit='test_unit2')
+        self.assertEqual(
+            cached(MEASUREMENTS_NAMESPACE, 'all', get_units),
+            ['test_unit1', 'test_unit2']
+        )
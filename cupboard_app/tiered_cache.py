@@ -0,0 +1,314 @@
+from collections import OrderedDict
+from hashlib import blake2b
+from threading import Lock
+from time import monotonic, sleep
+from typing import Any, Callable
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from cupboard_app.metrics import record_cache_lookup
+from cupboard_app.models import Counter, Ingredient, Measurement, User
+
+# Namespaces of the cached entities
+INGREDIENTS_NAMESPACE = 'ingredients'
+MEASUREMENTS_NAMESPACE = 'measurements'
+USERS_NAMESPACE = 'users'
+LISTS_NAMESPACE = 'lists'
+
+# Most entries kept in each process
+MAX_LOCAL_ENTRIES = 10000
+# Seconds an entry is kept in each process, bounding how long a process
+# can miss another process' invalidation of a single key
+LOCAL_TIMEOUT = 60
+# Seconds an entry is kept in the shared cache
+SHARED_TIMEOUT = 60 * 60
+# Seconds between reads of a namespace's version from the database
+VERSION_CHECK_INTERVAL = 1
+# Seconds another process may take to compute a value before waiting processes compute it too
+LOCK_TIMEOUT = 10
+# Seconds between checks of the shared cache while another process computes the value
+LOCK_POLL_INTERVAL = 0.05
+
+_MISSING = object()
+_cache = None
+
+
+class TieredCache:
+    """
+    Two level cache with a least recently used cache in each process in front
+    of an optional shared Django cache.
+
+    Keys are namespaced per entity and every namespace has a version that is part of
+    its keys, so invalidating a namespace bumps the version instead of deleting every key.
+    The version is a counter in the database, which is incremented atomically whether or
+    not there is a shared cache, so an invalidation in one process is seen by the other
+    processes within VERSION_CHECK_INTERVAL seconds.
+
+    Only one caller computes a missing value at a time. Callers in the same process wait
+    for it on a lock, and processes sharing the cache wait for a lock key in the shared cache.
+    """
+    def __init__(
+        self,
+        shared: BaseCache = None,
+        max_entries: int = MAX_LOCAL_ENTRIES,
+        local_timeout: float = LOCAL_TIMEOUT
+    ):
+        self.shared = shared
+        self.max_entries = max_entries
+        self.local_timeout = local_timeout
+        # Full key to the (expires at, value) tuple
+        self.entries = OrderedDict()
+        # Namespace to the (version, checked at) tuple
+        self.versions = {}
+        # Full key to the lock of the caller computing its value
+        self.computing = {}
+        self.lock = Lock()
+
+    def _version_counter(self, namespace: str) -> str:
+        return f'cache:{namespace}'
+
+    def _get_version(self, namespace: str) -> int:
+        with self.lock:
+            version, checked_at = self.versions.get(namespace, (0, None))
+        if checked_at is not None and monotonic() - checked_at <= VERSION_CHECK_INTERVAL:
+            return version
+
+        version = Counter.objects.get_value(self._version_counter(namespace))
+        with self.lock:
+            self.versions[namespace] = (version, monotonic())
+
+        return version
+
+    def make_key(self, namespace: str, key: str) -> str:
+        """
+        Builds the full key of an entry with the namespace's current version.
+        The key is hashed so any string is a valid key for every cache backend.
+
+        Args:
+            namespace: Namespace of the entity
+            key: Key of the entry in the namespace
+
+        Returns:
+            The full key.
+        """
+        digest = blake2b(str(key).encode('utf8'), digest_size=16).hexdigest()
+        return f'{namespace}:{self._get_version(namespace)}:{digest}'
+
+    def _get_local(self, full_key: str) -> Any:
+        with self.lock:
+            entry = self.entries.get(full_key)
+            if entry is None:
+                return _MISSING
+            if entry[0] < monotonic():
+                del self.entries[full_key]
+                return _MISSING
+            self.entries.move_to_end(full_key)
+            return entry[1]
+
+    def _set_local(self, full_key: str, value: Any):
+        with self.lock:
+            self.entries[full_key] = (monotonic() + self.local_timeout, value)
+            self.entries.move_to_end(full_key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def _get_shared(self, full_key: str) -> Any:
+        if not self.shared:
+            return _MISSING
+
+        value = self.shared.get(full_key, _MISSING)
+        if value is not _MISSING:
+            self._set_local(full_key, value)
+
+        return value
+
+    def get_or_set(
+        self,
+        namespace: str,
+        key: str,
+        compute: Callable[[], Any],
+        timeout: int = SHARED_TIMEOUT
+    ) -> Any:
+        """
+        Gets the value from the process or shared cache, computing and
+        storing it in both if it is not cached.
+
+        Args:
+            namespace: Namespace of the entity
+            key: Key of the entry in the namespace
+            compute: Function computing the value, which must be picklable for a shared cache
+            timeout: Seconds the value is kept in the shared cache
+
+        Returns:
+            The cached or computed value.
+        """
+        full_key = self.make_key(namespace, key)
+        value = self._get_local(full_key)
+        if value is not _MISSING:
+            record_cache_lookup('tiered', 'local', namespace)
+            return value
+
+        with self.lock:
+            key_lock = self.computing.setdefault(full_key, Lock())
+
+        with key_lock:
+            # Another caller in this process may have stored the value while this one waited
+            result = 'local'
+            value = self._get_local(full_key)
+            if value is _MISSING:
+                result = 'shared'
+                value = self._get_shared(full_key)
+            if value is _MISSING:
+                result = 'miss'
+                value = self._compute(full_key, compute, timeout)
+        record_cache_lookup('tiered', result, namespace)
+
+        with self.lock:
+            if self.computing.get(full_key) is key_lock:
+                del self.computing[full_key]
+
+        return value
+
+    def _compute(self, full_key: str, compute: Callable[[], Any], timeout: int) -> Any:
+        lock_key = f'{full_key}:lock'
+        # Identifies this caller's lock, so a lock that expired and was taken
+        # by another process is not released for it
+        token = uuid4().hex
+        if self.shared and not self.shared.add(lock_key, token, LOCK_TIMEOUT):
+            # Another process is computing the value so wait for it to be shared
+            deadline = monotonic() + LOCK_TIMEOUT
+            while monotonic() < deadline:
+                sleep(LOCK_POLL_INTERVAL)
+                value = self._get_shared(full_key)
+                if value is not _MISSING:
+                    return value
+
+        try:
+            value = compute()
+            if self.shared:
+                self.shared.set(full_key, value, timeout)
+            self._set_local(full_key, value)
+        finally:
+            if self.shared and self.shared.get(lock_key) == token:
+                self.shared.delete(lock_key)
+
+        return value
+
+    def delete(self, namespace: str, key: str):
+        """
+        Deletes an entry from the process and shared cache. Other processes
+        keep their copy for at most LOCAL_TIMEOUT seconds.
+
+        Args:
+            namespace: Namespace of the entity
+            key: Key of the entry in the namespace
+        """
+        full_key = self.make_key(namespace, key)
+        with self.lock:
+            self.entries.pop(full_key, None)
+        if self.shared:
+            self.shared.delete(full_key)
+
+    def invalidate(self, namespace: str):
+        """
+        Invalidates every entry of the namespace by bumping its version.
+
+        Args:
+            namespace: Namespace of the entity
+        """
+        version = Counter.objects.increment(self._version_counter(namespace))
+        with self.lock:
+            self.versions[namespace] = (version, monotonic())
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.versions.clear()
+
+
+def get_tiered_cache() -> TieredCache:
+    """
+    Gets the process' tiered cache, using the SHARED_CACHE cache alias
+    as the shared cache if it is set.
+
+    Returns:
+        The TieredCache object.
+    """
+    global _cache
+    if _cache is None:
+        alias = settings.SHARED_CACHE
+        _cache = TieredCache(caches[alias] if alias else None)
+
+    return _cache
+
+
+def cached(
+    namespace: str,
+    key: str,
+    compute: Callable[[], Any],
+    timeout: int = SHARED_TIMEOUT
+) -> Any:
+    """
+    Gets the value from the tiered cache, computing it if it is not cached.
+
+    Args:
+        namespace: Namespace of the entity
+        key: Key of the entry in the namespace
+        compute: Function computing the value
+        timeout: Seconds the value is kept in the shared cache
+
+    Returns:
+        The cached or computed value.
+    """
+    return get_tiered_cache().get_or_set(namespace, key, compute, timeout)
+
+
+def delete_cached(namespace: str, key: str):
+    """
+    Deletes an entry from the tiered cache.
+
+    Args:
+        namespace: Namespace of the entity
+        key: Key of the entry in the namespace
+    """
+    get_tiered_cache().delete(namespace, key)
+
+
+def invalidate_namespace(namespace: str):
+    """
+    Invalidates every entry of the namespace in the tiered cache.
+
+    Args:
+        namespace: Namespace of the entity
+    """
+    get_tiered_cache().invalidate(namespace)
+
+
+def reset_tiered_cache():
+    """
+    Drops the process' tiered cache so it is created again from the settings.
+    """
+    global _cache
+    _cache = None
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def _ingredients_changed(sender, **kwargs):
+    invalidate_namespace(INGREDIENTS_NAMESPACE)
+
+
+@receiver(post_save, sender=Measurement)
+@receiver(post_delete, sender=Measurement)
+def _measurements_changed(sender, **kwargs):
+    invalidate_namespace(MEASUREMENTS_NAMESPACE)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _user_changed(sender, instance: User, **kwargs):
+    delete_cached(USERS_NAMESPACE, instance.username)
@@ -1,9 +1,4 @@
 from django.urls import path
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularRedocView,
-    SpectacularSwaggerView
-)
 
 from cupboard_app.views import (
     IngredientsViewSet,
@@ -14,8 +9,12 @@ from cupboard_app.views import (
     CustomIngredientsViewSet,
     RecipeViewSet,
     RecipeIngredientsViewSet,
-    RecipeStepsViewSet
+    RecipeStepsViewSet,
+    SyncViewSet,
+    BatchViewSet
 )
+from cupboard_app.schema_file import schema_view
+from utils.url_helper import lazy_view
 
 """
 URL order matters! The more granular it is, it should be on top of other urls.
@@ -24,6 +23,11 @@ i.e. user_list_ingredients/add_ingredient should come before user_list_ingredien
 urlpatterns = [
     # urlpaths should have names for ease of testing
     path('user', UserViewSet.as_view({'post': 'create'}), name='user'),
+    path(
+        'ingredients/search',
+        IngredientsViewSet.as_view({'get': 'search'}),
+        name='search_ingredients'
+    ),
     path('ingredients', IngredientsViewSet.as_view({'get': 'list'}), name='ingredients'),
     path('measurements', MeasurementsViewSet.as_view({'get': 'list'}), name='measurements'),
     path(
@@ -78,12 +82,23 @@ urlpatterns = [
         'user/recipe',
         RecipeViewSet.as_view({'get': 'list'}),
         name='recipe'
-    )
+    ),
+    path('user/sync', SyncViewSet.as_view({'get': 'list'}), name='sync'),
+    path('batch', BatchViewSet.as_view({'post': 'create'}), name='batch')
 ]
 
-# API Documentation versions
+# API Documentation versions, only imported when the documentation is first requested.
+# The schema is served from the file generated at build time.
 urlpatterns += [
-    path('schema/', SpectacularAPIView.as_view(), name='schema-v3'),
-    path('doc/', SpectacularSwaggerView.as_view(url_name='schema-v3'), name='swagger-ui-v3'),
-    path('redoc/', SpectacularRedocView.as_view(url_name='schema-v3'), name='redoc-v3'),
+    path('schema/', schema_view, name='schema-v3'),
+    path(
+        'doc/',
+        lazy_view('drf_spectacular.views.SpectacularSwaggerView', url_name='schema-v3'),
+        name='swagger-ui-v3'
+    ),
+    path(
+        'redoc/',
+        lazy_view('drf_spectacular.views.SpectacularRedocView', url_name='schema-v3'),
+        name='redoc-v3'
+    ),
 ]
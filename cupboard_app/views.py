@@ -1,3 +1,5 @@
+import json
+
 from django.core.exceptions import ObjectDoesNotExist
 from drf_spectacular.utils import (
     extend_schema,
@@ -14,9 +16,25 @@ from rest_framework.views import exception_handler
 
 from utils.api_helper import (
     get_auth_username_from_payload,
-    get_auth_email_from_payload
+    get_auth_email_from_payload,
+    get_etag,
+    is_not_modified,
+    get_if_match_revisions
+)
+from cupboard_app.batch import (
+    run_batch,
+    BATCH_METHODS,
+    SKIPPED_STATUS,
+    OPERATION_SKIPPED,
+    TOO_MANY_OPERATIONS
 )
-from cupboard_app.exceptions import MissingInformation
+from cupboard_app.exceptions import MissingInformation, PreconditionFailed, WriteConflict
+from cupboard_app.ingredient_search import (
+    search_ingredients,
+    DEFAULT_SEARCH_RESULTS,
+    MAX_SEARCH_RESULTS
+)
+from cupboard_app.pagination import IngredientCursorPagination
 from cupboard_app.queries import (
     add_default_user_lists,
     create_user,
@@ -26,10 +44,11 @@ from cupboard_app.queries import (
     create_custom_ingredient,
     delete_custom_ingredient,
     get_all_ingredients,
-    get_all_custom_ingredients,
+    get_custom_ingredient_values,
     get_all_measurements,
     get_user_lists_ingredients,
     get_specific_user_lists_ingredients,
+    get_user_list_revision,
     add_list_ingredient,
     delete_list_ingredient,
     set_list_ingredient,
@@ -42,8 +61,11 @@ from cupboard_app.queries import (
     get_all_recipes,
     create_recipe,
     get_recipe,
+    get_recipe_revision,
     delete_recipe,
+    get_user_changes,
     CANNOT_CREATE_INGREDIENT,
+    INVALID_SYNC_TOKEN,
     INVALID_USER_LIST,
     INVALID_RECIPE,
     MAX_LISTS_PER_USER
@@ -51,12 +73,19 @@ from cupboard_app.queries import (
 from cupboard_app.serializers import (
     MessageSerializer,
     IngredientSerializer,
+    IngredientSearchSerializer,
     MeasurementSerializer,
     UserSerializer,
     UserListIngredientsSerializer,
     CustomIngredientSerializer,
     RecipeSerializer
 )
+from cupboard_app.tiered_cache import (
+    INGREDIENTS_NAMESPACE,
+    LISTS_NAMESPACE,
+    MEASUREMENTS_NAMESPACE,
+    cached
+)
 
 INVALID_TOKEN = {'message': 'Given token not valid for any token type'}
 NO_AUTH = {'message': 'Authentication credentials were not provided.'}
@@ -165,6 +194,38 @@ invalid_recipe_response = OpenApiResponse(
         )
     ]
 )
+precondition_failed_response = OpenApiResponse(
+    response=MessageSerializer,
+    examples=[
+        OpenApiExample(
+            name='Precondition failed',
+            value={'message': PreconditionFailed.default_detail},
+            status_codes=[412]
+        )
+    ]
+)
+write_conflict_response = OpenApiResponse(
+    response=MessageSerializer,
+    examples=[
+        OpenApiExample(
+            name='Write conflict',
+            value={'message': WriteConflict.default_detail},
+            status_codes=[409]
+        )
+    ]
+)
+if_none_match_header = OpenApiParameter(
+    name='If-None-Match',
+    description='ETag of the cached copy. Responds 304 with no body if it is still current.',
+    type=str,
+    location=OpenApiParameter.HEADER
+)
+if_match_header = OpenApiParameter(
+    name='If-Match',
+    description='ETag of the copy being changed. Responds 412 if it was changed since.',
+    type=str,
+    location=OpenApiParameter.HEADER
+)
 list_name_param = OpenApiParameter(
     name='list_name',
     description='Name of the list.',
@@ -237,6 +298,7 @@ class UpdateUserListIngredientsViewSet(viewsets.ViewSet):
     )
 
     @extend_schema(
+        parameters=[if_match_header],
         request=inline_serializer(
             name='AddIngredientInListRequest',
             fields={
@@ -251,7 +313,9 @@ class UpdateUserListIngredientsViewSet(viewsets.ViewSet):
             200: UserListIngredientsSerializer,
             400: MessageSerializer,
             401: auth_failed_response,
-            404: invalid_user_list_response
+            404: invalid_user_list_response,
+            409: write_conflict_response,
+            412: precondition_failed_response
         },
         examples=[
             OpenApiExample(
@@ -313,15 +377,17 @@ class UpdateUserListIngredientsViewSet(viewsets.ViewSet):
                 ingredient=body['ingredient'],
                 amount=body['amount'],
                 unit=body['unit'],
-                is_custom_ingredient=body['is_custom_ingredient']
+                is_custom_ingredient=body['is_custom_ingredient'],
+                if_match=get_if_match_revisions(request)
             )
             serializer = UserListIngredientsSerializer(list)
         else:
             raise MissingInformation(self.MISSING_ADD_INGREDIENT_MSG)
 
-        return Response(serializer.data, status=200)
+        return Response(serializer.data, status=200, headers={'ETag': get_etag(list.revision)})
 
     @extend_schema(
+        parameters=[if_match_header],
         request=inline_serializer(
             name='UpdateIngredientInListRequest',
             fields={
@@ -341,7 +407,9 @@ class UpdateUserListIngredientsViewSet(viewsets.ViewSet):
             200: UserListIngredientsSerializer(many=True),
             400: MessageSerializer,
             401: auth_failed_response,
-            404: invalid_user_list_response
+            404: invalid_user_list_response,
+            409: write_conflict_response,
+            412: precondition_failed_response
         },
         examples=[
             OpenApiExample(
@@ -395,7 +463,7 @@ class UpdateUserListIngredientsViewSet(viewsets.ViewSet):
         Sets or moves an ingredient in a specified user's list.
         Subtracts the old ingredient amount from the specified "old" list and
         adds the new ingredient amount to the specified "new" list.
-        Returns all of the user's lists.
+        Returns all of the user's lists. If-Match is checked against the "old" list.
         """
         # Extract username from the access token
         username = get_auth_username_from_payload(request=request)
@@ -426,6 +494,7 @@ class UpdateUserListIngredientsViewSet(viewsets.ViewSet):
                 new_amount=body['new_amount'],
                 new_unit=body['new_unit'],
                 new_is_custom_ingredient=body['new_is_custom_ingredient'],
+                if_match=get_if_match_revisions(request)
             )
 
             serializer = UserListIngredientsSerializer(updated_lists, many=True)
@@ -463,14 +532,16 @@ class UpdateUserListIngredientsViewSet(viewsets.ViewSet):
                 type=bool,
                 location=OpenApiParameter.QUERY,
                 required=True
-            )
+            ),
+            if_match_header
         ],
         request=None,
         responses={
             200: UserListIngredientsSerializer,
             400: MessageSerializer,
             401: auth_failed_response,
-            404: invalid_user_list_response
+            404: invalid_user_list_response,
+            412: precondition_failed_response
         },
         examples=[
             OpenApiExample(
@@ -507,13 +578,14 @@ class UpdateUserListIngredientsViewSet(viewsets.ViewSet):
                 list_name=query_params['list_name'],
                 ingredient=query_params['ingredient'],
                 unit=query_params['unit'],
-                is_custom_ingredient=query_params['is_custom_ingredient']
+                is_custom_ingredient=query_params['is_custom_ingredient'],
+                if_match=get_if_match_revisions(request)
             )
             serializer = UserListIngredientsSerializer(list)
         else:
             raise MissingInformation(self.MISSING_DELETE_INGREDIENT_MSG)
 
-        return Response(serializer.data, status=200)
+        return Response(serializer.data, status=200, headers={'ETag': get_etag(list.revision)})
 
 
 @extend_schema(tags=["User's List"])
@@ -604,10 +676,11 @@ class UserListIngredientsViewSet(viewsets.ViewSet):
         return Response(serializer.data, status=201)
 
     @extend_schema(
-        parameters=[list_name_param],
+        parameters=[list_name_param, if_none_match_header],
         request=None,
         responses={
             200: UserListIngredientsSerializer,
+            304: OpenApiResponse(description='The cached list is still current.'),
             401: auth_failed_response,
             404: invalid_user_list_response
         },
@@ -621,20 +694,29 @@ class UserListIngredientsViewSet(viewsets.ViewSet):
     )
     def retrieve(self, request: Request, list_name: str = None) -> Response:
         """
-        Retrieves the specific list for a user.
+        Retrieves the specific list for a user. Responds 304 if the If-None-Match
+        ETag is still current without loading the list's ingredients.
         """
         username = get_auth_username_from_payload(request=request)
 
-        # Retrieves the specific list for the user
-        my_list = get_specific_user_lists_ingredients(
-            username=username,
-            list_name=list_name
+        revision = get_user_list_revision(username, list_name)
+        etag = get_etag(revision)
+        if is_not_modified(request, etag):
+            return Response(status=304, headers={'ETag': etag})
+
+        # The revision changes on every write so a rendered list is never stale
+        data = cached(
+            LISTS_NAMESPACE,
+            f'{username}:{list_name}:{revision}',
+            lambda: UserListIngredientsSerializer(
+                get_specific_user_lists_ingredients(username=username, list_name=list_name)
+            ).data
         )
-        serializer = UserListIngredientsSerializer(my_list)
 
-        return Response(serializer.data, status=200)
+        return Response(data, status=200, headers={'ETag': etag})
 
     @extend_schema(
+        parameters=[if_match_header],
         request=inline_serializer(
             name='ChangeUserIngredientsListNameRequest',
             fields={
@@ -646,7 +728,8 @@ class UserListIngredientsViewSet(viewsets.ViewSet):
             200: UserListIngredientsSerializer,
             400: MessageSerializer,
             401: auth_failed_response,
-            404: invalid_user_list_response
+            404: invalid_user_list_response,
+            412: precondition_failed_response
         },
         examples=[
             OpenApiExample(
@@ -684,20 +767,22 @@ class UserListIngredientsViewSet(viewsets.ViewSet):
             list = change_user_list_ingredient_name(
                 username=username,
                 old_list_name=body['old_list_name'],
-                new_list_name=body['new_list_name']
+                new_list_name=body['new_list_name'],
+                if_match=get_if_match_revisions(request)
             )
             serializer = UserListIngredientsSerializer(list)
         else:
             raise MissingInformation(self.MISSING_UPDATE_INGREDIENT_MSG)
 
-        return Response(serializer.data, status=200)
+        return Response(serializer.data, status=200, headers={'ETag': get_etag(list.revision)})
 
     @extend_schema(
-        parameters=[list_name_param],
+        parameters=[list_name_param, if_match_header],
         request=None,
         responses={
             200: UserListIngredientsSerializer(many=True),
-            401: auth_failed_response
+            401: auth_failed_response,
+            412: precondition_failed_response
         },
         examples=[
             OpenApiExample(
@@ -717,7 +802,8 @@ class UserListIngredientsViewSet(viewsets.ViewSet):
         # Delete the list for specified user
         lists = delete_user_list_ingredients(
             username=username,
-            list_name=list_name
+            list_name=list_name,
+            if_match=get_if_match_revisions(request)
         )
         serializer = UserListIngredientsSerializer(lists, many=True)
 
@@ -726,47 +812,183 @@ class UserListIngredientsViewSet(viewsets.ViewSet):
 
 @extend_schema(tags=['Ingredients'])
 class IngredientsViewSet(viewsets.ViewSet):
+    MISSING_SEARCH_QUERY_MSG = 'q parameter is missing or empty.'
+    pagination_class = IngredientCursorPagination
+
     @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='type',
+                description='Only return the ingredients of this type.',
+                type=str,
+                location=OpenApiParameter.QUERY
+            ),
+            OpenApiParameter(
+                name='limit',
+                description=(
+                    'Number of common ingredients per page. '
+                    f'Defaults to {IngredientCursorPagination.page_size}, '
+                    f'up to {IngredientCursorPagination.max_page_size}.'
+                ),
+                type=int,
+                location=OpenApiParameter.QUERY
+            ),
+            OpenApiParameter(
+                name='cursor',
+                description='Cursor of the page to return, taken from the next link.',
+                type=str,
+                location=OpenApiParameter.QUERY
+            )
+        ],
         request=None,
         responses={
             200: inline_serializer(
                 name='AllIngredientsSerializer',
                 fields={
+                    'next': serializers.URLField(allow_null=True),
                     'common_ingredients': IngredientSerializer(many=True),
                     'custom_ingredients': CustomIngredientSerializer(many=True)
                 }
             ),
+            400: MessageSerializer,
             401: auth_failed_response
         },
         examples=[
             OpenApiExample(
                 name='All Ingredients Returned',
                 value={
+                    'next': (
+                        'http://localhost:6060/api/v3/ingredients'
+                        '?cursor=WyJNZWF0IiwgIkJlZWYiXQ%3D%3D'
+                    ),
                     'common_ingredients': [{'name': 'Beef', 'type': 'Meat'}],
                     'custom_ingredients': [{'user': 'teacup', 'name': 'Beef', 'type': 'Meat'}]
                 },
                 status_codes=[200]
+            ),
+            OpenApiExample(
+                name='Invalid Cursor',
+                value={'message': IngredientCursorPagination.invalid_cursor_message},
+                status_codes=[400]
             )
         ]
     )
     def list(self, request: Request) -> Response:
         """
-        Returns a dictionary containing the list of common ingredients
-        and the list of user's custom ingredients in the database.
+        Returns a dictionary containing a page of the common ingredients ordered by
+        type and name, and the list of user's custom ingredients in the database.
+        Follow the next link to get the next page of common ingredients.
         """
         username = get_auth_username_from_payload(request=request)
+        type = request.query_params.get('type', None)
 
-        common_ingredients = get_all_ingredients()
-        custom_ingredients = get_all_custom_ingredients(username=username)
-        common_ing_serializer = IngredientSerializer(common_ingredients, many=True)
-        custom_ing_serializer = CustomIngredientSerializer(custom_ingredients, many=True)
-        return Response(
+        paginator = self.pagination_class()
+
+        def get_page() -> dict:
+            common_ingredients = paginator.paginate_queryset(
+                get_all_ingredients(type=type),
+                request,
+                view=self
+            )
+            return {
+                'next_cursor': paginator.get_next_cursor(),
+                'common_ingredients': IngredientSerializer(common_ingredients, many=True).data
+            }
+
+        # Pages of common ingredients are the same for every user until the catalogue changes.
+        # They are cached by the decoded page parameters, and the next link is built for
+        # each request so it has the host and the other query parameters of the request.
+        page = cached(
+            INGREDIENTS_NAMESPACE,
+            json.dumps([
+                'page',
+                type,
+                paginator.decode_cursor(request),
+                paginator.get_page_size(request)
+            ]),
+            get_page
+        )
+        custom_ingredients = get_custom_ingredient_values(username=username, type=type)
+        response = Response(
             {
-                'common_ingredients': common_ing_serializer.data,
-                'custom_ingredients': custom_ing_serializer.data
+                'next': paginator.get_link(request, page['next_cursor']),
+                'common_ingredients': page['common_ingredients'],
+                'custom_ingredients': [
+                    {'user': username, 'name': name, 'type': ingredient_type}
+                    for name, ingredient_type in custom_ingredients
+                ]
             },
             status=200
         )
+        # Catalogue pages repeat across requests so the compressed body is reused, but
+        # a body with custom ingredients is the user's own and compressed for each response
+        response.cache_compressed = not custom_ingredients
+
+        return response
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='q',
+                description='Search query for the ingredient name. Tolerates typos.',
+                type=str,
+                location=OpenApiParameter.QUERY,
+                required=True
+            ),
+            OpenApiParameter(
+                name='limit',
+                description=(
+                    'Maximum number of results. '
+                    f'Defaults to {DEFAULT_SEARCH_RESULTS}, up to {MAX_SEARCH_RESULTS}.'
+                ),
+                type=int,
+                location=OpenApiParameter.QUERY
+            )
+        ],
+        request=None,
+        responses={
+            200: IngredientSearchSerializer(many=True),
+            400: MessageSerializer,
+            401: auth_failed_response
+        },
+        examples=[
+            OpenApiExample(
+                name='Ingredients Found',
+                value=[
+                    {'name': 'Beef', 'type': 'Meat', 'is_custom_ingredient': False},
+                    {'name': 'Beef Jerky', 'type': 'Meat', 'is_custom_ingredient': True}
+                ],
+                status_codes=[200]
+            ),
+            OpenApiExample(
+                name='Required Value Missing',
+                value={'message': MISSING_SEARCH_QUERY_MSG},
+                status_codes=[400]
+            )
+        ]
+    )
+    def search(self, request: Request) -> Response:
+        """
+        Returns the common and user's custom ingredients that best match the search query,
+        ranked by exact, prefix, word prefix and then typo tolerant matches.
+        """
+        username = get_auth_username_from_payload(request=request)
+        query = request.query_params.get('q', '').strip()
+
+        if not query:
+            raise MissingInformation(self.MISSING_SEARCH_QUERY_MSG)
+
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_SEARCH_RESULTS))
+        except ValueError:
+            raise ValueError('limit must be an integer.')
+        limit = max(1, min(limit, MAX_SEARCH_RESULTS))
+
+        custom_ingredients = get_custom_ingredient_values(username=username)
+        results = search_ingredients(query, custom_ingredients=custom_ingredients, limit=limit)
+        serializer = IngredientSearchSerializer(results, many=True)
+
+        return Response(serializer.data, status=200)
 
 
 @extend_schema(tags=['Users'])
@@ -835,9 +1057,16 @@ class MeasurementsViewSet(viewsets.ViewSet):
         """
         Returns a list of all measurements in the database.
         """
-        all_measurements = get_all_measurements()
-        serializer = MeasurementSerializer(all_measurements, many=True)
-        return Response(serializer.data, status=200)
+        data = cached(
+            MEASUREMENTS_NAMESPACE,
+            'all',
+            lambda: MeasurementSerializer(get_all_measurements(), many=True).data
+        )
+        response = Response(data, status=200)
+        # The measurements are the same for every request so the compressed body is reused
+        response.cache_compressed = True
+
+        return response
 
 
 @extend_schema(tags=['CustomIngredients'])
@@ -951,7 +1180,7 @@ class RecipeIngredientsViewSet(viewsets.ViewSet):
     )
 
     @extend_schema(
-        parameters=[recipe_name_param],
+        parameters=[recipe_name_param, if_match_header],
         request=inline_serializer(
             name='AddIngredientInRecipeRequest',
             fields={
@@ -965,7 +1194,8 @@ class RecipeIngredientsViewSet(viewsets.ViewSet):
             200: RecipeSerializer,
             400: MessageSerializer,
             401: auth_failed_response,
-            404: invalid_recipe_response
+            404: invalid_recipe_response,
+            412: precondition_failed_response
         },
         examples=[
             OpenApiExample(
@@ -1031,7 +1261,8 @@ class RecipeIngredientsViewSet(viewsets.ViewSet):
                 ingredient=body['ingredient'],
                 amount=body['amount'],
                 unit=body['unit'],
-                is_custom_ingredient=body['is_custom_ingredient']
+                is_custom_ingredient=body['is_custom_ingredient'],
+                if_match=get_if_match_revisions(request)
             )
             serializer = RecipeSerializer(my_recipe)
         elif not recipe_name:
@@ -1039,11 +1270,12 @@ class RecipeIngredientsViewSet(viewsets.ViewSet):
         else:
             raise MissingInformation(self.MISSING_ADD_INGREDIENT_MSG)
 
-        return Response(serializer.data, status=200)
+        return Response(serializer.data, status=200, headers={'ETag': get_etag(my_recipe.revision)})
 
     @extend_schema(
         parameters=[
             recipe_name_param,
+            if_match_header,
             OpenApiParameter(
                 name='ingredient',
                 description='Name of the ingredient.',
@@ -1071,7 +1303,8 @@ class RecipeIngredientsViewSet(viewsets.ViewSet):
             200: RecipeSerializer,
             400: MessageSerializer,
             401: auth_failed_response,
-            404: invalid_recipe_response
+            404: invalid_recipe_response,
+            412: precondition_failed_response
         },
         examples=[
             OpenApiExample(
@@ -1114,7 +1347,8 @@ class RecipeIngredientsViewSet(viewsets.ViewSet):
                 recipe_name=recipe_name,
                 ingredient=query_params['ingredient'],
                 unit=query_params['unit'],
-                is_custom_ingredient=query_params['is_custom_ingredient']
+                is_custom_ingredient=query_params['is_custom_ingredient'],
+                if_match=get_if_match_revisions(request)
             )
             serializer = RecipeSerializer(my_recipe)
         elif not recipe_name:
@@ -1122,7 +1356,7 @@ class RecipeIngredientsViewSet(viewsets.ViewSet):
         else:
             raise MissingInformation(self.MISSING_DELETE_INGREDIENT_MSG)
 
-        return Response(serializer.data, status=200)
+        return Response(serializer.data, status=200, headers={'ETag': get_etag(my_recipe.revision)})
 
 
 @extend_schema(tags=['Recipes'])
@@ -1142,7 +1376,7 @@ class RecipeStepsViewSet(viewsets.ViewSet):
     )
 
     @extend_schema(
-        parameters=[recipe_name_param],
+        parameters=[recipe_name_param, if_match_header],
         request=inline_serializer(
             name='AddStepInRecipeRequest',
             fields={'step': serializers.CharField()}
@@ -1151,7 +1385,9 @@ class RecipeStepsViewSet(viewsets.ViewSet):
             200: RecipeSerializer,
             400: MessageSerializer,
             401: auth_failed_response,
-            404: invalid_recipe_response
+            404: invalid_recipe_response,
+            409: write_conflict_response,
+            412: precondition_failed_response
         },
         examples=[
             OpenApiExample(
@@ -1196,7 +1432,8 @@ class RecipeStepsViewSet(viewsets.ViewSet):
             my_recipe = add_step_to_recipe(
                 username=username,
                 recipe_name=recipe_name,
-                step=body['step']
+                step=body['step'],
+                if_match=get_if_match_revisions(request)
             )
             serializer = RecipeSerializer(my_recipe)
         elif not recipe_name:
@@ -1204,10 +1441,10 @@ class RecipeStepsViewSet(viewsets.ViewSet):
         else:
             raise MissingInformation(self.MISSING_CREATE_STEP_MSG)
 
-        return Response(serializer.data, status=200)
+        return Response(serializer.data, status=200, headers={'ETag': get_etag(my_recipe.revision)})
 
     @extend_schema(
-        parameters=[recipe_name_param],
+        parameters=[recipe_name_param, if_match_header],
         request=inline_serializer(
             name='UpdateStepInRecipeRequest',
             fields={
@@ -1219,7 +1456,8 @@ class RecipeStepsViewSet(viewsets.ViewSet):
             200: RecipeSerializer,
             400: MessageSerializer,
             401: auth_failed_response,
-            404: invalid_recipe_response
+            404: invalid_recipe_response,
+            412: precondition_failed_response
         },
         examples=[
             OpenApiExample(
@@ -1266,7 +1504,8 @@ class RecipeStepsViewSet(viewsets.ViewSet):
                 username=username,
                 recipe_name=recipe_name,
                 new_step=body['step'],
-                step_number=body['step_number']
+                step_number=body['step_number'],
+                if_match=get_if_match_revisions(request)
             )
             serializer = RecipeSerializer(my_recipe)
         elif not recipe_name:
@@ -1274,11 +1513,12 @@ class RecipeStepsViewSet(viewsets.ViewSet):
         else:
             raise MissingInformation(self.MISSING_EDIT_STEP_MSG)
 
-        return Response(serializer.data, status=200)
+        return Response(serializer.data, status=200, headers={'ETag': get_etag(my_recipe.revision)})
 
     @extend_schema(
         parameters=[
             recipe_name_param,
+            if_match_header,
             OpenApiParameter(
                 name='step_number',
                 description='The number step to remove from a recipe.',
@@ -1292,7 +1532,8 @@ class RecipeStepsViewSet(viewsets.ViewSet):
             200: RecipeSerializer,
             400: MessageSerializer,
             401: auth_failed_response,
-            404: invalid_recipe_response
+            404: invalid_recipe_response,
+            412: precondition_failed_response
         },
         examples=[
             OpenApiExample(
@@ -1325,13 +1566,14 @@ class RecipeStepsViewSet(viewsets.ViewSet):
             recipe = remove_step_from_recipe(
                 username=username,
                 recipe_name=recipe_name,
-                step_number=query_params['step_number']
+                step_number=query_params['step_number'],
+                if_match=get_if_match_revisions(request)
             )
             serializer = RecipeSerializer(recipe)
         else:
             raise MissingInformation(self.MISSING_DELETE_STEP_MSG)
 
-        return Response(serializer.data, status=200)
+        return Response(serializer.data, status=200, headers={'ETag': get_etag(recipe.revision)})
 
 
 @extend_schema(tags=['Recipes'])
@@ -1410,10 +1652,11 @@ class RecipeViewSet(viewsets.ViewSet):
         return Response(serializer.data, status=201)
 
     @extend_schema(
-        parameters=[recipe_name_param],
+        parameters=[recipe_name_param, if_none_match_header],
         request=None,
         responses={
             200: RecipeSerializer,
+            304: OpenApiResponse(description='The cached recipe is still current.'),
             401: auth_failed_response,
             404: invalid_recipe_response
         },
@@ -1427,10 +1670,15 @@ class RecipeViewSet(viewsets.ViewSet):
     )
     def retrieve(self, request: Response, recipe_name: str = None) -> Response:
         """
-        Retrieves the specific recipe for a user.
+        Retrieves the specific recipe for a user. Responds 304 if the If-None-Match
+        ETag is still current without loading the recipe's ingredients and steps.
         """
         username = get_auth_username_from_payload(request=request)
 
+        etag = get_etag(get_recipe_revision(username, recipe_name))
+        if is_not_modified(request, etag):
+            return Response(status=304, headers={'ETag': etag})
+
         # Retrieves the specific list for the user
         my_recipe = get_recipe(
             username=username,
@@ -1438,14 +1686,15 @@ class RecipeViewSet(viewsets.ViewSet):
         )
         serializer = RecipeSerializer(my_recipe)
 
-        return Response(serializer.data, status=200)
+        return Response(serializer.data, status=200, headers={'ETag': get_etag(my_recipe.revision)})
 
     @extend_schema(
-        parameters=[recipe_name_param],
+        parameters=[recipe_name_param, if_match_header],
         request=None,
         responses={
             200: RecipeSerializer(many=True),
-            401: auth_failed_response
+            401: auth_failed_response,
+            412: precondition_failed_response
         },
         examples=[
             OpenApiExample(
@@ -1465,8 +1714,236 @@ class RecipeViewSet(viewsets.ViewSet):
         # Delete the list for specified user
         recipes = delete_recipe(
             username=username,
-            recipe_name=recipe_name
+            recipe_name=recipe_name,
+            if_match=get_if_match_revisions(request)
         )
         serializer = RecipeSerializer(recipes, many=True)
 
         return Response(serializer.data, status=200)
+
+
+@extend_schema(tags=['Sync'])
+class SyncViewSet(viewsets.ViewSet):
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='since',
+                description=(
+                    'Token from the previous sync. '
+                    "Returns all of the user's lists, recipes and custom ingredients if not given."
+                ),
+                type=str,
+                location=OpenApiParameter.QUERY
+            )
+        ],
+        request=None,
+        responses={
+            200: inline_serializer(
+                name='SyncSerializer',
+                fields={
+                    'token': serializers.CharField(),
+                    'lists': UserListIngredientsSerializer(many=True),
+                    'recipes': RecipeSerializer(many=True),
+                    'custom_ingredients': CustomIngredientSerializer(many=True),
+                    'deleted': inline_serializer(
+                        name='SyncDeletedSerializer',
+                        fields={
+                            'lists': serializers.ListField(child=serializers.CharField()),
+                            'recipes': serializers.ListField(child=serializers.CharField()),
+                            'custom_ingredients': serializers.ListField(
+                                child=serializers.CharField()
+                            )
+                        }
+                    )
+                }
+            ),
+            400: MessageSerializer,
+            401: auth_failed_response
+        },
+        examples=[
+            OpenApiExample(
+                name='Changes Since Last Sync',
+                value={
+                    'token': '42.1729339200',
+                    'lists': [GROCERY_LIST],
+                    'recipes': [],
+                    'custom_ingredients': [],
+                    'deleted': {
+                        'lists': ['Fridge'],
+                        'recipes': [],
+                        'custom_ingredients': []
+                    }
+                },
+                status_codes=[200]
+            ),
+            OpenApiExample(
+                name='Invalid Sync Token',
+                value={'message': INVALID_SYNC_TOKEN},
+                status_codes=[400]
+            )
+        ]
+    )
+    def list(self, request: Request) -> Response:
+        """
+        Returns the user's lists, recipes and custom ingredients that changed since the
+        given token, and the names of the ones that were deleted. Clients should apply
+        the deletions before the changes and send the returned token on the next sync.
+        """
+        username = get_auth_username_from_payload(request=request)
+
+        changes = get_user_changes(
+            username=username,
+            since=request.query_params.get('since', None)
+        )
+
+        return Response(
+            {
+                'token': changes['token'],
+                'lists': UserListIngredientsSerializer(changes['lists'], many=True).data,
+                'recipes': RecipeSerializer(changes['recipes'], many=True).data,
+                'custom_ingredients': CustomIngredientSerializer(
+                    changes['custom_ingredients'],
+                    many=True
+                ).data,
+                'deleted': changes['deleted']
+            },
+            status=200
+        )
+
+
+@extend_schema(tags=['Batch'])
+class BatchViewSet(viewsets.ViewSet):
+    MISSING_OPERATIONS_MSG = (
+        f'{REQUIRED_VALUE_MISSING}'
+        '{operations: [{method: [METHOD], path: [PATH], body: [JSON], headers: [HEADERS]}], '
+        'stop_on_error: [BOOLEAN]}'
+    )
+
+    @extend_schema(
+        request=inline_serializer(
+            name='BatchRequest',
+            fields={
+                'operations': inline_serializer(
+                    name='BatchOperationRequest',
+                    many=True,
+                    fields={
+                        'method': serializers.ChoiceField(choices=BATCH_METHODS),
+                        'path': serializers.CharField(),
+                        'body': serializers.JSONField(required=False),
+                        'headers': serializers.DictField(
+                            child=serializers.CharField(),
+                            required=False
+                        )
+                    }
+                ),
+                'stop_on_error': serializers.BooleanField(required=False)
+            }
+        ),
+        responses={
+            200: inline_serializer(
+                name='BatchSerializer',
+                fields={
+                    'results': inline_serializer(
+                        name='BatchResultSerializer',
+                        many=True,
+                        fields={
+                            'status': serializers.IntegerField(),
+                            'headers': serializers.DictField(child=serializers.CharField()),
+                            'body': serializers.JSONField()
+                        }
+                    )
+                }
+            ),
+            400: MessageSerializer,
+            401: auth_failed_response
+        },
+        examples=[
+            OpenApiExample(
+                name='Create List and Add Ingredient',
+                value={
+                    'operations': [
+                        {'method': 'POST', 'path': '/api/v3/user/lists/Grocery'},
+                        {
+                            'method': 'POST',
+                            'path': '/api/v3/user/lists/ingredients',
+                            'body': {
+                                'list_name': 'Grocery',
+                                'ingredient': 'Beef',
+                                'amount': 500,
+                                'unit': 'g',
+                                'is_custom_ingredient': False
+                            }
+                        },
+                        {'method': 'GET', 'path': '/api/v3/user/recipe'}
+                    ],
+                    'stop_on_error': True
+                },
+                request_only=True
+            ),
+            OpenApiExample(
+                name='Batch Results',
+                value={
+                    'results': [
+                        {
+                            'status': 400,
+                            'headers': {},
+                            'body': {'message': MAX_LISTS_PER_USER}
+                        },
+                        {
+                            'status': SKIPPED_STATUS,
+                            'headers': {},
+                            'body': {'message': OPERATION_SKIPPED}
+                        },
+                        {
+                            'status': SKIPPED_STATUS,
+                            'headers': {},
+                            'body': {'message': OPERATION_SKIPPED}
+                        }
+                    ]
+                },
+                status_codes=[200],
+                response_only=True
+            ),
+            OpenApiExample(
+                name='Required Value Missing',
+                value={'message': MISSING_OPERATIONS_MSG},
+                status_codes=[400],
+                response_only=True
+            ),
+            OpenApiExample(
+                name='Too Many Operations',
+                value={'message': TOO_MANY_OPERATIONS},
+                status_codes=[400],
+                response_only=True
+            )
+        ]
+    )
+    def create(self, request: Request) -> Response:
+        """
+        Runs several API operations in order with one request and returns the result
+        of each operation. The access token and user are only resolved once for the
+        whole batch. Every operation is checked before any are run, and with
+        stop_on_error the operations after the first failed operation are skipped.
+
+        A batch is not atomic: the operations cannot run in one database transaction,
+        so operations that already succeeded are not rolled back when a later one fails.
+        Send an If-Match header with each operation to run a batch again safely.
+        """
+        username = get_auth_username_from_payload(request=request)
+        body = request.data if isinstance(request.data, dict) else {}
+
+        if (
+            username
+            and body.get('operations', None)
+            and isinstance(body['operations'], list)
+        ):
+            results = run_batch(
+                request=request,
+                username=username,
+                operations=body['operations'],
+                stop_on_error=bool(body.get('stop_on_error', False))
+            )
+        else:
+            raise MissingInformation(self.MISSING_OPERATIONS_MSG)
+
+        return Response({'results': results}, status=200)
@@ -12,12 +12,6 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 import os
 from pathlib import Path
 
-import dns.resolver
-
-# Avoids reading /etc/resolv.conf and uses Google's public DNS server
-dns.resolver.default_resolver = dns.resolver.Resolver(configure=False)
-dns.resolver.default_resolver.nameservers = ['8.8.8.8']
-
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -27,6 +21,12 @@ AUTH0_API_IDENTIFIER = os.getenv('AUTH0_API_IDENTIFIER')
 DB_NAME = os.getenv('DB_NAME')
 DB_TEST_NAME = os.getenv('DB_TEST_NAME')
 MONGO_URL = os.getenv('MONGO_URL')
+if MONGO_URL and MONGO_URL.startswith('mongodb+srv://'):
+    import dns.resolver
+
+    # Avoids reading /etc/resolv.conf and uses Google's public DNS server for the SRV lookup
+    dns.resolver.default_resolver = dns.resolver.Resolver(configure=False)
+    dns.resolver.default_resolver.nameservers = ['8.8.8.8']
 SECRET_KEY = os.getenv('DJANGO_SECRET_KEY')
 if os.getenv('DEBUG_ENABLE') == 'true':
     DEBUG = True
@@ -62,7 +62,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'cupboard_app.middleware.MetricsMiddleware',
+    'cupboard_app.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'cupboard_app.middleware.CompressionMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -75,6 +78,54 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'cupboard_backend.urls'
 
+# Bearer token required to read /metrics, which is disabled if unset
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Database queries a request may make before it is logged as over budget,
+# by default and for the views in QUERY_BUDGETS by URL name. Only the ORM queries
+# djongo sends to MongoDB count: the revision counters, conditional saves and other
+# mongo_* calls go to pymongo directly, and djongo runs no savepoints.
+QUERY_BUDGET = int(os.getenv('QUERY_BUDGET', '10'))
+# Each budget is the count that test_api.py measures for the view's worst request with
+# cold caches, plus a margin of 2; the assertion there catches any new query first
+QUERY_BUDGETS = {
+    # POST of a new user, which creates the user and its 2 default lists (17)
+    'v3:user': 19,
+    # PUT renaming a list, which creates the new list and deletes the old one (12)
+    'v3:user_list_ingredients': 14,
+    # DELETE of a custom ingredient, which removes it from the lists that use it (12)
+    'v3:specific_custom_ingredient': 14,
+}
+# Times a request may run the same query before it is logged as N+1 queries
+REPEATED_QUERY_LIMIT = int(os.getenv('REPEATED_QUERY_LIMIT', '5'))
+# Requests over their query budget raise instead of logging a warning, for the tests
+QUERY_BUDGET_ENFORCED = False
+
+# Adds the time of each phase of the requests to their Server-Timing header and logs them
+SERVER_TIMING = os.getenv('SERVER_TIMING') == 'true'
+if SERVER_TIMING:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('cupboard_app.middleware.QueryBudgetMiddleware') + 1,
+        'cupboard_app.middleware.ServerTimingMiddleware'
+    )
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # JSON line of the phases of each request when SERVER_TIMING is set
+        'cupboard_app.timing': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# API responses smaller than this many bytes are sent uncompressed
+COMPRESSION_MIN_SIZE = 1024
+# Total bytes of compressed payloads each worker keeps for reuse
+COMPRESSION_CACHE_MAX_SIZE = 16 * 1024 * 1024
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -111,6 +162,34 @@ DATABASES = {
     }
 }
 
+# Storage mode for the ingredients in the user lists.
+# 'embedded' keeps the ingredients as an array in the list document.
+# 'normalized' stores each ingredient in the list as its own document.
+LIST_INGREDIENTS_STORAGE = os.getenv('LIST_INGREDIENTS_STORAGE') or 'embedded'
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+# Cache shared by all the workers, i.e. a memcached server or a directory for the file cache
+SHARED_CACHE_LOCATION = os.getenv('SHARED_CACHE_LOCATION')
+if SHARED_CACHE_LOCATION:
+    CACHES['shared'] = {
+        'BACKEND': (
+            os.getenv('SHARED_CACHE_BACKEND')
+            or 'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': SHARED_CACHE_LOCATION,
+    }
+
+# Cache alias shared by the workers' tiered caches and custom ingredient caches
+SHARED_CACHE = 'shared' if SHARED_CACHE_LOCATION else None
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -188,7 +267,8 @@ SIMPLE_JWT = {
     'ALGORITHM': 'RS256',
     'AUDIENCE': AUTH0_API_IDENTIFIER,
     'ISSUER': f'https://{AUTH0_DOMAIN}/',
-    'JWK_URL': f'https://{AUTH0_DOMAIN}/.well-known/jwks.json',
+    # Load tests point it at the JWKS stub that verifies their locally minted tokens
+    'JWK_URL': os.getenv('AUTH0_JWK_URL') or f'https://{AUTH0_DOMAIN}/.well-known/jwks.json',
     'USER_ID_CLAIM': 'sub',
     'JTI_CLAIM': None,
     'TOKEN_TYPE_CLAIM': None,
@@ -197,6 +277,9 @@ SIMPLE_JWT = {
 }
 
 
+# OpenAPI schema generated at build time with: python manage.py spectacular --file schema.yml
+OPENAPI_SCHEMA_FILE = BASE_DIR / 'schema.yml'
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Cupboard API',
     'DESCRIPTION': (
@@ -214,9 +297,25 @@ SPECTACULAR_SETTINGS = {
 }
 
 
+# RUN_PROFILER=true profiles every request with pyinstrument, for development.
+# RUN_PROFILER=sample samples the stacks of some requests, light enough for production.
 if os.getenv('RUN_PROFILER') == 'true':
     MIDDLEWARE += ['pyinstrument.middleware.ProfilerMiddleware',]
     PYINSTRUMENT_PROFILE_DIR = 'profiles'
+elif os.getenv('RUN_PROFILER') == 'sample':
+    MIDDLEWARE.insert(1, 'cupboard_app.middleware.SamplingProfilerMiddleware')
+
+PROFILER_DIR = BASE_DIR / 'profiles' / 'sampled'
+# Profiles 1 in this many requests
+PROFILER_SAMPLE_RATE = int(os.getenv('PROFILER_SAMPLE_RATE') or 100)
+# Also profiles every request slower than this many seconds, or only the sampled requests if 0
+PROFILER_SLOW_THRESHOLD = float(os.getenv('PROFILER_SLOW_THRESHOLD') or 1.0)
+# Seconds between the stack samples
+PROFILER_INTERVAL = 0.005
+# Profiles kept for each view per minute and in total, and seconds they are kept
+PROFILER_MAX_PER_MINUTE = int(os.getenv('PROFILER_MAX_PER_MINUTE') or 6)
+PROFILER_MAX_FILES = 200
+PROFILER_RETENTION = 7 * 24 * 60 * 60
 
 
 STORAGES = {
@@ -18,18 +18,33 @@ from django.contrib import admin
 from django.urls import include, path
 from rest_framework.versioning import NamespaceVersioning
 
-from cupboard_app import auth0_authentication, v3_urls
+from cupboard_app import v3_urls
+from cupboard_app.metrics import metrics_view
+from utils.url_helper import lazy_view
 
 versioning_class = NamespaceVersioning
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/v3/', include((v3_urls, 'v3'), namespace='v3'))
+    path('api/v3/', include((v3_urls, 'v3'), namespace='v3')),
+    path('metrics', metrics_view, name='metrics')
 ]
 
-# Auth0 Authentication
+# Auth0 Authentication, only imported when a client first logs in
 urlpatterns += [
-    path('login', auth0_authentication.CLILoginAPIView.as_view(), name='cli_login'),
-    path('logout', auth0_authentication.CLILogoutAPIView.as_view(), name='cli_logout'),
-    path('refresh-token', auth0_authentication.RefreshTokenAPIView.as_view(), name='refresh_token')
+    path(
+        'login',
+        lazy_view('cupboard_app.auth0_authentication.CLILoginAPIView'),
+        name='cli_login'
+    ),
+    path(
+        'logout',
+        lazy_view('cupboard_app.auth0_authentication.CLILogoutAPIView'),
+        name='cli_logout'
+    ),
+    path(
+        'refresh-token',
+        lazy_view('cupboard_app.auth0_authentication.RefreshTokenAPIView'),
+        name='refresh_token'
+    )
 ]
@@ -1,12 +1,16 @@
 #!/bin/sh
 
-# collect all static files to the root directory
-python3 manage.py collectstatic --no-input || exit 1
+# run a one-off management command instead of the server,
+# i.e. the migration job: docker-entrypoint.sh check_migrations --apply
+if [ $# -gt 0 ]; then
+    exec python3 manage.py "$@"
+fi
 
-# run any outstanding migrations
-python3 manage.py migrate --no-input || exit 1
+# static files are collected when the image is built and the migrations
+# are applied by the migration job, so the server starts right away.
+# CHECK_MIGRATIONS_ON_BOOT=true refuses to start while a migration is pending
+if [ "$CHECK_MIGRATIONS_ON_BOOT" = "true" ]; then
+    python3 manage.py check_migrations || exit 1
+fi
 
-# start the server using gunicorn
-gunicorn
-
-wait
\ No newline at end of file
+exec gunicorn
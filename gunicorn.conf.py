@@ -1,23 +1,98 @@
+import gc
 import os
 import multiprocessing
+import tempfile
 
 from utils.env_helper import load_env_variables
+from utils.memory_helper import format_memory_usage, get_memory_usage
 
 MAX_TIMEOUT = 120
 
 if os.getenv('LAYER') == 'DEV':
     max_workers = 1
+    preload = False
 else:
     # Optimal recommendation from gunicorn
     max_workers = (2 * multiprocessing.cpu_count()) + 1
+    preload = (os.getenv('PRELOAD_APP') or 'true').lower() == 'true'
 
 
 load_env_variables()
 
+# Each worker writes its metrics to this directory so /metrics adds up every worker.
+# Set before the app imports prometheus_client, and new for each run so it starts empty.
+if not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='cupboard_metrics_')
+
 wsgi_app = 'cupboard_backend.wsgi'
 workers = max_workers
 timeout = MAX_TIMEOUT
+# Imports the app in the master so the workers share its memory copy-on-write
+preload_app = preload
 bind = '{address}:{port}'.format(
     address=os.getenv('DJANGO_ADDRESS'),
     port=os.getenv('DJANGO_PORT')
 )
+
+
+def load_reference_data(log):
+    """
+    Builds the read-only structures used on every request, i.e. the ingredient
+    catalogue and the measurement units. Failures are logged and the structures
+    are built on the first lookup instead.
+    """
+    from cupboard_app.ingredient_search import get_ingredient_index
+    from cupboard_app.reference_data import get_reference_data
+
+    try:
+        get_reference_data()
+        get_ingredient_index()
+    except Exception as e:
+        log.warning(f'Failed to load the reference data: {e}')
+
+
+def child_exit(server, worker):
+    """
+    Drops the live gauges of the exited worker from the metrics.
+    """
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def when_ready(server):
+    """
+    With preload_app, imports the views and builds the reference data and the compressed
+    API schema in the master before the workers are forked, then freezes the objects so
+    the workers' garbage collection does not write to the shared pages.
+    """
+    if not server.cfg.preload_app:
+        return
+
+    from django.db import connections
+    from django.urls import get_resolver
+
+    from cupboard_app.schema_file import get_precomputed_schema
+
+    # Imports the views and rest framework with the URLs
+    get_resolver().url_patterns
+    load_reference_data(server.log)
+    get_precomputed_schema()
+
+    # The MongoClient must not be shared with the forked workers
+    connections.close_all()
+
+    gc.collect()
+    gc.freeze()
+    server.log.info(f'Master memory after preload: {format_memory_usage(get_memory_usage())}')
+
+
+def post_worker_init(worker):
+    """
+    Loads the reference data before the worker takes requests if it was not
+    preloaded, and reports the worker's memory.
+    """
+    if not worker.cfg.preload_app:
+        load_reference_data(worker.log)
+
+    worker.log.info(f'Worker memory: {format_memory_usage(get_memory_usage())}')
@@ -1,200 +1,294 @@
-import os
+import json
 import logging
-from locust import HttpUser, task, between
+import os
+import random
+import tempfile
+from itertools import count
+
+from locust import HttpUser, TaskSet, events, task
+from locust.runners import WorkerRunner
+
 from utils.env_helper import load_env_variables
+from utils.load_test_helper import (
+    JWKS_PATH,
+    SLO,
+    TokenSigner,
+    check_slos,
+    start_jwks_server,
+    think_time
+)
 
-user_count = 0
+load_env_variables()  # Adds the .env values to environment to allow use
 
+# Usernames and names of the lists and recipes start with the tag so
+# delete_synthetic_data --tag [LOAD_TEST_TAG] removes them after the test
+TAG = os.getenv('LOAD_TEST_TAG') or 'loadtest'
+KEY_PATH = os.getenv('LOAD_TEST_KEY_PATH') or os.path.join(
+    tempfile.gettempdir(),
+    'cupboard_load_test_key.pem'
+)
+JWKS_ADDRESS = os.getenv('LOAD_TEST_JWKS_ADDRESS') or '127.0.0.1'
+JWKS_PORT = int(os.getenv('LOAD_TEST_JWKS_PORT') or '8765')
+REPORT_PATH = os.getenv('LOAD_TEST_REPORT') or os.path.join('benchmarks', 'load_test_report.json')
+ISSUER = f'https://{os.getenv("AUTH0_DOMAIN")}/'
+AUDIENCE = os.getenv('AUTH0_API_IDENTIFIER')
+# Users of each worker are numbered from a different offset so their usernames never collide
+WORKER_USER_OFFSET = 1000000
 
-class QuickstartUser(HttpUser):
-    global user_count
-    wait_time = between(1, 5)
+API = '/api/v3'
+LIST_ITEM = f'{API}/user/lists/ingredients'
+RECIPE = f'{API}/user/recipe/[recipe_name]'
 
-    @task
-    def all_api(self):
-        """
-        Sends queries to all cupboard apis.
-        """
-        # Basic info retrieval
-        self.client.get(
-            '/api/v3/ingredients',
-            headers={'Authorization': 'Bearer ' + self.access_token}
-        )
+# Response time SLOs in milliseconds by '[method] [name]' of the endpoint. Endpoints that
+# are not listed use DEFAULT_SLO. Names with [parameters] group the URLs of an endpoint.
+DEFAULT_SLO = SLO(p95=500, p99=1000)
+SLOS = {
+    f'POST {API}/user': SLO(p95=500, p99=1000),
+    f'GET {API}/ingredients': SLO(p95=200, p99=500),
+    f'GET {API}/ingredients/search': SLO(p95=150, p99=400),
+    f'GET {API}/measurements': SLO(p95=100, p99=300),
+    f'GET {API}/user/lists': SLO(p95=300, p99=800),
+    f'GET {API}/user/lists/[list_name]': SLO(p95=250, p99=600),
+    f'POST {LIST_ITEM}': SLO(p95=400, p99=900),
+    f'PATCH {LIST_ITEM}': SLO(p95=400, p99=900),
+    f'DELETE {LIST_ITEM}': SLO(p95=400, p99=900),
+    f'GET {API}/user/recipe': SLO(p95=300, p99=800),
+    f'GET {RECIPE}': SLO(p95=250, p99=600),
+    f'GET {API}/user/sync': SLO(p95=300, p99=800),
+    f'POST {API}/batch': SLO(p95=600, p99=1500)
+}
 
-        self.client.get(
-            '/api/v3/measurements',
-            headers={'Authorization': 'Bearer ' + self.access_token}
-        )
+signer = TokenSigner(KEY_PATH)
+user_numbers = count()
 
-        # Custom Ingredients
-        self.client.post(
-            '/api/v3/user/ingredients/custom',
-            headers={'Authorization': 'Bearer ' + self.access_token},
-            json={
-                'ingredient': 'load_test_ingredient',
-                'type': 'load_test_type'
-            }
-        )
 
-        self.client.delete(
-            '/api/v3/user/ingredients/custom/load_test_ingredient',
-            headers={'Authorization': 'Bearer ' + self.access_token}
-        )
+@events.init.add_listener
+def on_init(environment, **kwargs):
+    """
+    Serves the JWKS that verifies the minted tokens. Workers sign with the
+    key file of the master, which serves it.
+    """
+    if isinstance(environment.runner, WorkerRunner):
+        return
 
-        # Lists
-        self.client.get(
-            '/api/v3/user/lists',
-            headers={'Authorization': 'Bearer ' + self.access_token}
-        )
+    start_jwks_server(signer, JWKS_ADDRESS, JWKS_PORT)
+    logging.info(
+        'Serving the JWKS at http://%s:%s%s. Start the API with AUTH0_JWK_URL set to it.',
+        JWKS_ADDRESS,
+        JWKS_PORT,
+        JWKS_PATH
+    )
 
-        self.client.post(
-            '/api/v3/user/lists/load_test_list',
-            headers={'Authorization': 'Bearer ' + self.access_token}
-        )
 
-        self.client.post(
-            '/api/v3/user/lists/ingredients',
-            headers={'Authorization': 'Bearer ' + self.access_token},
-            json={
-                'list_name': 'load_test_list',
-                'ingredient': 'Chewing gum',
-                'amount': 500,
-                'unit': 'g',
-                'is_custom_ingredient': False
-            }
-        )
+@events.quitting.add_listener
+def on_quitting(environment, **kwargs):
+    """
+    Checks the response times and failures of each endpoint against its SLO, writes
+    the report, and makes locust exit with an error if an SLO was missed.
+    """
+    if isinstance(environment.runner, WorkerRunner):
+        return
 
-        self.client.patch(
-            '/api/v3/user/lists/ingredients',
-            headers={'Authorization': 'Bearer ' + self.access_token},
-            json={
-                'old_list_name': 'load_test_list',
-                'old_ingredient': 'Chewing gum',
-                'old_amount': 500,
-                'old_unit': 'g',
-                'old_is_custom_ingredient': False,
-                'new_list_name': 'load_test_list',
-                'new_ingredient': 'Chewing gum',
-                'new_amount': 400,
-                'new_unit': 'lb',
-                'new_is_custom_ingredient': False
-            }
-        )
+    report = check_slos(environment.stats.entries.values(), SLOS, DEFAULT_SLO)
+    os.makedirs(os.path.dirname(REPORT_PATH) or '.', exist_ok=True)
+    with open(REPORT_PATH, 'w') as file:
+        json.dump(report, file, indent=2)
 
-        self.client.get(
-            '/api/v3/user/lists/load_test_list',
-            headers={'Authorization': 'Bearer ' + self.access_token}
-        )
+    for endpoint in report['endpoints']:
+        if not endpoint['passed']:
+            logging.error('SLO missed by %s: %s', endpoint['endpoint'], ', '.join(
+                endpoint['violations']
+            ))
+    logging.info('SLO report written to %s', REPORT_PATH)
+    if not report['passed']:
+        environment.process_exit_code = 1
 
-        url_string = '/api/v3/user/lists/ingredients'
-        url_string += '?list_name=load_test_list&ingredient=Chewing gum'
-        url_string += '&unit=lb&is_custom_ingredient=false'
-        self.client.delete(
-            url_string,
-            headers={
-                'Authorization': 'Bearer ' + self.access_token,
-            }
-        )
 
-        self.client.put(
-            '/api/v3/user/lists',
-            headers={'Authorization': 'Bearer ' + self.access_token},
-            json={
-                'old_list_name': 'load_test_list',
-                'new_list_name': 'load_test_list2'
-            }
-        )
+class CupboardTaskSet(TaskSet):
+    """
+    Requests of an endpoint family. Users go back to picking a family now and then.
+    """
+    @task(2)
+    def leave(self):
+        self.interrupt()
 
-        self.client.delete(
-            '/api/v3/user/lists/load_test_list2',
-            headers={'Authorization': 'Bearer ' + self.access_token}
-        )
 
-        # Recipes
+class CatalogueTasks(CupboardTaskSet):
+    @task(5)
+    def get_ingredients(self):
+        self.client.get(f'{API}/ingredients')
+
+    @task(3)
+    def search_ingredients(self):
+        query = random.choice(self.user.ingredients)[:random.randint(3, 6)]
         self.client.get(
-            '/api/v3/user/recipe',
-            headers={'Authorization': 'Bearer ' + self.access_token}
+            f'{API}/ingredients/search',
+            params={'q': query},
+            name=f'{API}/ingredients/search'
         )
 
-        self.client.post(
-            '/api/v3/user/recipe/load_test_recipe',
-            headers={'Authorization': 'Bearer ' + self.access_token}
-        )
+    @task(2)
+    def get_measurements(self):
+        self.client.get(f'{API}/measurements')
 
-        self.client.get(
-            '/api/v3/user/recipe/load_test_recipe',
-            headers={'Authorization': 'Bearer ' + self.access_token}
-        )
 
+class ListTasks(CupboardTaskSet):
+    @task(6)
+    def get_lists(self):
+        self.client.get(f'{API}/user/lists')
+
+    @task(4)
+    def get_list(self):
+        self.client.get(f'{API}/user/lists/Grocery', name=f'{API}/user/lists/[list_name]')
+
+    @task(3)
+    def edit_list_item(self):
+        ingredient = random.choice(self.user.ingredients)
+        unit = random.choice(self.user.units)
+        item = {'ingredient': ingredient, 'unit': unit, 'is_custom_ingredient': False}
+
+        self.client.post(LIST_ITEM, json={'list_name': 'Grocery', 'amount': 2, **item})
+        self.client.patch(LIST_ITEM, json={
+            'old_list_name': 'Grocery',
+            'old_ingredient': ingredient,
+            'old_amount': 2,
+            'old_unit': unit,
+            'old_is_custom_ingredient': False,
+            'new_list_name': 'Grocery',
+            'new_ingredient': ingredient,
+            'new_amount': 1,
+            'new_unit': unit,
+            'new_is_custom_ingredient': False
+        })
+        self.client.delete(LIST_ITEM, params={'list_name': 'Grocery', **item}, name=LIST_ITEM)
+
+    @task(1)
+    def manage_list(self):
+        list_name = f'{TAG}_list'
         self.client.post(
-            '/api/v3/user/recipe/load_test_recipe/ingredient',
-            headers={'Authorization': 'Bearer ' + self.access_token},
-            json={
-                'list_name': 'load_test_list',
-                'ingredient': 'Chewing gum',
-                'amount': 500,
-                'unit': 'g',
-                'is_custom_ingredient': False
-            }
+            f'{API}/user/lists/{list_name}',
+            name=f'{API}/user/lists/[list_name]'
+        )
+        self.client.put(
+            f'{API}/user/lists',
+            json={'old_list_name': list_name, 'new_list_name': f'{list_name}2'}
         )
-
-        url_string = '/api/v3/user/recipe/load_test_recipe/ingredient'
-        url_string += '?ingredient=Chewing gum'
-        url_string += '&unit=g&is_custom_ingredient=false'
         self.client.delete(
-            url_string,
-            headers={'Authorization': 'Bearer ' + self.access_token}
+            f'{API}/user/lists/{list_name}2',
+            name=f'{API}/user/lists/[list_name]'
         )
 
+
+class RecipeTasks(CupboardTaskSet):
+    recipe = f'{API}/user/recipe/{TAG}_recipe'
+
+    @task(4)
+    def get_recipes(self):
+        self.client.get(f'{API}/user/recipe')
+
+    @task(3)
+    def get_recipe(self):
+        self.client.get(self.recipe, name=RECIPE)
+
+    @task(2)
+    def edit_recipe(self):
+        item = {
+            'ingredient': random.choice(self.user.ingredients),
+            'unit': random.choice(self.user.units),
+            'is_custom_ingredient': False
+        }
         self.client.post(
-            '/api/v3/user/recipe/load_test_recipe/step',
-            headers={'Authorization': 'Bearer ' + self.access_token},
-            json={'step': 'Load test step.'}
+            f'{self.recipe}/ingredient',
+            json={'amount': 1, **item},
+            name=f'{RECIPE}/ingredient'
+        )
+        self.client.post(
+            f'{self.recipe}/step',
+            json={'step': 'Load test step.'},
+            name=f'{RECIPE}/step'
         )
-
         self.client.patch(
-            '/api/v3/user/recipe/load_test_recipe/step',
-            headers={'Authorization': 'Bearer ' + self.access_token},
-            json={'step': 'Load test step 2.', 'step_number': 1}
+            f'{self.recipe}/step',
+            json={'step': 'Load test step 2.', 'step_number': 1},
+            name=f'{RECIPE}/step'
         )
-
         self.client.delete(
-            '/api/v3/user/recipe/load_test_recipe/step?step_number=1',
-            headers={'Authorization': 'Bearer ' + self.access_token}
+            f'{self.recipe}/step',
+            params={'step_number': 1},
+            name=f'{RECIPE}/step'
         )
+        self.client.delete(f'{self.recipe}/ingredient', params=item, name=f'{RECIPE}/ingredient')
 
+
+class CustomIngredientTasks(CupboardTaskSet):
+    @task
+    def create_and_delete(self):
+        ingredient = f'{TAG}_custom'
+        self.client.post(
+            f'{API}/user/ingredients/custom',
+            json={'ingredient': ingredient, 'type': 'Spice'}
+        )
         self.client.delete(
-            '/api/v3/user/recipe/load_test_recipe',
-            headers={'Authorization': 'Bearer ' + self.access_token}
+            f'{API}/user/ingredients/custom/{ingredient}',
+            name=f'{API}/user/ingredients/custom/[ingredient]'
         )
 
+
+class SyncTasks(CupboardTaskSet):
+    @task(3)
+    def sync(self):
+        response = self.client.get(
+            f'{API}/user/sync',
+            params={'since': self.user.sync_token} if self.user.sync_token else None,
+            name=f'{API}/user/sync'
+        )
+        if response.ok:
+            self.user.sync_token = response.json()['token']
+
+    @task(1)
+    def batch(self):
+        self.client.post(f'{API}/batch', json={'operations': [
+            {'method': 'GET', 'path': f'{API}/user/lists'},
+            {'method': 'GET', 'path': f'{API}/user/recipe'}
+        ]})
+
+
+class CupboardUser(HttpUser):
+    """
+    User of the apps, signed in with a locally minted token. The weights of the
+    task sets are the share of the time users spend on each endpoint family.
+    """
+    wait_time = think_time()
+    tasks = {
+        ListTasks: 5,
+        CatalogueTasks: 3,
+        RecipeTasks: 2,
+        SyncTasks: 2,
+        CustomIngredientTasks: 1
+    }
+
     def on_start(self):
         """
-        Performs initial login when runner is created.
+        Mints the user's token, creates the user and its recipe, and loads
+        the ingredients and units it uses.
         """
-        global user_count
-        user_count = user_count + 1
-        self.user_id = user_count
-        self.access_token = ''
-
-        if (self.access_token == ''):
-            load_env_variables()  # Adds the .env values to environment to allow use
-
-            # Log in user
-            print_str = 'Logging User In as user: '
-            print_str += str(os.environ['LOAD_TEST_USERNAME'])
-            print_str += '_' + str(self.user_id) + '@gmail.com'
-            logging.info(print_str)
-            username = str(os.environ['LOAD_TEST_USERNAME'])
-            username += '_' + str(self.user_id) + '@gmail.com'
-            response = self.client.post(
-                '/login',
-                json={
-                    'username': username,
-                    'password': os.environ['LOAD_TEST_PASSWORD']
-                }
-            )
-            logging.info(str(response.json()))
-
-            data = response.json()
-            self.access_token = data['access_token']
+        number = next(user_numbers)
+        if isinstance(self.environment.runner, WorkerRunner):
+            number += self.environment.runner.worker_index * WORKER_USER_OFFSET
+        username = f'{TAG}_user{number}'
+        self.client.headers['Authorization'] = 'Bearer ' + signer.mint(username, ISSUER, AUDIENCE)
+
+        self.client.post(f'{API}/user')
+        self.client.post(RecipeTasks.recipe, name=RECIPE)
+        self.sync_token = None
+        ingredients = self.client.get(f'{API}/ingredients')
+        measurements = self.client.get(f'{API}/measurements')
+        self.ingredients = [
+            ingredient['name'] for ingredient in ingredients.json()['common_ingredients']
+        ] if ingredients.ok else []
+        self.units = [
+            measurement['unit'] for measurement in measurements.json()
+        ] if measurements.ok else []
+        # Without a catalogue the items are missing ingredients, which fail like in the apps
+        self.ingredients = self.ingredients or ['Chewing gum']
+        self.units = self.units or ['g']
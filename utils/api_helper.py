@@ -1,7 +1,10 @@
 from django.contrib.auth import authenticate
+from django.utils.http import parse_etags
 from rest_framework.request import Request
 from rest_framework_simplejwt.tokens import AccessToken
 
+from cupboard_app.exceptions import PreconditionFailed
+
 EMAIL_CLAIM = 'https://cupboard-teacup.com/email'
 
 
@@ -36,12 +39,17 @@ def get_auth_username_from_payload(request: Request = None, payload: AccessToken
         Username string for the specified user.
     """
     if request:
+        # Already authenticated for this request, i.e. by a batch request
+        if getattr(request, 'auth_username', None):
+            return request.auth_username
         username = request.auth.get('sub').replace('|', '.')
     elif payload:
         username = payload['sub'].replace('|', '.')
     else:
         raise ValueError('Missing sub field in access token.')
     authenticate(remote_user=username)
+    if request:
+        request.auth_username = username
     return username
 
 
@@ -64,3 +72,72 @@ def get_auth_email_from_payload(request: Request = None, payload: AccessToken =
         raise ValueError(f'Missing {EMAIL_CLAIM} field in access token.')
 
     return email
+
+
+def get_etag(revision: int) -> str:
+    """
+    Creates the weak ETag for a document revision.
+
+    Args:
+        revision: The document's revision
+
+    Returns:
+        The weak ETag string.
+    """
+    return f'W/"{revision}"'
+
+
+def _etag_in_header(header: str, etag: str) -> bool:
+    """
+    Checks if the ETag is in an If-None-Match or If-Match header using the weak comparison.
+    """
+    etags = parse_etags(header)
+    return '*' in etags or etag.removeprefix('W/') in [e.removeprefix('W/') for e in etags]
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    Checks if the client already has the current version from the If-None-Match header.
+
+    Args:
+        request: The rest framework Request object
+        etag: The current ETag of the document
+
+    Returns:
+        True if the client's copy is current, False otherwise.
+    """
+    header = request.META.get('HTTP_IF_NONE_MATCH', None)
+    return bool(header) and _etag_in_header(header, etag)
+
+
+def get_if_match_revisions(request: Request) -> list[int] | None:
+    """
+    Gets the document revisions of the If-Match header. The queries save the change only
+    if the document still has one of them, in the same write, so a change made after
+    the check is never overwritten.
+
+    Args:
+        request: The rest framework Request object
+
+    Returns:
+        List of the revisions, or None if the header is not sent or matches any revision.
+
+    Raises:
+        PreconditionFailed if none of the header's ETags is a document revision.
+    """
+    header = request.META.get('HTTP_IF_MATCH', None)
+    if not header:
+        return None
+
+    etags = parse_etags(header)
+    if '*' in etags:
+        return None
+
+    revisions = [
+        int(etag.removeprefix('W/').strip('"')) for etag in etags
+        if etag.removeprefix('W/').strip('"').isdigit()
+    ]
+    if not revisions:
+        raise PreconditionFailed()
+
+    return revisions
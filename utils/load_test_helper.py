@@ -0,0 +1,208 @@
+import json
+import os
+import random
+from base64 import urlsafe_b64encode
+from datetime import datetime, timezone
+from hashlib import sha256
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from time import time
+from typing import Callable, Iterable
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+JWKS_PATH = '/.well-known/jwks.json'
+TOKEN_LIFETIME = 24 * 60 * 60
+# Same claim as utils.api_helper, which cannot be imported without the Django settings
+EMAIL_CLAIM = 'https://cupboard-teacup.com/email'
+# Matches the emails of generate_synthetic_data so delete_synthetic_data removes the users
+EMAIL_DOMAIN = 'synthetic.invalid'
+
+# Think times as (weight, min seconds, max seconds): mostly tapping through the app,
+# sometimes reading a recipe or list, and now and then leaving the app open.
+THINK_TIME_MIX = [
+    (0.75, 1, 3),
+    (0.2, 5, 15),
+    (0.05, 30, 90)
+]
+
+
+class TokenSigner:
+    """
+    RSA key that mints RS256 access tokens like the ones Auth0 issues.
+    The key is kept in a PEM file so every locust process and run signs with the same key.
+    """
+    def __init__(self, key_path: str):
+        if os.path.exists(key_path):
+            with open(key_path, 'rb') as file:
+                self.key = serialization.load_pem_private_key(file.read(), password=None)
+        else:
+            self.key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+            with open(key_path, 'wb') as file:
+                file.write(self.key.private_bytes(
+                    serialization.Encoding.PEM,
+                    serialization.PrivateFormat.PKCS8,
+                    serialization.NoEncryption()
+                ))
+
+        self.jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(self.key.public_key()))
+        # RFC 7638 thumbprint, so the key id changes when the key does
+        thumbprint = json.dumps(
+            {name: self.jwk[name] for name in ('e', 'kty', 'n')},
+            separators=(',', ':'),
+            sort_keys=True
+        )
+        self.kid = urlsafe_b64encode(sha256(thumbprint.encode()).digest()).rstrip(b'=').decode()
+        self.jwk.update({'kid': self.kid, 'use': 'sig', 'alg': 'RS256'})
+
+    def get_jwks(self) -> dict:
+        """
+        Gets the JSON Web Key Set that verifies the minted tokens.
+        """
+        return {'keys': [self.jwk]}
+
+    def mint(
+        self,
+        username: str,
+        issuer: str,
+        audience: str,
+        lifetime: int = TOKEN_LIFETIME
+    ) -> str:
+        """
+        Mints an access token for a user.
+
+        Args:
+            username: The token's subject, which is the user's username
+            issuer: Issuer the API expects, i.e. https://[AUTH0_DOMAIN]/
+            audience: Audience the API expects, i.e. AUTH0_API_IDENTIFIER
+            lifetime: Seconds until the token expires
+
+        Returns:
+            The signed token.
+        """
+        now = int(time())
+        payload = {
+            'iss': issuer,
+            'sub': username,
+            'aud': audience,
+            'iat': now,
+            'exp': now + lifetime,
+            'scope': 'read:messages',
+            'permissions': ['read:messages'],
+            EMAIL_CLAIM: f'{username}@{EMAIL_DOMAIN}'
+        }
+        return jwt.encode(payload, self.key, algorithm='RS256', headers={'kid': self.kid})
+
+
+def start_jwks_server(signer: TokenSigner, address: str, port: int) -> ThreadingHTTPServer:
+    """
+    Serves the signer's JWKS in a background thread, in place of Auth0's. Point the API at
+    it with AUTH0_JWK_URL=http://[address]:[port]/.well-known/jwks.json.
+
+    Args:
+        signer: Signer of the tokens
+        address: Address to listen on
+        port: Port to listen on, or 0 for any free port
+
+    Returns:
+        The running server. Call shutdown() to stop it.
+    """
+    body = json.dumps(signer.get_jwks()).encode()
+
+    class JWKSHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != JWKS_PATH:
+                self.send_error(404)
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((address, port), JWKSHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def think_time(mix: list[tuple[float, float, float]] = THINK_TIME_MIX) -> Callable:
+    """
+    Makes a locust wait_time that picks a think time range by weight and then a time in it.
+
+    Args:
+        mix: List of (weight, min seconds, max seconds) of each think time range
+
+    Returns:
+        Function of the user or task set that returns the seconds to wait.
+    """
+    weights = [weight for weight, low, high in mix]
+
+    def wait_time(instance) -> float:
+        low, high = random.choices(mix, weights)[0][1:]
+        return random.uniform(low, high)
+
+    return wait_time
+
+
+class SLO:
+    """
+    Service level objective of an endpoint: the largest 95th and 99th percentile
+    response times in milliseconds and the largest fraction of failed requests.
+    """
+    def __init__(self, p95: float, p99: float, max_failure_ratio: float = 0.01):
+        self.p95 = p95
+        self.p99 = p99
+        self.max_failure_ratio = max_failure_ratio
+
+
+def check_slos(entries: Iterable, slos: dict[str, SLO], default: SLO) -> dict:
+    """
+    Checks the locust statistics of each endpoint against its SLO.
+
+    Args:
+        entries: Locust StatsEntry of each endpoint
+        slos: SLOs by '[method] [name]' of the endpoint
+        default: SLO of the endpoints that are not in slos
+
+    Returns:
+        Dictionary of the report, which passed only if every endpoint met its SLO.
+    """
+    endpoints = []
+    for entry in sorted(entries, key=lambda entry: (entry.name, entry.method)):
+        if not entry.num_requests:
+            continue
+
+        key = f'{entry.method} {entry.name}'
+        slo = slos.get(key, default)
+        result = {
+            'endpoint': key,
+            'requests': entry.num_requests,
+            'failure_ratio': round(entry.fail_ratio, 4),
+            'p50': entry.get_response_time_percentile(0.5),
+            'p95': entry.get_response_time_percentile(0.95),
+            'p99': entry.get_response_time_percentile(0.99),
+            'slo': vars(slo),
+            'violations': []
+        }
+        if result['p95'] > slo.p95:
+            result['violations'].append(f'p95 {result["p95"]}ms > {slo.p95}ms')
+        if result['p99'] > slo.p99:
+            result['violations'].append(f'p99 {result["p99"]}ms > {slo.p99}ms')
+        if entry.fail_ratio > slo.max_failure_ratio:
+            result['violations'].append(
+                f'failure ratio {entry.fail_ratio:.2%} > {slo.max_failure_ratio:.2%}'
+            )
+        result['passed'] = not result['violations']
+        endpoints.append(result)
+
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'passed': all(endpoint['passed'] for endpoint in endpoints),
+        'endpoints': endpoints
+    }
@@ -0,0 +1,54 @@
+import resource
+import sys
+
+MEGABYTE = 1024 * 1024
+
+
+def get_memory_usage(pid: int | str = 'self') -> dict[str, int]:
+    """
+    Gets the memory used by a process. Pages shared copy-on-write with
+    the parent process are counted in rss but not in private.
+
+    Args:
+        pid: Process ID, defaults to the current process
+
+    Returns:
+        Dictionary of the memory in bytes in the form of:
+        {
+            'rss': resident memory including shared pages,
+            'pss': resident memory with shared pages split between the processes sharing them,
+            'private': resident memory only used by the process
+        }
+        Only rss is given where /proc is not available.
+    """
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as smaps:
+            fields = {}
+            for line in smaps:
+                name, _, value = line.partition(':')
+                parts = value.split()
+                if len(parts) == 2 and parts[1] == 'kB':
+                    fields[name] = int(parts[0]) * 1024
+    except OSError:
+        # ru_maxrss is the peak resident memory, in bytes on macOS and kilobytes elsewhere
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {'rss': max_rss if sys.platform == 'darwin' else max_rss * 1024}
+
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    }
+
+
+def format_memory_usage(usage: dict[str, int]) -> str:
+    """
+    Formats the memory used by a process for the logs.
+
+    Args:
+        usage: Dictionary of the memory in bytes from get_memory_usage
+
+    Returns:
+        The memory in megabytes, i.e. 'rss=80.1MB pss=35.2MB private=20.3MB'.
+    """
+    return ' '.join(f'{name}={value / MEGABYTE:.1f}MB' for name, value in usage.items())
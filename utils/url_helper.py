@@ -0,0 +1,57 @@
+from typing import Callable
+
+from django.http import HttpRequest, HttpResponse
+from django.utils.module_loading import import_string
+
+
+class LazyView:
+    """
+    View that imports its class on the first request instead of when the URLs are loaded,
+    for rarely used views whose modules are slow to import.
+
+    The attributes of the real view, i.e. cls for the schema generation and csrf_exempt for
+    the CSRF middleware, are read from it once it is imported. The name and module are kept
+    on the lazy view so the URL resolver does not need to import the view to index it.
+    """
+    def __init__(self, dotted_path: str, **initkwargs):
+        self.dotted_path = dotted_path
+        self.initkwargs = initkwargs
+        self.view = None
+        self.__module__, self.__name__ = dotted_path.rsplit('.', 1)
+        self.__qualname__ = self.__name__
+
+    def load(self) -> Callable:
+        """
+        Imports the view class and builds the view function.
+
+        Returns:
+            The view function.
+        """
+        if self.view is None:
+            self.view = import_string(self.dotted_path).as_view(**self.initkwargs)
+
+        return self.view
+
+    def __call__(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        return self.load()(request, *args, **kwargs)
+
+    def __getattr__(self, name: str):
+        # view_class is checked by the URL resolver, which must not import the view
+        if name.startswith('_') or name == 'view_class':
+            raise AttributeError(name)
+
+        return getattr(self.load(), name)
+
+
+def lazy_view(dotted_path: str, **initkwargs) -> LazyView:
+    """
+    Builds a view that imports its class on the first request.
+
+    Args:
+        dotted_path: Dotted path of the view class, i.e. 'cupboard_app.views.MyView'
+        initkwargs: Keyword arguments passed to the view's as_view
+
+    Returns:
+        The LazyView object.
+    """
+    return LazyView(dotted_path, **initkwargs)